@@ -0,0 +1,144 @@
+"""Incremental JSONL/CSV row parsing for bulk imports streamed in the request body.
+
+Rows are yielded as (line, row, error) while the body is still being received, so
+the whole file is never held in memory; only the current line (or the current
+quoted CSV record spanning several lines) is buffered.
+"""
+
+import codecs
+import csv
+import json
+from typing import AsyncIterator, Optional
+
+from .config import BULK_IMPORT_MAX_LINE_CHARS
+
+RowResult = tuple[int, Optional[dict], Optional[str]]
+
+_FORMATS = {
+    "application/x-ndjson": "jsonl",
+    "application/jsonl": "jsonl",
+    "application/json-lines": "jsonl",
+    "text/csv": "csv",
+}
+
+
+def bulk_format(content_type: str) -> Optional[str]:
+    """jsonl or csv by the request Content-Type, None if it is neither."""
+    return _FORMATS.get(content_type.split(";", 1)[0].strip().lower())
+
+
+class BulkImportStopped(Exception):
+    """The rest of the body cannot be read; rows before `line` have already been yielded."""
+
+    def __init__(self, line: int, error: str):
+        super().__init__(error)
+        self.line = line
+        self.error = error
+
+
+def _too_long(line_no: int) -> str:
+    return f"Строка {line_no} длиннее {BULK_IMPORT_MAX_LINE_CHARS} символов"
+
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[tuple[int, Optional[str]]]:
+    """Decode a UTF-8 byte stream (BOM allowed) into numbered lines without the line break.
+
+    A line longer than BULK_IMPORT_MAX_LINE_CHARS comes as None: its text is dropped
+    up to the next line break, so one bad line does not stop the import.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""
+    line_no = 0
+    skipping = False
+    broken = False
+    async for chunk in chunks:
+        try:
+            pending += decoder.decode(chunk)
+        except UnicodeDecodeError as exc:
+            # Строки до испорченного символа целые: отдаём их, а дальше файл не читаем
+            pending += exc.object[: exc.start].decode("utf-8")
+            broken = True
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            line_no += 1
+            too_long = skipping or len(line) > BULK_IMPORT_MAX_LINE_CHARS
+            skipping = False
+            yield line_no, None if too_long else line.removesuffix("\r")
+        if broken:
+            raise BulkImportStopped(line_no + 1, "Файл должен быть в кодировке UTF-8")
+        if len(pending) > BULK_IMPORT_MAX_LINE_CHARS:
+            # Не копим длинную строку: отбрасываем её до следующего перевода строки
+            skipping = True
+            pending = ""
+    try:
+        pending += decoder.decode(b"", final=True)
+    except UnicodeDecodeError:
+        raise BulkImportStopped(line_no + 1, "Файл должен быть в кодировке UTF-8") from None
+    if skipping or len(pending) > BULK_IMPORT_MAX_LINE_CHARS:
+        yield line_no + 1, None
+    elif pending:
+        yield line_no + 1, pending.removesuffix("\r")
+
+
+async def iter_jsonl_rows(chunks: AsyncIterator[bytes]) -> AsyncIterator[RowResult]:
+    async for line_no, line in iter_lines(chunks):
+        if line is None:
+            yield line_no, None, _too_long(line_no)
+            continue
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as exc:
+            yield line_no, None, f"Неверный JSON: {exc}"
+            continue
+        if not isinstance(row, dict):
+            yield line_no, None, "Строка должна быть JSON-объектом"
+            continue
+        yield line_no, row, None
+
+
+async def iter_csv_rows(chunks: AsyncIterator[bytes]) -> AsyncIterator[RowResult]:
+    """Rows of a CSV file with a header line; empty cells become None."""
+    header = None
+    record: list[str] = []
+    quotes = 0
+    start = 0
+    # Запись оказалась слишком длинной: её строки пропускаются до закрывающей кавычки
+    dropped = False
+    async for line_no, line in iter_lines(chunks):
+        if line is None:
+            # Кавычки в отброшенной строке не посчитать: продолжаем со следующей строки
+            yield (start if record or dropped else line_no), None, _too_long(line_no)
+            record, quotes, dropped = [], 0, False
+            continue
+        if not record and not dropped:
+            start = line_no
+        quotes += line.count('"')
+        if not dropped:
+            record.append(line)
+        # Нечётное число кавычек - поле в кавычках продолжается на следующей строке
+        if quotes % 2:
+            if not dropped and sum(len(part) for part in record) > BULK_IMPORT_MAX_LINE_CHARS:
+                record, dropped = [], True
+            continue
+        if dropped:
+            yield start, None, f"Запись со строки {start} длиннее {BULK_IMPORT_MAX_LINE_CHARS} символов"
+            quotes, dropped = 0, False
+            continue
+        text = "\n".join(record)
+        record, quotes = [], 0
+        if not text.strip():
+            continue
+
+        values = next(csv.reader([text]))
+        if header is None:
+            header = [name.strip().lower() for name in values]
+            continue
+        if len(values) != len(header):
+            yield start, None, f"Ожидалось колонок: {len(header)}, получено: {len(values)}"
+            continue
+        yield start, {name: value if value != "" else None for name, value in zip(header, values)}, None
+
+    if record or dropped:
+        yield start, None, "Незакрытая кавычка в конце файла"
@@ -0,0 +1,193 @@
+"""gzip/brotli response compression: content negotiation, an ASGI middleware and one-shot helpers.
+
+The middleware compresses responses whose content type is in the allowlist and
+whose body reaches the minimum size; streaming responses are compressed chunk by
+chunk. Responses that already carry Content-Encoding (precompressed bodies from
+the response cache) are passed through untouched.
+"""
+
+import gzip
+import threading
+import zlib
+from typing import Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .config import (
+    COMPRESSION_BROTLI_QUALITY,
+    COMPRESSION_CONTENT_TYPES,
+    COMPRESSION_ENCODINGS,
+    COMPRESSION_GZIP_LEVEL,
+    COMPRESSION_MIN_SIZE,
+)
+
+try:
+    import brotli
+except ImportError:  # brotli - необязательная зависимость
+    brotli = None
+
+_LEVELS = {"gzip": COMPRESSION_GZIP_LEVEL, "br": COMPRESSION_BROTLI_QUALITY}
+
+_counters = {"responses": 0, "bytes_in": 0, "bytes_out": 0}
+_lock = threading.Lock()
+
+
+def available_encodings(encodings: list[str] = COMPRESSION_ENCODINGS) -> list[str]:
+    return [e for e in encodings if e == "gzip" or (e == "br" and brotli is not None)]
+
+
+def negotiate_encoding(accept_encoding: str, encodings: Optional[list[str]] = None) -> Optional[str]:
+    """Pick the best of our encodings for an Accept-Encoding header, or None for identity."""
+    if not accept_encoding:
+        return None
+    accepted = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        q = 1.0
+        if params.strip().startswith("q="):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                q = 0.0
+        accepted[name.strip().lower()] = q
+
+    best, best_q = None, 0.0
+    # При равном q побеждает кодировка, стоящая раньше в нашем списке
+    for encoding in available_encodings(COMPRESSION_ENCODINGS if encodings is None else encodings):
+        q = accepted.get(encoding, accepted.get("*", 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+class Compressor:
+    """Incremental compressor with a common interface for gzip and brotli."""
+
+    def __init__(self, encoding: str, level: Optional[int] = None):
+        level = _LEVELS[encoding] if level is None else level
+        if encoding == "br":
+            self._impl = brotli.Compressor(quality=level)
+            self._compress, self._finish = self._impl.process, self._impl.finish
+        else:
+            # wbits 31: поток deflate в обёртке gzip
+            self._impl = zlib.compressobj(level, zlib.DEFLATED, 31)
+            self._compress, self._finish = self._impl.compress, self._impl.flush
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compress(data)
+
+    def finish(self) -> bytes:
+        return self._finish()
+
+
+def compress(body: bytes, encoding: str, level: Optional[int] = None) -> bytes:
+    if encoding == "gzip":
+        # mtime=0: одинаковое тело всегда даёт одинаковые байты
+        return gzip.compress(body, compresslevel=_LEVELS["gzip"] if level is None else level, mtime=0)
+    compressor = Compressor(encoding, level)
+    return compressor.compress(body) + compressor.finish()
+
+
+def compressible(content_type: str, content_types: list[str] = COMPRESSION_CONTENT_TYPES) -> bool:
+    media_type = content_type.split(";", 1)[0].strip().lower()
+    return media_type in content_types
+
+
+def record_compression(bytes_in: int, bytes_out: int) -> None:
+    with _lock:
+        _counters["responses"] += 1
+        _counters["bytes_in"] += bytes_in
+        _counters["bytes_out"] += bytes_out
+
+
+def compression_stats() -> dict:
+    with _lock:
+        counters = dict(_counters)
+    counters["ratio"] = counters["bytes_out"] / counters["bytes_in"] if counters["bytes_in"] else None
+    return counters
+
+
+class CompressionMiddleware:
+    def __init__(
+        self,
+        app: ASGIApp,
+        encodings: Optional[list[str]] = None,
+        minimum_size: int = COMPRESSION_MIN_SIZE,
+        content_types: Optional[list[str]] = None,
+    ):
+        self.app = app
+        self.encodings = COMPRESSION_ENCODINGS if encodings is None else encodings
+        self.minimum_size = minimum_size
+        self.content_types = COMPRESSION_CONTENT_TYPES if content_types is None else content_types
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding", ""), self.encodings)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        await self.app(scope, receive, _CompressingSend(send, encoding, self.minimum_size, self.content_types))
+
+
+class _CompressingSend:
+    """send() wrapper: holds back http.response.start until the first body chunk decides the encoding."""
+
+    def __init__(self, send: Send, encoding: str, minimum_size: int, content_types: list[str]):
+        self.send = send
+        self.encoding = encoding
+        self.minimum_size = minimum_size
+        self.content_types = content_types
+        self.start: Optional[Message] = None
+        self.compressor: Optional[Compressor] = None
+        self.passthrough = False
+        self.bytes_in = self.bytes_out = 0
+
+    async def __call__(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            self.start = message
+            return
+        if message["type"] != "http.response.body" or self.passthrough:
+            await self.send(message)
+            return
+
+        body, more_body = message.get("body", b""), message.get("more_body", False)
+        if self.compressor is None:
+            headers = MutableHeaders(raw=self.start["headers"])
+            status = self.start["status"]
+            if (
+                "content-encoding" in headers
+                or status < 200
+                or status in (204, 304)
+                or not compressible(headers.get("content-type", ""), self.content_types)
+                or (not more_body and len(body) < self.minimum_size)
+            ):
+                self.passthrough = True
+                await self.send(self.start)
+                await self.send(message)
+                return
+
+            headers["Content-Encoding"] = self.encoding
+            headers.add_vary_header("Accept-Encoding")
+            self.compressor = Compressor(self.encoding)
+            if not more_body:
+                data = self.compressor.compress(body) + self.compressor.finish()
+                headers["Content-Length"] = str(len(data))
+                record_compression(len(body), len(data))
+                await self.send(self.start)
+                await self.send({"type": "http.response.body", "body": data})
+                return
+            # Длина сжатого потока заранее неизвестна
+            del headers["Content-Length"]
+            await self.send(self.start)
+
+        data = self.compressor.compress(body)
+        self.bytes_in += len(body)
+        if not more_body:
+            data += self.compressor.finish()
+        self.bytes_out += len(data)
+        if not more_body:
+            record_compression(self.bytes_in, self.bytes_out)
+        await self.send({"type": "http.response.body", "body": data, "more_body": more_body})
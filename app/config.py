@@ -6,6 +6,10 @@ Environment variables can override default values when necessary.
 import os
 
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./nartbooks.db")
+# Асинхронный режим работы с БД (AsyncSession); DB_ASYNC=0 возвращает синхронные сессии в пуле потоков
+DB_ASYNC = os.getenv("DB_ASYNC", "1").lower() in ("1", "true", "yes")
+# По умолчанию выводится из DATABASE_URL (sqlite -> sqlite+aiosqlite, postgresql -> postgresql+asyncpg)
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL", "")
 
 JWT_SECRET_KEY = os.getenv("JWT_SECRET_KEY", "your-secret-key-here")
 JWT_ALGORITHM = os.getenv("JWT_ALGORITHM", "HS256")
@@ -16,3 +20,113 @@ ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "my_secret_token")
 MSG_OVRX_BASE_URL = os.getenv("MSG_OVRX_BASE_URL", "https://msg.ovrx.ru")
 MSG_OVRX_API_KEY = os.getenv("MSG_OVRX_API_KEY", "ТВОЙ_API_КЛЮЧ")
 
+
+# Пул соединений (для SQLite с файлом и для серверных СУБД)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+
+# PRAGMA, применяемые к каждому новому соединению SQLite
+SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_CACHE_SIZE_KB = int(os.getenv("SQLITE_CACHE_SIZE_KB", "65536"))
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+SQLITE_TEMP_STORE = os.getenv("SQLITE_TEMP_STORE", "MEMORY")
+
+# Кэш пользователей для get_current_user (0 отключает кэш)
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "10000"))
+USER_CACHE_TTL_SECONDS = int(os.getenv("USER_CACHE_TTL_SECONDS", "60"))
+
+# Кэш проверенных JWT (0 отключает кэш)
+JWT_CACHE_SIZE = int(os.getenv("JWT_CACHE_SIZE", "10000"))
+
+# Кэш total для постраничных списков (0 отключает кэш)
+TOTALS_CACHE_SIZE = int(os.getenv("TOTALS_CACHE_SIZE", "5000"))
+TOTALS_CACHE_TTL_SECONDS = int(os.getenv("TOTALS_CACHE_TTL_SECONDS", "30"))
+
+# Кэш ответов публичных эндпоинтов книг (0 отключает кэш)
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "1000"))
+RESPONSE_CACHE_TTL_SECONDS = int(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "30"))
+RESPONSE_CACHE_CONTROL = os.getenv("RESPONSE_CACHE_CONTROL", "public, no-cache")
+# Сколько первых страниц GET /books (без поиска и курсора) кэшировать
+RESPONSE_CACHE_BOOK_PAGES = int(os.getenv("RESPONSE_CACHE_BOOK_PAGES", "3"))
+
+# Фоновая очистка auth_codes и auth_tokens (интервал 0 отключает)
+SWEEP_INTERVAL_SECONDS = int(os.getenv("SWEEP_INTERVAL_SECONDS", "600"))
+SWEEP_BATCH_SIZE = int(os.getenv("SWEEP_BATCH_SIZE", "1000"))
+AUTH_CODE_RETENTION_MINUTES = int(os.getenv("AUTH_CODE_RETENTION_MINUTES", "60"))
+
+# Фоновая отправка кодов через сервис сообщений
+DELIVERY_WORKERS = int(os.getenv("DELIVERY_WORKERS", "4"))
+DELIVERY_QUEUE_SIZE = int(os.getenv("DELIVERY_QUEUE_SIZE", "1000"))
+DELIVERY_TIMEOUT_SECONDS = float(os.getenv("DELIVERY_TIMEOUT_SECONDS", "5"))
+DELIVERY_MAX_ATTEMPTS = int(os.getenv("DELIVERY_MAX_ATTEMPTS", "4"))
+DELIVERY_BACKOFF_BASE_SECONDS = float(os.getenv("DELIVERY_BACKOFF_BASE_SECONDS", "0.5"))
+DELIVERY_BACKOFF_MAX_SECONDS = float(os.getenv("DELIVERY_BACKOFF_MAX_SECONDS", "8"))
+# Код живёт 10 минут; задания старше этого возраста не отправляются
+DELIVERY_MAX_AGE_SECONDS = float(os.getenv("DELIVERY_MAX_AGE_SECONDS", "300"))
+DELIVERY_BREAKER_THRESHOLD = int(os.getenv("DELIVERY_BREAKER_THRESHOLD", "5"))
+DELIVERY_BREAKER_RESET_SECONDS = float(os.getenv("DELIVERY_BREAKER_RESET_SECONDS", "30"))
+
+# Ограничение частоты запросов: memory - в памяти процесса, database - общая таблица rate_limits
+# (нужна при нескольких воркерах uvicorn)
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory")
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))
+RATE_LIMIT_SEND_CODE_COUNT = int(os.getenv("RATE_LIMIT_SEND_CODE_COUNT", "1"))
+RATE_LIMIT_SEND_CODE_SECONDS = int(os.getenv("RATE_LIMIT_SEND_CODE_SECONDS", "60"))
+RATE_LIMIT_VERIFY_CODE_COUNT = int(os.getenv("RATE_LIMIT_VERIFY_CODE_COUNT", "10"))
+RATE_LIMIT_VERIFY_CODE_SECONDS = int(os.getenv("RATE_LIMIT_VERIFY_CODE_SECONDS", "600"))
+
+# Как часто каждый воркер подгружает новые отзывы токенов (logout, отзыв сессий)
+REVOCATION_REFRESH_SECONDS = float(os.getenv("REVOCATION_REFRESH_SECONDS", "5"))
+
+# Сериализация JSON-ответов: orjson (если установлен) или json из стандартной библиотеки
+JSON_RESPONSE_RENDERER = os.getenv("JSON_RESPONSE_RENDERER", "orjson")
+
+# Сжатие ответов. Кодировки в порядке предпочтения (пусто - сжатие выключено); br работает,
+# только если установлен пакет brotli. Сжимаются ответы не меньше COMPRESSION_MIN_SIZE байт
+# с перечисленными типами содержимого.
+COMPRESSION_ENCODINGS = [e.strip() for e in os.getenv("COMPRESSION_ENCODINGS", "br,gzip").split(",") if e.strip()]
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+COMPRESSION_CONTENT_TYPES = [
+    t.strip()
+    for t in os.getenv("COMPRESSION_CONTENT_TYPES", "application/json,text/plain,text/html,text/csv").split(",")
+    if t.strip()
+]
+COMPRESSION_GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", "6"))
+COMPRESSION_BROTLI_QUALITY = int(os.getenv("COMPRESSION_BROTLI_QUALITY", "4"))
+# Тела из кэша ответов сжимаются один раз, поэтому для них можно взять максимальную степень
+COMPRESSION_CACHED_GZIP_LEVEL = int(os.getenv("COMPRESSION_CACHED_GZIP_LEVEL", "9"))
+COMPRESSION_CACHED_BROTLI_QUALITY = int(os.getenv("COMPRESSION_CACHED_BROTLI_QUALITY", "9"))
+
+# Массовый импорт книг (POST /books/bulk): строк в одной транзакции, сколько ошибок
+# возвращать в ответе и максимальная длина одной строки (записи CSV) в символах
+BULK_IMPORT_BATCH_SIZE = int(os.getenv("BULK_IMPORT_BATCH_SIZE", "500"))
+BULK_IMPORT_MAX_ERRORS = int(os.getenv("BULK_IMPORT_MAX_ERRORS", "100"))
+BULK_IMPORT_MAX_LINE_CHARS = int(os.getenv("BULK_IMPORT_MAX_LINE_CHARS", "1000000"))
+
+# Выгрузки CSV/XLSX: сколько строк читается из курсора и пишется в ответ за один шаг
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+
+# Пакетное добавление/удаление избранного: максимум id книг в одном запросе
+FAVORITES_BATCH_MAX_IDS = int(os.getenv("FAVORITES_BATCH_MAX_IDS", "500"))
+
+# Server-Sent Events (GET /books/{id}/events): период общего тика, на котором подписчикам
+# уходит heartbeat и перечитываются счётчики книг (записи из других воркеров), задержка
+# переподключения для клиента и максимум одновременных подписчиков в процессе
+SSE_HEARTBEAT_SECONDS = float(os.getenv("SSE_HEARTBEAT_SECONDS", "15"))
+SSE_RETRY_MS = int(os.getenv("SSE_RETRY_MS", "5000"))
+SSE_MAX_SUBSCRIBERS = int(os.getenv("SSE_MAX_SUBSCRIBERS", "10000"))
+
+# Метрики Prometheus (GET /metrics): METRICS_ENABLED=0 отключает сбор и эндпоинт; если задан
+# METRICS_TOKEN, запрос должен передать его в заголовке Authorization: Bearer
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1").lower() in ("1", "true", "yes")
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
+# Профилирование SQL (SQL_PROFILE=1, только для отладки): заголовки X-DB-Query-Count и
+# X-DB-Time-Ms, список запросов каждого HTTP-запроса в логе и план (EXPLAIN) каждого запроса
+# к БД дольше SQL_SLOW_QUERY_MS миллисекунд (0 отключает планы)
+SQL_PROFILE = os.getenv("SQL_PROFILE", "0").lower() in ("1", "true", "yes")
+SQL_SLOW_QUERY_MS = float(os.getenv("SQL_SLOW_QUERY_MS", "100"))
@@ -1,32 +1,221 @@
 """Database configuration and helpers."""
 
-from sqlalchemy import create_engine
-from sqlalchemy.orm import declarative_base, sessionmaker
+import time
+from typing import Callable, TypeVar, Union
 
-from .config import DATABASE_URL
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import create_engine, event, exc
+from sqlalchemy.engine import URL, Engine, make_url
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
+    AsyncSession,
+    async_sessionmaker,
+    create_async_engine,
+)
+from sqlalchemy.orm import Session, declarative_base, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool, StaticPool
 
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
-SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
+from . import profiler
+from .config import (
+    ASYNC_DATABASE_URL,
+    DATABASE_URL,
+    DB_ASYNC,
+    DB_MAX_OVERFLOW,
+    DB_POOL_RECYCLE,
+    DB_POOL_SIZE,
+    DB_POOL_TIMEOUT,
+    METRICS_ENABLED,
+    SQL_PROFILE,
+    SQLITE_BUSY_TIMEOUT_MS,
+    SQLITE_CACHE_SIZE_KB,
+    SQLITE_JOURNAL_MODE,
+    SQLITE_MMAP_SIZE,
+    SQLITE_SYNCHRONOUS,
+    SQLITE_TEMP_STORE,
+)
+from .metrics import db_pool_timeouts, db_pool_wait, instrument_engine
+
+
+def is_sqlite_url(url: URL) -> bool:
+    return url.get_backend_name() == "sqlite"
+
+
+def is_sqlite_memory_url(url: URL) -> bool:
+    database = url.database or ""
+    return database in ("", ":memory:") or "mode=memory" in database or url.query.get("mode") == "memory"
+
+
+def sqlite_pragmas() -> list[tuple[str, object]]:
+    """PRAGMA statements applied to every new SQLite connection, in order."""
+    return [
+        ("journal_mode", SQLITE_JOURNAL_MODE),
+        ("synchronous", SQLITE_SYNCHRONOUS),
+        ("busy_timeout", SQLITE_BUSY_TIMEOUT_MS),
+        # Отрицательное значение cache_size задаётся в КиБ, а не в страницах
+        ("cache_size", -SQLITE_CACHE_SIZE_KB),
+        ("mmap_size", SQLITE_MMAP_SIZE),
+        ("temp_store", SQLITE_TEMP_STORE),
+    ]
+
+
+def _apply_sqlite_pragmas(dbapi_connection, connection_record) -> None:
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in sqlite_pragmas():
+            cursor.execute(f"PRAGMA {name}={value}")
+    finally:
+        cursor.close()
+
+
+class _TimedCheckout:
+    """Pool mixin recording how long checkouts wait for a connection (db_pool_checkout_wait_seconds)."""
+
+    engine_label = ""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            db_pool_timeouts.inc(self.engine_label)
+            raise
+        finally:
+            db_pool_wait.observe(time.perf_counter() - started, self.engine_label)
+
+
+class TimedQueuePool(_TimedCheckout, QueuePool):
+    engine_label = "sync"
+
+
+class TimedAsyncQueuePool(_TimedCheckout, AsyncAdaptedQueuePool):
+    engine_label = "async"
+
+
+def _queue_pool_class(url: URL) -> type:
+    if url.get_dialect().is_async:
+        return TimedAsyncQueuePool if METRICS_ENABLED else AsyncAdaptedQueuePool
+    return TimedQueuePool if METRICS_ENABLED else QueuePool
+
+
+def engine_options(url: URL) -> dict:
+    """Keyword arguments for create_engine()/create_async_engine() for the given URL."""
+    poolclass = _queue_pool_class(url)
+    if not is_sqlite_url(url):
+        return {
+            "poolclass": poolclass,
+            "pool_size": DB_POOL_SIZE,
+            "max_overflow": DB_MAX_OVERFLOW,
+            "pool_timeout": DB_POOL_TIMEOUT,
+            "pool_recycle": DB_POOL_RECYCLE,
+            "pool_pre_ping": True,
+        }
+
+    options: dict = {"connect_args": {"check_same_thread": False, "timeout": SQLITE_BUSY_TIMEOUT_MS / 1000}}
+    if is_sqlite_memory_url(url):
+        # База в памяти живёт, пока открыто соединение, поэтому делим одно соединение на всех
+        options["poolclass"] = StaticPool
+    else:
+        options.update(
+            poolclass=poolclass, pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW, pool_timeout=DB_POOL_TIMEOUT
+        )
+    return options
+
+
+def register_sqlite_pragmas(engine: Engine) -> None:
+    """Apply sqlite_pragmas() on every new DBAPI connection of the engine."""
+    event.listen(engine, "connect", _apply_sqlite_pragmas)
+
+
+def create_db_engine(database_url: str = DATABASE_URL) -> Engine:
+    """Create a pooled engine; SQLite connections get WAL and the PRAGMA set from config."""
+    url = make_url(database_url)
+    db_engine = create_engine(url, **engine_options(url))
+    if is_sqlite_url(url):
+        register_sqlite_pragmas(db_engine)
+    if METRICS_ENABLED:
+        instrument_engine(db_engine)
+    if SQL_PROFILE:
+        profiler.instrument_engine(db_engine)
+    return db_engine
+
+
+_ASYNC_DRIVERS = {"sqlite": "sqlite+aiosqlite", "postgresql": "postgresql+asyncpg"}
+
+
+def async_database_url(database_url: str = DATABASE_URL) -> URL:
+    """Async-driver variant of a sync database URL (sqlite -> aiosqlite, postgresql -> asyncpg)."""
+    url = make_url(database_url)
+    driver = _ASYNC_DRIVERS.get(url.drivername)
+    return url.set(drivername=driver) if driver else url
+
+
+def create_async_db_engine(database_url: str = DATABASE_URL) -> AsyncEngine:
+    """Async counterpart of create_db_engine() with the same pool and PRAGMA settings."""
+    url = make_url(ASYNC_DATABASE_URL) if ASYNC_DATABASE_URL else async_database_url(database_url)
+    db_engine = create_async_engine(url, **engine_options(url))
+    if is_sqlite_url(url):
+        register_sqlite_pragmas(db_engine.sync_engine)
+    if METRICS_ENABLED:
+        instrument_engine(db_engine.sync_engine)
+    if SQL_PROFILE:
+        profiler.instrument_engine(db_engine.sync_engine)
+    return db_engine
+
+
+engine = create_db_engine()
+SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False, expire_on_commit=False)
 Base = declarative_base()
 
+# In-memory SQLite нельзя разделить между двумя движками, поэтому там остаёмся в синхронном режиме
+async_engine = create_async_db_engine() if DB_ASYNC and not is_sqlite_memory_url(engine.url) else None
+AsyncSessionLocal = (
+    async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False) if async_engine else None
+)
+
+DBSession = Union[Session, AsyncSession]
+T = TypeVar("T")
+
 
-def ensure_description_column_exists() -> None:
-    """Add the description column for books_of_month if it is missing."""
+def _unit_of_work(db: Session, fn: Callable[..., T], *args, **kwargs) -> T:
     try:
-        with engine.connect() as conn:
-            info = conn.execute("PRAGMA table_info(books_of_month)").fetchall()
-            columns = {row[1] for row in info}
-            if "description" not in columns:
-                conn.execute("ALTER TABLE books_of_month ADD COLUMN description TEXT")
-    except Exception:
-        # Silently ignore migrations in environments without permissions.
-        pass
+        result = fn(db, *args, **kwargs)
+    except BaseException:
+        db.rollback()
+        raise
+    # Закрываем транзакцию, чтобы соединение вернулось в пул, пока запрос ждёт следующего шага
+    db.commit()
+    return result
 
 
-def init_db() -> None:
-    """Initialize database schema and ensure compatibility tweaks."""
-    from . import models  # noqa: F401  (needed to register models)
+async def run_in_session(db: DBSession, fn: Callable[..., T], *args, **kwargs) -> T:
+    """Run fn(session, *args, **kwargs) written against the sync ORM API on either session type.
+
+    AsyncSession runs it through run_sync() on the event loop with the async driver;
+    a plain Session runs it in the threadpool, as sync endpoints did before. Each call
+    is its own transaction, so no pooled connection is held between calls.
+    """
+    if isinstance(db, AsyncSession):
+        return await db.run_sync(_unit_of_work, fn, *args, **kwargs)
+    return await run_in_threadpool(_unit_of_work, db, fn, *args, **kwargs)
+
 
-    Base.metadata.create_all(bind=engine)
-    ensure_description_column_exists()
+async def run_in_new_session(fn: Callable[..., T], *args, **kwargs) -> T:
+    """run_in_session() for background tasks that have no request-scoped session."""
+    if AsyncSessionLocal is not None:
+        async with AsyncSessionLocal() as db:
+            return await run_in_session(db, fn, *args, **kwargs)
+
+    db = SessionLocal()
+    try:
+        return await run_in_session(db, fn, *args, **kwargs)
+    finally:
+        await run_in_threadpool(db.close)
+
+
+def init_db() -> None:
+    """Apply pending schema migrations and detect optional features of the database."""
+    from .migrations import run_migrations
+    from .search import detect_books_fts
 
+    run_migrations(engine)
+    detect_books_fts(engine)
@@ -0,0 +1,268 @@
+"""Background delivery of verification codes through the msg.ovrx email/SMS API.
+
+send-code only persists the code and enqueues a job; a fixed set of sender
+threads drains the bounded queue over a pooled keep-alive requests.Session,
+retrying transient failures with exponential backoff and full jitter. While
+the circuit breaker is open, queued jobs wait for the provider (up to
+DELIVERY_MAX_AGE_SECONDS) instead of hammering it, and send-code answers 503
+rather than queueing more.
+"""
+
+import logging
+import queue
+import random
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .config import (
+    DELIVERY_BACKOFF_BASE_SECONDS,
+    DELIVERY_BACKOFF_MAX_SECONDS,
+    DELIVERY_BREAKER_RESET_SECONDS,
+    DELIVERY_BREAKER_THRESHOLD,
+    DELIVERY_MAX_AGE_SECONDS,
+    DELIVERY_MAX_ATTEMPTS,
+    DELIVERY_QUEUE_SIZE,
+    DELIVERY_TIMEOUT_SECONDS,
+    DELIVERY_WORKERS,
+    MSG_OVRX_API_KEY,
+    MSG_OVRX_BASE_URL,
+)
+from .metrics import delivery_provider_duration
+
+logger = logging.getLogger(__name__)
+
+# Значения-заглушки из .env.example: ключ не настроен, работаем в режиме разработки
+_PLACEHOLDER_KEYS = {"", "ТВОЙ_API_КЛЮЧ", "your_api_key_here"}
+
+
+def delivery_configured() -> bool:
+    return (MSG_OVRX_API_KEY or "") not in _PLACEHOLDER_KEYS
+
+
+class TransientDeliveryError(Exception):
+    """Timeout, connection or protocol error, 429 or 5xx: worth retrying."""
+
+
+class PermanentDeliveryError(Exception):
+    """Other 4xx: the request itself is wrong, retrying will not help."""
+
+
+class CircuitBreaker:
+    """Opens after failure_threshold consecutive failures; after reset_timeout one probe is let through."""
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self.opened_at is None:
+                return "closed"
+            if time.monotonic() - self.opened_at >= self.reset_timeout:
+                return "half-open"
+            return "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at < self.reset_timeout or self._probing:
+                return False
+            # Полуоткрытое состояние: пропускаем одну пробную отправку
+            self._probing = True
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._probing = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self._probing or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+            self._probing = False
+
+
+@dataclass
+class DeliveryJob:
+    channel: str  # "email" или "sms"
+    payload: dict
+    enqueued_at: float = field(default_factory=time.monotonic)
+
+
+class CodeDeliveryService:
+    def __init__(
+        self,
+        base_url: str = MSG_OVRX_BASE_URL,
+        api_key: str = MSG_OVRX_API_KEY,
+        workers: int = DELIVERY_WORKERS,
+        queue_size: int = DELIVERY_QUEUE_SIZE,
+        timeout: float = DELIVERY_TIMEOUT_SECONDS,
+        max_attempts: int = DELIVERY_MAX_ATTEMPTS,
+        backoff_base: float = DELIVERY_BACKOFF_BASE_SECONDS,
+        backoff_max: float = DELIVERY_BACKOFF_MAX_SECONDS,
+        max_age: float = DELIVERY_MAX_AGE_SECONDS,
+        breaker: Optional[CircuitBreaker] = None,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.api_key = api_key
+        self.workers = workers
+        self.timeout = timeout
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.max_age = max_age
+        self.breaker = breaker or CircuitBreaker(DELIVERY_BREAKER_THRESHOLD, DELIVERY_BREAKER_RESET_SECONDS)
+        self.stats = {"queued": 0, "rejected": 0, "sent": 0, "retried": 0, "failed": 0, "dropped": 0}
+        self._queue: "queue.Queue[Optional[DeliveryJob]]" = queue.Queue(maxsize=queue_size)
+        self._threads: list[threading.Thread] = []
+        self._stats_lock = threading.Lock()
+        self._session: Optional[requests.Session] = None
+
+    def _count(self, name: str) -> None:
+        with self._stats_lock:
+            self.stats[name] += 1
+
+    def start(self) -> None:
+        if self._threads:
+            return
+        session = requests.Session()
+        # Keep-alive пул на каждого отправителя; повторы делаем сами, с backoff
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.workers, max_retries=0)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        if self.api_key:
+            session.headers["Authorization"] = f"Bearer {self.api_key}"
+            session.headers["X-API-Key"] = self.api_key
+        self._session = session
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._worker, name=f"code-delivery-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Let the senders finish queued jobs, waiting up to timeout seconds in total."""
+        for _ in self._threads:
+            try:
+                self._queue.put(None, timeout=timeout)
+            except queue.Full:
+                break
+        deadline = time.monotonic() + timeout
+        for thread in self._threads:
+            thread.join(max(0.0, deadline - time.monotonic()))
+        self._threads.clear()
+        if self._session is not None:
+            self._session.close()
+            self._session = None
+
+    def accepting(self) -> bool:
+        return self.breaker.state != "open" and not self._queue.full()
+
+    def submit(self, channel: str, payload: dict) -> bool:
+        """Enqueue a code for delivery; False when the queue is full or the provider is down."""
+        if not self._threads or self.breaker.state == "open":
+            self._count("rejected")
+            return False
+        try:
+            self._queue.put_nowait(DeliveryJob(channel, payload))
+        except queue.Full:
+            self._count("rejected")
+            return False
+        self._count("queued")
+        return True
+
+    def queue_size(self) -> int:
+        return self._queue.qsize()
+
+    def _post(self, job: DeliveryJob) -> None:
+        started = time.perf_counter()
+        outcome = "transient"
+        try:
+            try:
+                response = self._session.post(
+                    f"{self.base_url}/auth-code/{job.channel}", json=job.payload, timeout=self.timeout
+                )
+            except requests.exceptions.RequestException as e:
+                # Таймаут, обрыв соединения, битый ответ: провайдер или сеть, а не наш запрос
+                raise TransientDeliveryError(str(e)) from e
+            if response.status_code == 429 or response.status_code >= 500:
+                raise TransientDeliveryError(f"HTTP {response.status_code}")
+            if response.status_code >= 400:
+                outcome = "permanent"
+                raise PermanentDeliveryError(f"HTTP {response.status_code}: {response.text[:200]}")
+            outcome = "ok"
+        finally:
+            delivery_provider_duration.observe(time.perf_counter() - started, job.channel, outcome)
+
+    def _backoff(self, attempt: int) -> float:
+        # Экспоненциальная задержка с полным джиттером, чтобы повторы не шли волной
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2**attempt))
+
+    def _deliver(self, job: DeliveryJob) -> None:
+        attempt = 0
+        while True:
+            if time.monotonic() - job.enqueued_at > self.max_age:
+                # Код к этому времени уже почти истёк, отправлять его бессмысленно
+                self._count("dropped")
+                logger.warning("Код (%s) не отправлен: провайдер был недоступен дольше %.0f с", job.channel, self.max_age)
+                return
+            if not self.breaker.allow():
+                # Провайдер недоступен: ждём, пока breaker пропустит пробную отправку
+                time.sleep(self.backoff_base)
+                continue
+            try:
+                self._post(job)
+            except PermanentDeliveryError as e:
+                # Ошибка в самом запросе не говорит о недоступности провайдера
+                self.breaker.record_success()
+                self._count("failed")
+                logger.error("Сервис отправки отклонил код (%s): %s", job.channel, e)
+                return
+            except TransientDeliveryError as e:
+                self.breaker.record_failure()
+                attempt += 1
+                if attempt >= self.max_attempts:
+                    self._count("failed")
+                    logger.error("Код (%s) не отправлен за %d попыток: %s", job.channel, self.max_attempts, e)
+                    return
+                self._count("retried")
+                time.sleep(self._backoff(attempt - 1))
+                continue
+            except Exception:
+                # Неожиданная ошибка тоже завершает пробную отправку, иначе breaker
+                # остался бы полуоткрытым с занятой пробой и больше ничего не пропускал
+                self.breaker.record_failure()
+                self._count("failed")
+                logger.exception("Код (%s) не отправлен", job.channel)
+                return
+            self.breaker.record_success()
+            self._count("sent")
+            return
+
+    def _worker(self) -> None:
+        while True:
+            job = self._queue.get()
+            try:
+                if job is None:
+                    return
+                self._deliver(job)
+            except Exception:
+                logger.exception("Ошибка отправителя кодов")
+            finally:
+                self._queue.task_done()
+
+
+delivery = CodeDeliveryService()
@@ -3,29 +3,64 @@
 from typing import Optional
 
 from fastapi import Depends, Header, HTTPException
-from sqlalchemy.orm import Session
-
-from .config import ADMIN_TOKEN
-from .database import SessionLocal
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import inspect
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, make_transient_to_detached
+
+from .cache import TTLCache
+from .config import ADMIN_TOKEN, USER_CACHE_SIZE, USER_CACHE_TTL_SECONDS
+from .database import AsyncSessionLocal, DBSession, SessionLocal, run_in_session
 from .enums import UserRole
 from .models import User
 from .security import verify_token
 
 
-def get_db():
+async def get_db():
+    # В асинхронном режиме отдаём AsyncSession, иначе обычную сессию (работа с ней идёт в пуле потоков)
+    if AsyncSessionLocal is not None:
+        async with AsyncSessionLocal() as db:
+            yield db
+        return
+
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
+        await run_in_threadpool(db.close)
 
 
-def require_admin(x_admin_token: Optional[str] = Header(default=None)):
+async def require_admin(x_admin_token: Optional[str] = Header(default=None)):
     if x_admin_token != ADMIN_TOKEN:
         raise HTTPException(status_code=401, detail="Недостаточно прав")
 
 
-def get_current_user(authorization: Optional[str] = Header(default=None), db: Session = Depends(get_db)):
+# Снимки строк users по id. Изменения пользователя обязаны вызывать invalidate_cached_user();
+# другие процессы uvicorn увидят изменение не позже чем через USER_CACHE_TTL_SECONDS.
+# Роль для админских маршрутов из кэша не берётся, см. require_admin_role().
+user_cache = TTLCache(max_size=USER_CACHE_SIZE, ttl=USER_CACHE_TTL_SECONDS)
+
+
+def invalidate_cached_user(user_id: int) -> None:
+    user_cache.invalidate(user_id)
+
+
+def _load_user(db: Session, user_id: int) -> Optional[User]:
+    user = db.query(User).filter(User.id == user_id).first()
+    if user:
+        user_cache.set(user_id, {attr.key: getattr(user, attr.key) for attr in inspect(User).column_attrs})
+    return user
+
+
+def _attach_cached_user(db: DBSession, snapshot: dict) -> User:
+    # merge(load=False) привязывает копию к сессии без SELECT, изменения всё так же уходят в UPDATE
+    user = User(**snapshot)
+    make_transient_to_detached(user)
+    session = db.sync_session if isinstance(db, AsyncSession) else db
+    return session.merge(user, load=False)
+
+
+async def get_bearer_token(authorization: Optional[str] = Header(default=None)) -> str:
     if not authorization:
         raise HTTPException(status_code=401, detail="Токен авторизации не предоставлен")
 
@@ -35,26 +70,49 @@ def get_current_user(authorization: Optional[str] = Header(default=None), db: Se
             raise HTTPException(status_code=401, detail="Неверная схема авторизации")
     except ValueError:
         raise HTTPException(status_code=401, detail="Неверный формат токена")
+    return token
+
 
+async def get_current_user(token: str = Depends(get_bearer_token), db: DBSession = Depends(get_db)):
     payload = verify_token(token)
     user_id = payload.get("user_id")
 
     if not user_id:
         raise HTTPException(status_code=401, detail="Неверный токен")
 
-    user = db.query(User).filter(User.id == user_id).first()
+    snapshot = user_cache.get(user_id)
+    if snapshot is not None:
+        user = _attach_cached_user(db, snapshot)
+    else:
+        user = await run_in_session(db, _load_user, user_id)
     if not user:
         raise HTTPException(status_code=401, detail="Пользователь не найден")
 
     return user
 
 
-def require_admin_role(current_user: User = Depends(get_current_user)):
-    # Проверяем роль из БД - сравниваем строки, так как в БД роль хранится как строка
-    user_role = (current_user.role or "").strip().lower()
+async def get_optional_user(
+    authorization: Optional[str] = Header(default=None), db: DBSession = Depends(get_db)
+) -> Optional[User]:
+    """Current user for endpoints that also serve anonymous visitors; a bad token is still 401."""
+    if not authorization:
+        return None
+    return await get_current_user(await get_bearer_token(authorization), db)
+
+
+def _load_role(db: Session, user_id: int) -> Optional[str]:
+    return db.query(User.role).filter(User.id == user_id).scalar()
+
+
+async def require_admin_role(current_user: User = Depends(get_current_user), db: DBSession = Depends(get_db)):
+    # Роль читаем из БД, а не из снимка user_cache: снятие роли в другом процессе действует сразу
+    role = await run_in_session(db, _load_role, current_user.id)
+    if role != current_user.role:
+        invalidate_cached_user(current_user.id)
+    # Сравниваем строки, так как в БД роль хранится как строка
+    user_role = (role or "").strip().lower()
     admin_role = UserRole.ADMIN.value.lower()
-    
+
     if user_role != admin_role:
         raise HTTPException(status_code=403, detail="Недостаточно прав. Требуется роль администратора")
     return current_user
-
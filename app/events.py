@@ -0,0 +1,229 @@
+"""In-process fan-out of book stats changes to Server-Sent Events subscribers.
+
+Each subscriber holds only the latest unsent stats of its book and an asyncio.Event,
+so an idle connection costs no timer and no queue: a slow client that has not
+read an update yet simply gets the newest one instead (counts supersede each
+other). A single broker-wide tick sends heartbeats to quiet subscribers and
+re-reads the stats of subscribed books, which also delivers changes committed
+by other workers.
+"""
+
+import asyncio
+import json
+import logging
+from typing import AsyncIterator, Optional
+
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+
+from .config import SSE_HEARTBEAT_SECONDS, SSE_MAX_SUBSCRIBERS, SSE_RETRY_MS
+from .database import run_in_new_session
+from .models import BookOfMonth
+from .stats import get_book_stats
+
+logger = logging.getLogger(__name__)
+
+
+class Subscriber:
+    __slots__ = ("book_id", "pending", "ping", "wakeup")
+
+    def __init__(self, book_id: int):
+        self.book_id = book_id
+        self.pending: Optional[dict] = None
+        self.ping = False
+        self.wakeup = asyncio.Event()
+
+
+class BookEventBroker:
+    """Subscribers by book id. Subscriptions and dispatch run on the event loop; publish() may be called from any thread."""
+
+    def __init__(self, max_subscribers: int = SSE_MAX_SUBSCRIBERS):
+        self.max_subscribers = max_subscribers
+        self._subscribers: dict[int, set[Subscriber]] = {}
+        self._latest: dict[int, dict] = {}
+        self._count = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._counters = {"published": 0, "delivered": 0, "conflated": 0, "heartbeats": 0}
+
+    def full(self) -> bool:
+        return self._count >= self.max_subscribers
+
+    def subscribe(self, book_id: int, snapshot: dict) -> Optional[Subscriber]:
+        """Register a subscriber, or return None when max_subscribers are already connected."""
+        # Проверка и регистрация идут одним шагом в цикле событий, без await между ними:
+        # одновременные подключения не превысят предел
+        if self.full():
+            return None
+        self._loop = asyncio.get_running_loop()
+        subscriber = Subscriber(book_id)
+        self._subscribers.setdefault(book_id, set()).add(subscriber)
+        # Снимок первого подписчика - точка отсчёта: тик не разошлёт его ещё раз как изменение
+        self._latest.setdefault(book_id, snapshot)
+        self._count += 1
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber) -> None:
+        subscribers = self._subscribers.get(subscriber.book_id)
+        if subscribers is None or subscriber not in subscribers:
+            return
+        subscribers.discard(subscriber)
+        self._count -= 1
+        if not subscribers:
+            del self._subscribers[subscriber.book_id]
+            self._latest.pop(subscriber.book_id, None)
+
+    def has_subscribers(self, book_id: int) -> bool:
+        return book_id in self._subscribers
+
+    def subscribed_books(self) -> list[int]:
+        return list(self._subscribers)
+
+    def latest(self, book_id: int) -> Optional[dict]:
+        return self._latest.get(book_id)
+
+    def publish(self, book_id: int, stats: dict) -> None:
+        """Hand new stats of a book to its subscribers; safe to call from worker threads."""
+        if self._loop is None or book_id not in self._subscribers:
+            return
+        # Рассылка всегда идёт в цикле событий: туда же пишут subscribe/unsubscribe
+        self._loop.call_soon_threadsafe(self._dispatch, book_id, stats)
+
+    def _dispatch(self, book_id: int, stats: dict) -> None:
+        subscribers = self._subscribers.get(book_id)
+        if not subscribers or self._latest.get(book_id) == stats:
+            return
+        self._latest[book_id] = stats
+        self._counters["published"] += 1
+        for subscriber in subscribers:
+            if subscriber.pending is not None:
+                # Клиент не успел прочитать прошлое значение - оно заменяется новым
+                self._counters["conflated"] += 1
+            subscriber.pending = stats
+            subscriber.wakeup.set()
+
+    def heartbeat(self) -> None:
+        for subscribers in self._subscribers.values():
+            for subscriber in subscribers:
+                if not subscriber.wakeup.is_set():
+                    subscriber.ping = True
+                    subscriber.wakeup.set()
+                    self._counters["heartbeats"] += 1
+
+    def stats(self) -> dict:
+        return {"subscribers": self._count, "books": len(self._subscribers), **self._counters}
+
+
+broker = BookEventBroker()
+# Загрузка снимка по книге, которую сейчас ждут одновременно подключившиеся клиенты
+_loading: dict[int, asyncio.Future] = {}
+
+
+def book_events(db: Session, book_ids: list[int]) -> list[dict]:
+    """Event payloads with the current stats of the books, in the given order."""
+    stats = get_book_stats(db, book_ids)
+    return [
+        {
+            "book_id": book_id,
+            "registered_count": row.registered_count if (row := stats.get(book_id)) else 0,
+            "avg_rating": row.avg_rating if row else None,
+            "rating_count": row.rating_count if row else 0,
+        }
+        for book_id in book_ids
+    ]
+
+
+def notify_book_changed(db: Session, book_id: int) -> None:
+    """Publish a book's stats after a committed change; no query while nobody listens."""
+    if broker.has_subscribers(book_id):
+        broker.publish(book_id, book_events(db, [book_id])[0])
+
+
+async def run_event_heartbeat(interval: float = SSE_HEARTBEAT_SECONDS) -> None:
+    """Every interval seconds re-read stats of subscribed books and ping quiet subscribers, until cancelled."""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            book_ids = broker.subscribed_books()
+            if book_ids:
+                for event in await run_in_new_session(book_events, book_ids):
+                    broker._dispatch(event["book_id"], event)
+            broker.heartbeat()
+        except Exception:
+            logger.exception("Ошибка рассылки heartbeat подписчикам событий")
+
+
+def _load_snapshot(db: Session, book_id: int) -> dict:
+    if db.query(BookOfMonth.id).filter(BookOfMonth.id == book_id).first() is None:
+        raise HTTPException(status_code=404, detail="Книга не найдена")
+    return book_events(db, [book_id])[0]
+
+
+async def book_snapshot(book_id: int) -> dict:
+    """Current stats of a book for a new subscriber.
+
+    While the book has subscribers the broker's latest value is used; concurrent first
+    subscribers (a reconnect storm after a restart) share one query instead of one each.
+    """
+    latest = broker.latest(book_id)
+    if latest is not None:
+        return latest
+    future = _loading.get(book_id)
+    if future is None:
+        future = _loading[book_id] = asyncio.ensure_future(run_in_new_session(_load_snapshot, book_id))
+        future.add_done_callback(lambda _: _loading.pop(book_id, None))
+    # shield: отключение одного клиента не должно отменять загрузку для остальных
+    return await asyncio.shield(future)
+
+
+def _format_event(stats: dict) -> str:
+    return f"event: stats\ndata: {json.dumps(stats, separators=(',', ':'))}\n\n"
+
+
+class _EventStreamResponse(StreamingResponse):
+    def __init__(self, subscriber: Subscriber, content: AsyncIterator[str], **kwargs):
+        super().__init__(content, **kwargs)
+        self.subscriber = subscriber
+
+    async def __call__(self, scope, receive, send) -> None:
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            # Клиент мог отключиться до начала потока, тогда finally генератора не выполнится
+            broker.unsubscribe(self.subscriber)
+
+
+async def _event_stream(subscriber: Subscriber) -> AsyncIterator[str]:
+    try:
+        # Изменение между чтением снимка и подпиской уже разослано другим - берём его значение
+        yield f"retry: {SSE_RETRY_MS}\n{_format_event(broker.latest(subscriber.book_id))}"
+        while True:
+            await subscriber.wakeup.wait()
+            subscriber.wakeup.clear()
+            stats, subscriber.pending = subscriber.pending, None
+            if stats is not None:
+                broker._counters["delivered"] += 1
+                yield _format_event(stats)
+            elif subscriber.ping:
+                yield ": ping\n\n"
+            subscriber.ping = False
+    finally:
+        broker.unsubscribe(subscriber)
+
+
+async def event_stream_response(book_id: int) -> StreamingResponse:
+    """text/event-stream response: the current stats first, then every change of them."""
+    # Быстрый отказ без запроса к базе; окончательно предел проверяет subscribe()
+    if broker.full():
+        raise HTTPException(status_code=503, detail="Слишком много подписчиков, попробуйте позже")
+    snapshot = await book_snapshot(book_id)
+    subscriber = broker.subscribe(book_id, snapshot)
+    if subscriber is None:
+        raise HTTPException(status_code=503, detail="Слишком много подписчиков, попробуйте позже")
+    return _EventStreamResponse(
+        subscriber,
+        _event_stream(subscriber),
+        media_type="text/event-stream",
+        # X-Accel-Buffering: nginx не должен копить события в буфере
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
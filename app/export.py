@@ -0,0 +1,107 @@
+"""Admin exports streamed as CSV, or rendered as XLSX, from a server-side cursor.
+
+Rows are read in batches of EXPORT_BATCH_SIZE from a dedicated connection and
+written out as they arrive, so memory does not grow with the number of rows.
+XLSX needs the optional xlsxwriter package; the workbook is written in its
+constant-memory mode to a temporary file in the threadpool and then sent.
+"""
+
+import csv
+import io
+import os
+import tempfile
+from typing import AsyncIterator, Iterator, Sequence
+
+from fastapi import HTTPException
+from fastapi.concurrency import iterate_in_threadpool, run_in_threadpool
+from fastapi.responses import FileResponse, StreamingResponse
+from sqlalchemy.sql import Select
+from starlette.background import BackgroundTask
+from starlette.responses import Response
+
+from .config import EXPORT_BATCH_SIZE
+from .database import async_engine, engine
+
+try:
+    import xlsxwriter
+except ImportError:  # xlsxwriter - необязательная зависимость
+    xlsxwriter = None
+
+# Предел строк листа Excel
+_XLSX_MAX_ROWS = 1_048_576
+
+XLSX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+
+class TooManyRowsError(Exception):
+    """The export does not fit on one XLSX sheet."""
+
+
+def _sync_batches(stmt: Select) -> Iterator[Sequence]:
+    with engine.connect() as conn:
+        result = conn.execution_options(yield_per=EXPORT_BATCH_SIZE).execute(stmt)
+        yield from result.partitions()
+
+
+async def stream_batches(stmt: Select) -> AsyncIterator[Sequence]:
+    """Rows of stmt in batches, read through a server-side cursor on its own connection."""
+    if async_engine is not None:
+        async with async_engine.connect() as conn:
+            result = await conn.stream(stmt.execution_options(yield_per=EXPORT_BATCH_SIZE))
+            async for rows in result.partitions():
+                yield rows
+        return
+    # Каждая пачка читается в пуле потоков, чтобы не блокировать цикл событий
+    async for rows in iterate_in_threadpool(_sync_batches(stmt)):
+        yield rows
+
+
+async def _csv_chunks(header: list[str], stmt: Select) -> AsyncIterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    # BOM нужен Excel, чтобы открыть UTF-8 с кириллицей без мастера импорта
+    buffer.write("\ufeff")
+    writer.writerow(header)
+    yield buffer.getvalue().encode()
+    async for rows in stream_batches(stmt):
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(rows)
+        yield buffer.getvalue().encode()
+
+
+def _write_xlsx(path: str, header: list[str], stmt: Select) -> None:
+    workbook = xlsxwriter.Workbook(path, {"constant_memory": True})
+    try:
+        sheet = workbook.add_worksheet()
+        sheet.write_row(0, 0, header)
+        row_no = 0
+        for rows in _sync_batches(stmt):
+            for row in rows:
+                row_no += 1
+                if row_no >= _XLSX_MAX_ROWS:
+                    raise TooManyRowsError(f"больше {_XLSX_MAX_ROWS - 1} строк")
+                sheet.write_row(row_no, 0, row)
+    finally:
+        workbook.close()
+
+
+async def export_response(fmt: str, filename: str, header: list[str], stmt: Select) -> Response:
+    """CSV streaming response or XLSX file response with the rows of stmt."""
+    disposition = {"Content-Disposition": f'attachment; filename="{filename}.{fmt}"'}
+    if fmt == "csv":
+        return StreamingResponse(_csv_chunks(header, stmt), media_type="text/csv; charset=utf-8", headers=disposition)
+
+    if xlsxwriter is None:
+        raise HTTPException(status_code=501, detail="Выгрузка в XLSX недоступна: не установлен пакет xlsxwriter")
+    fd, path = tempfile.mkstemp(prefix="nartbooks-export-", suffix=".xlsx")
+    os.close(fd)
+    try:
+        await run_in_threadpool(_write_xlsx, path, header, stmt)
+    except TooManyRowsError:
+        os.unlink(path)
+        raise HTTPException(status_code=413, detail="Слишком много строк для XLSX, выгрузите в CSV") from None
+    except BaseException:
+        os.unlink(path)
+        raise
+    return FileResponse(path, media_type=XLSX_MEDIA_TYPE, headers=disposition, background=BackgroundTask(os.unlink, path))
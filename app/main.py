@@ -1,14 +1,60 @@
 """FastAPI application factory."""
 
+import asyncio
+from contextlib import asynccontextmanager, suppress
+
 from fastapi import FastAPI
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 
-from .database import init_db
-from .routers import auth, books, favorites, general, meetings, users
+from .compression import CompressionMiddleware, available_encodings
+from .config import (
+    METRICS_ENABLED,
+    SQL_PROFILE,
+    SSE_HEARTBEAT_SECONDS,
+    SWEEP_INTERVAL_SECONDS,
+)
+from .database import async_engine, init_db
+from .delivery import delivery, delivery_configured
+from .events import run_event_heartbeat
+from .maintenance import run_sweeper
+from .metrics import MetricsMiddleware
+from .profiler import PROFILE_HEADERS, QueryProfilerMiddleware
+from .responses import DefaultJSONResponse
+from .revocation import refresh_revoked, run_revocation_refresher
+from .routers import auth, books, favorites, general, home, meetings, metrics, users
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Миграции применяются один раз при старте, а не при каждом импорте приложения
+    await run_in_threadpool(init_db)
+    # Просроченные коды и токены удаляются в фоне, а не на пути входа
+    tasks = [asyncio.create_task(run_sweeper())] if SWEEP_INTERVAL_SECONDS > 0 else []
+    # Отозванные токены загружаются до приёма запросов и затем подгружаются периодически
+    await refresh_revoked()
+    tasks.append(asyncio.create_task(run_revocation_refresher()))
+    # Heartbeat подписчиков SSE и подхват изменений счётчиков из других воркеров
+    if SSE_HEARTBEAT_SECONDS > 0:
+        tasks.append(asyncio.create_task(run_event_heartbeat()))
+    if delivery_configured():
+        delivery.start()
+    yield
+    # Даём отправителям дослать уже поставленные в очередь коды
+    await run_in_threadpool(delivery.stop)
+    for task in tasks:
+        task.cancel()
+        with suppress(asyncio.CancelledError):
+            await task
+    if async_engine is not None:
+        await async_engine.dispose()
 
-init_db()
 
-app = FastAPI(title="NartBooks API")
+app = FastAPI(title="NartBooks API", lifespan=lifespan, default_response_class=DefaultJSONResponse)
+
+# Сжатие JSON-ответов; тела из кэша ответов приходят уже сжатыми и проходят как есть
+if available_encodings():
+    app.add_middleware(CompressionMiddleware)
 
 # Настройка CORS для работы фронтенда
 app.add_middleware(
@@ -17,8 +63,18 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Заголовки профилировщика SQL должны быть видны фронтенду с другого origin
+    expose_headers=PROFILE_HEADERS if SQL_PROFILE else [],
 )
 
+# Профилирование SQL по запросам: X-DB-Query-Count, X-DB-Time-Ms и планы медленных запросов
+if SQL_PROFILE:
+    app.add_middleware(QueryProfilerMiddleware)
+
+# Метрики запросов добавляются последними, чтобы время включало сжатие и CORS
+if METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
 app.include_router(general.router)
 app.include_router(auth.router)
 app.include_router(books.router)
@@ -26,4 +82,7 @@ app.include_router(favorites.router)
 # Роутер users без префикса, так как /me должен быть доступен напрямую
 app.include_router(users.router)
 app.include_router(meetings.router)
+app.include_router(home.router)
+if METRICS_ENABLED:
+    app.include_router(metrics.router)
 
@@ -0,0 +1,92 @@
+"""Periodic background maintenance: purging expired auth codes, tokens and rate-limit buckets."""
+
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, inspect, select
+from sqlalchemy.orm import Session
+
+from .config import (
+    AUTH_CODE_RETENTION_MINUTES,
+    SWEEP_BATCH_SIZE,
+    SWEEP_INTERVAL_SECONDS,
+)
+from .database import run_in_new_session
+from .models import AuthCode, AuthToken, RateLimit
+
+logger = logging.getLogger(__name__)
+
+# Итоги последней очистки (для диагностики)
+last_sweep: dict = {}
+
+
+def _delete_batch(db: Session, model, condition, batch_size: int) -> int:
+    # Один DELETE на пачку: ключи выбираются подзапросом с LIMIT, строки в Python не загружаются
+    pk = inspect(model).primary_key[0]
+    ids = select(pk).where(condition).limit(batch_size).scalar_subquery()
+    return db.execute(delete(model).where(pk.in_(ids)).execution_options(synchronize_session=False)).rowcount
+
+
+def _expired_codes_condition():
+    cutoff = datetime.now() - timedelta(minutes=AUTH_CODE_RETENTION_MINUTES)
+    return AuthCode.created_at < cutoff
+
+
+def _used_codes_condition():
+    # Использованные коды уже не могут пройти проверку в verify-code
+    return AuthCode.is_used == 1
+
+
+def _expired_tokens_condition():
+    # Отозванные, но ещё не истёкшие токены остаются: по ним воркеры восстанавливают список отзыва
+    return AuthToken.expires_at < datetime.now()
+
+
+async def sweep_expired_auth(batch_size: int = SWEEP_BATCH_SIZE) -> dict:
+    """Delete expired or used auth codes, expired auth tokens and refilled rate-limit buckets in batches.
+
+    Returns the number of rows removed per table and the time spent.
+    """
+    started = time.perf_counter()
+    removed = {}
+    # Истёкшие и использованные коды удаляются отдельными DELETE: каждое условие идёт по своему
+    # индексу, а OR двух условий SQLite выполняет полным просмотром таблицы
+    for name, model, condition in (
+        ("auth_codes", AuthCode, _expired_codes_condition()),
+        ("auth_codes", AuthCode, _used_codes_condition()),
+        ("auth_tokens", AuthToken, _expired_tokens_condition()),
+        # Строка корзины с истёкшим expires_at равносильна полной корзине
+        ("rate_limits", RateLimit, RateLimit.expires_at < time.time()),
+    ):
+        removed.setdefault(name, 0)
+        while True:
+            # Каждая пачка - отдельная короткая транзакция, чтобы не держать блокировку записи SQLite
+            count = await run_in_new_session(_delete_batch, model, condition, batch_size)
+            removed[name] += count
+            if count < batch_size:
+                break
+
+    result = {**removed, "seconds": round(time.perf_counter() - started, 3)}
+    last_sweep.clear()
+    last_sweep.update(result, finished_at=datetime.now().isoformat())
+    return result
+
+
+async def run_sweeper(interval: float = SWEEP_INTERVAL_SECONDS) -> None:
+    """Run sweep_expired_auth() every interval seconds until cancelled."""
+    while True:
+        try:
+            result = await sweep_expired_auth()
+            logger.info(
+                "Очистка auth: удалено кодов %d, токенов %d, корзин лимитов %d за %.3f с",
+                result["auth_codes"],
+                result["auth_tokens"],
+                result["rate_limits"],
+                result["seconds"],
+            )
+        except Exception:
+            # Ошибка очистки не должна останавливать фоновую задачу
+            logger.exception("Ошибка фоновой очистки auth_codes/auth_tokens/rate_limits")
+        await asyncio.sleep(interval)
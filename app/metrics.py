@@ -0,0 +1,216 @@
+"""Prometheus metrics: a small in-process registry, the request middleware and SQLAlchemy hooks.
+
+Request metrics are labelled with the route template (/books/{book_id}), never the
+raw path, so the number of series stays bounded. Recording on the hot path is a
+dict lookup and a few additions under one lock; sizes of caches, the connection
+pool and background workers are read only when /metrics is scraped.
+"""
+
+import bisect
+import threading
+import time
+from contextvars import ContextVar
+from typing import Iterable, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 50, 100)
+
+_lock = threading.Lock()
+_registry: list["_Metric"] = []
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+def _format_labels(names: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    type = ""
+
+    def __init__(self, name: str, documentation: str, labels: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._values: dict[tuple, object] = {}
+        _registry.append(self)
+
+    def clear(self) -> None:
+        with _lock:
+            self._values.clear()
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        with _lock:
+            items = sorted(self._values.items(), key=lambda item: tuple(map(str, item[0])))
+            lines.extend(self._render_sample(labels, value) for labels, value in items)
+        return lines
+
+    def _render_sample(self, labels: tuple, value) -> str:
+        return f"{self.name}{_format_labels(self.labels, labels)} {_format_value(value)}"
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def inc(self, *labels, amount: float = 1) -> None:
+        with _lock:
+            self._inc(labels, amount)
+
+    def _inc(self, labels: tuple, amount: float) -> None:
+        # Вызывается под _lock: так запись запроса обновляет несколько метрик за один захват
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def set(self, value: float, *labels) -> None:
+        """For counters kept elsewhere (cache hits, delivery stats), copied in at scrape time."""
+        with _lock:
+            self._values[labels] = value
+
+
+class Gauge(Counter):
+    type = "gauge"
+
+    def dec(self, *labels, amount: float = 1) -> None:
+        self.inc(*labels, amount=-amount)
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labels: Iterable[str] = (), buckets: tuple = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, *labels) -> None:
+        with _lock:
+            self._observe(labels, value)
+
+    def _observe(self, labels: tuple, value: float) -> None:
+        # Наблюдение попадает только в один бакет; накопительные суммы считаются при выдаче
+        state = self._values.get(labels)
+        if state is None:
+            state = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        state[0][bisect.bisect_left(self.buckets, value)] += 1
+        state[1] += value
+        state[2] += 1
+
+    def _render_sample(self, labels: tuple, state) -> str:
+        counts, total, count = state
+        lines = []
+        cumulative = 0
+        for bound, bucket_count in zip((*self.buckets, float("inf")), counts):
+            cumulative += bucket_count
+            le = f'le="{_format_value(float(bound))}"'
+            lines.append(f"{self.name}_bucket{_format_labels(self.labels, labels, le)} {cumulative}")
+        lines.append(f"{self.name}_sum{_format_labels(self.labels, labels)} {_format_value(total)}")
+        lines.append(f"{self.name}_count{_format_labels(self.labels, labels)} {count}")
+        return "\n".join(lines)
+
+
+def render_metrics() -> str:
+    """All registered metrics in the Prometheus text exposition format (version 0.0.4)."""
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+http_requests = Counter("http_requests_total", "HTTP requests by route template and status.", ("method", "route", "status"))
+http_request_duration = Histogram(
+    "http_request_duration_seconds", "HTTP request latency up to the last body byte.", ("method", "route")
+)
+http_requests_in_flight = Gauge(
+    "http_requests_in_flight", "HTTP requests being processed, open SSE streams included."
+)
+http_request_db_queries = Histogram(
+    "http_request_db_queries", "SQL statements executed per HTTP request.", ("method", "route"), QUERY_COUNT_BUCKETS
+)
+db_pool_wait = Histogram(
+    "db_pool_checkout_wait_seconds",
+    "Time to get a connection from the pool, opening a new one included.",
+    ("engine",),
+    QUERY_LATENCY_BUCKETS,
+)
+db_pool_timeouts = Counter("db_pool_checkout_timeouts_total", "Pool checkouts that gave up after DB_POOL_TIMEOUT.", ("engine",))
+delivery_provider_duration = Histogram(
+    "code_delivery_provider_request_duration_seconds",
+    "Latency of msg.ovrx requests by channel and outcome (ok, transient, permanent).",
+    ("channel", "outcome"),
+)
+
+# Счётчик запросов к БД текущего HTTP-запроса. Пул потоков и run_sync копируют контекст,
+# поэтому обработчик событий движка видит список, созданный в middleware, и увеличивает
+# его без блокировки: запросы к БД одного HTTP-запроса идут по очереди.
+_request_queries: ContextVar[Optional[list]] = ContextVar("request_queries", default=None)
+
+
+def route_template(scope: Scope) -> str:
+    route = scope.get("route")
+    # Ненайденные пути сводятся к одной метке, иначе каждый 404 давал бы новый ряд
+    return getattr(route, "path", None) or "unmatched"
+
+
+def _record_request(method: str, route: str, status: int, elapsed: float, queries: int) -> None:
+    with _lock:
+        http_requests_in_flight._inc((), -1)
+        http_requests._inc((method, route, str(status)), 1)
+        http_request_duration._observe((method, route), elapsed)
+        http_request_db_queries._observe((method, route), queries)
+
+
+class MetricsMiddleware:
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        queries = [0]
+        token = _request_queries.set(queries)
+        http_requests_in_flight.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started
+            _request_queries.reset(token)
+            _record_request(scope["method"], route_template(scope), status, elapsed, queries[0])
+
+
+def _count_query(conn, cursor, statement, parameters, context, executemany) -> None:
+    queries = _request_queries.get()
+    if queries is not None:
+        queries[0] += 1
+
+
+def instrument_engine(engine: Engine) -> None:
+    """Count SQL statements of the engine per HTTP request (for an AsyncEngine pass .sync_engine)."""
+    event.listen(engine, "before_cursor_execute", _count_query)
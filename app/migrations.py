@@ -0,0 +1,359 @@
+"""Versioned schema migrations recorded in the schema_migrations table.
+
+Each migration runs once, in its own transaction, in version order. A worker
+claims a version by inserting its schema_migrations row first, so when several
+workers start at once only one of them applies it; the others skip it. The
+upgrade functions are still written to be idempotent (IF NOT EXISTS, column
+checks), because databases created before this table existed already have
+part of the schema.
+"""
+
+import logging
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, Optional
+
+from sqlalchemy import (
+    BigInteger,
+    Column,
+    Float,
+    Index,
+    Integer,
+    MetaData,
+    String,
+    Table,
+    Text,
+    insert,
+    inspect,
+    select,
+    text,
+)
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from .timestamps import to_epoch_us
+
+logger = logging.getLogger(__name__)
+
+schema_migrations = Table(
+    "schema_migrations",
+    MetaData(),
+    Column("version", Integer, primary_key=True),
+    Column("name", String, nullable=False),
+    Column("applied_at", String, nullable=False),
+)
+
+
+@dataclass(frozen=True)
+class Migration:
+    version: int
+    name: str
+    upgrade: Callable[[Connection], None]
+
+
+MIGRATIONS: list[Migration] = []
+
+
+def migration(version: int, name: str):
+    def register(upgrade: Callable[[Connection], None]):
+        MIGRATIONS.append(Migration(version, name, upgrade))
+        return upgrade
+
+    return register
+
+
+def _add_column(conn: Connection, table: str, column: str, ddl_type: str) -> None:
+    if column not in {c["name"] for c in inspect(conn).get_columns(table)}:
+        conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl_type}"))
+
+
+# Схема на момент появления миграций. Копия, а не модели: новая база проходит те же шаги,
+# что и обновляемая, а последующие миграции не должны подстраиваться под итоговую схему
+_initial_tables = MetaData()
+
+Table(
+    "users",
+    _initial_tables,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("first_name", String, nullable=False),
+    Column("last_name", String, nullable=False),
+    Column("email", String, unique=True, index=True, nullable=False),
+    Column("phone", String, nullable=True),
+    Column("birthdate", String, nullable=True),
+    Column("role", String, nullable=False),
+    Column("fav_authors", Text),
+    Column("fav_genres", Text),
+    Column("fav_books", Text),
+    Column("wanted_books", Text),
+    Column("created_at", String, nullable=True),
+)
+Table(
+    "books_of_month",
+    _initial_tables,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("title", String, nullable=False),
+    Column("author", String, nullable=False),
+    Column("date", String, nullable=False),
+    Column("location", String, nullable=False),
+    Column("description", Text, nullable=True),
+    Column("is_current", Integer),
+)
+Table(
+    "auth_codes",
+    _initial_tables,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("identifier", String, nullable=False, index=True),
+    Column("code", String, nullable=False),
+    Column("created_at", String, nullable=False),
+    Column("is_used", Integer),
+)
+Table(
+    "auth_tokens",
+    _initial_tables,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("user_id", Integer, nullable=False, index=True),
+    Column("token", String, nullable=False, unique=True, index=True),
+    Column("created_at", String, nullable=False),
+    Column("expires_at", String, nullable=False),
+    Column("is_active", Integer),
+    Column("revoked_at", String, nullable=True, index=True),
+)
+Table(
+    "favorites",
+    _initial_tables,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("user_id", Integer, nullable=False, index=True),
+    Column("book_id", Integer, nullable=False, index=True),
+    Column("created_at", String, nullable=False),
+)
+Table(
+    "reviews",
+    _initial_tables,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("user_id", Integer, nullable=False, index=True),
+    Column("book_id", Integer, nullable=False, index=True),
+    Column("rating", Integer, nullable=False),
+    Column("comment", Text, nullable=True),
+    Column("created_at", String, nullable=False),
+)
+Table(
+    "meeting_registrations",
+    _initial_tables,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("user_id", Integer, nullable=False, index=True),
+    Column("book_id", Integer, nullable=False, index=True),
+    Column("registered_at", String, nullable=False),
+    Column("status", String),
+)
+Table(
+    "book_stats",
+    _initial_tables,
+    Column("book_id", Integer, primary_key=True),
+    Column("rating_sum", Integer, nullable=False),
+    Column("rating_count", Integer, nullable=False),
+    Column("rating_1", Integer, nullable=False),
+    Column("rating_2", Integer, nullable=False),
+    Column("rating_3", Integer, nullable=False),
+    Column("rating_4", Integer, nullable=False),
+    Column("rating_5", Integer, nullable=False),
+    Column("registered_count", Integer, nullable=False),
+)
+Table(
+    "rate_limits",
+    _initial_tables,
+    Column("key", String, primary_key=True),
+    Column("tokens", Float, nullable=False),
+    Column("updated_at", Float, nullable=False),
+    Column("expires_at", Float, nullable=False, index=True),
+)
+
+
+@migration(1, "initial_schema")
+def _initial_schema(conn: Connection) -> None:
+    # Таблицы, которых ещё нет; существующие create_all не трогает
+    _initial_tables.create_all(conn)
+    # Колонки, добавленные после создания первых баз (раньше - ensure_*_column_exists при импорте)
+    _add_column(conn, "books_of_month", "description", "TEXT")
+    _add_column(conn, "auth_tokens", "revoked_at", "VARCHAR")
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_auth_tokens_revoked_at ON auth_tokens (revoked_at)"))
+
+
+@migration(2, "book_stats_backfill")
+def _book_stats_backfill(conn: Connection) -> None:
+    from .stats import rebuild_book_stats
+
+    # Счётчики по уже накопленным отзывам и записям; дальше они ведутся инкрементально
+    rebuild_book_stats(Session(bind=conn))
+
+
+@migration(3, "books_fts")
+def _books_fts(conn: Connection) -> None:
+    from .search import create_books_fts
+
+    create_books_fts(conn)
+
+
+@migration(4, "hot_path_indexes")
+def _hot_path_indexes(conn: Connection) -> None:
+    # Дубликаты избранного не дали бы создать уникальный индекс: оставляем самую раннюю запись
+    conn.execute(
+        text(
+            "DELETE FROM favorites WHERE id NOT IN "
+            "(SELECT MIN(id) FROM favorites GROUP BY user_id, book_id)"
+        )
+    )
+    for statement in (
+        "CREATE UNIQUE INDEX IF NOT EXISTS ux_favorites_user_book ON favorites (user_id, book_id)",
+        "CREATE INDEX IF NOT EXISTS ix_reviews_book_id_id ON reviews (book_id, id)",
+        "CREATE INDEX IF NOT EXISTS ix_meeting_registrations_user_book_status "
+        "ON meeting_registrations (user_id, book_id, status)",
+        "CREATE INDEX IF NOT EXISTS ix_meeting_registrations_book_status_registered_at "
+        "ON meeting_registrations (book_id, status, registered_at)",
+        "CREATE INDEX IF NOT EXISTS ix_users_phone ON users (phone)",
+    ):
+        conn.execute(text(statement))
+    # Одиночные индексы, которые покрываются составными по тому же первому столбцу
+    for name in ("ix_reviews_book_id", "ix_meeting_registrations_book_id"):
+        conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+
+
+# Таблицы с временем в микросекундах эпохи, какими их делает миграция 5; как и
+# _initial_tables, это копия, а не модели
+_epoch_tables = MetaData()
+
+Table(
+    "auth_codes",
+    _epoch_tables,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("identifier", String, nullable=False, index=True),
+    Column("code", String, nullable=False),
+    Column("created_at", BigInteger, nullable=False, index=True),
+    Column("is_used", Integer),
+)
+Table(
+    "auth_tokens",
+    _epoch_tables,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("user_id", Integer, nullable=False, index=True),
+    Column("token", String, nullable=False, unique=True, index=True),
+    Column("created_at", BigInteger, nullable=False),
+    Column("expires_at", BigInteger, nullable=False, index=True),
+    Column("is_active", Integer),
+    Column("revoked_at", BigInteger, nullable=True, index=True),
+)
+Table(
+    "favorites",
+    _epoch_tables,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("user_id", Integer, nullable=False, index=True),
+    Column("book_id", Integer, nullable=False, index=True),
+    Column("created_at", BigInteger, nullable=False),
+    Index("ux_favorites_user_book", "user_id", "book_id", unique=True),
+    Index("ix_favorites_user_id_created_at", "user_id", "created_at"),
+)
+Table(
+    "reviews",
+    _epoch_tables,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("user_id", Integer, nullable=False, index=True),
+    Column("book_id", Integer, nullable=False),
+    Column("rating", Integer, nullable=False),
+    Column("comment", Text, nullable=True),
+    Column("created_at", BigInteger, nullable=False),
+    Index("ix_reviews_book_id_id", "book_id", "id"),
+    Index("ix_reviews_book_id_created_at", "book_id", "created_at"),
+)
+Table(
+    "meeting_registrations",
+    _epoch_tables,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("user_id", Integer, nullable=False, index=True),
+    Column("book_id", Integer, nullable=False),
+    Column("registered_at", BigInteger, nullable=False),
+    Column("status", String),
+    Index("ix_meeting_registrations_user_book_status", "user_id", "book_id", "status"),
+    Index("ix_meeting_registrations_book_status_registered_at", "book_id", "status", "registered_at"),
+    Index("ix_meeting_registrations_user_registered_at", "user_id", "registered_at"),
+)
+
+
+def _iso_to_epoch_us(value):
+    return None if value is None else to_epoch_us(value)
+
+
+def _rebuild_sqlite_table(conn: Connection, table: Table, converted: list[str]) -> None:
+    # SQLite не меняет тип колонки через ALTER: пересоздаём таблицу по новому определению и переливаем строки
+    legacy = f"{table.name}__legacy"
+    existing = {column["name"] for column in inspect(conn).get_columns(table.name)}
+    for index in inspect(conn).get_indexes(table.name):
+        conn.execute(text(f'DROP INDEX "{index["name"]}"'))
+    conn.execute(text(f"ALTER TABLE {table.name} RENAME TO {legacy}"))
+    table.create(conn)
+    columns = [column.name for column in table.columns if column.name in existing]
+    values = [f"iso_to_epoch_us({name})" if name in converted else name for name in columns]
+    conn.execute(
+        text(f"INSERT INTO {table.name} ({', '.join(columns)}) SELECT {', '.join(values)} FROM {legacy}")
+    )
+    conn.execute(text(f"DROP TABLE {legacy}"))
+
+
+@migration(5, "epoch_timestamps")
+def _epoch_timestamps(conn: Connection) -> None:
+    if conn.dialect.name == "sqlite":
+        conn.connection.driver_connection.create_function(
+            "iso_to_epoch_us", 1, _iso_to_epoch_us, deterministic=True
+        )
+    for table in _epoch_tables.sorted_tables:
+        columns = [column.name for column in table.columns if isinstance(column.type, BigInteger)]
+        # На базах, созданных уже с этой схемой, колонки целочисленные - переводить нечего
+        types = {column["name"]: column["type"] for column in inspect(conn).get_columns(table.name)}
+        converted = [name for name in columns if not isinstance(types.get(name), Integer)]
+        if conn.dialect.name == "sqlite":
+            if converted:
+                _rebuild_sqlite_table(conn, table, converted)
+            continue
+        for name in converted:
+            conn.execute(
+                text(
+                    f"ALTER TABLE {table.name} ALTER COLUMN {name} TYPE BIGINT "
+                    f"USING (EXTRACT(EPOCH FROM {name}::timestamp) * 1000000)::bigint"
+                )
+            )
+        for index in table.indexes:
+            index.create(conn, checkfirst=True)
+
+
+@migration(6, "auth_codes_is_used_index")
+def _auth_codes_is_used_index(conn: Connection) -> None:
+    # Очистка удаляет использованные коды отдельным DELETE по is_used
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_auth_codes_is_used ON auth_codes (is_used)"))
+
+
+def applied_versions(engine: Engine) -> set[int]:
+    schema_migrations.create(engine, checkfirst=True)
+    with engine.connect() as conn:
+        return set(conn.execute(select(schema_migrations.c.version)).scalars())
+
+
+def run_migrations(engine: Engine, target: Optional[int] = None) -> list[int]:
+    """Apply pending migrations up to target (all by default); returns the versions applied."""
+    done = applied_versions(engine)
+    applied = []
+    for item in sorted(MIGRATIONS, key=lambda m: m.version):
+        if item.version in done or (target is not None and item.version > target):
+            continue
+        try:
+            with engine.begin() as conn:
+                # Сначала занимаем версию: параллельно стартующий воркер получит IntegrityError и пропустит её
+                conn.execute(
+                    insert(schema_migrations).values(
+                        version=item.version, name=item.name, applied_at=datetime.now().isoformat()
+                    )
+                )
+                item.upgrade(conn)
+        except IntegrityError:
+            continue
+        logger.info("Применена миграция %d_%s", item.version, item.name)
+        applied.append(item.version)
+    return applied
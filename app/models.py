@@ -1,9 +1,10 @@
 """SQLAlchemy models."""
 
-from sqlalchemy import Column, Integer, String, Text
+from sqlalchemy import Column, Float, Index, Integer, String, Text
 
 from .database import Base
 from .enums import UserRole
+from .timestamps import EpochTimestamp
 
 
 class User(Base):
@@ -13,7 +14,7 @@ class User(Base):
     first_name = Column(String, nullable=False)
     last_name = Column(String, nullable=False)
     email = Column(String, unique=True, index=True, nullable=False)
-    phone = Column(String, nullable=True)
+    phone = Column(String, nullable=True, index=True)
     birthdate = Column(String, nullable=True)  # В БД используется birthdate без подчёркивания
     role = Column(String, nullable=False, default=UserRole.USER)
     fav_authors = Column(Text)
@@ -59,8 +60,8 @@ class AuthCode(Base):
     id = Column(Integer, primary_key=True, index=True)
     identifier = Column(String, nullable=False, index=True)
     code = Column(String, nullable=False)
-    created_at = Column(String, nullable=False)
-    is_used = Column(Integer, default=0)
+    created_at = Column(EpochTimestamp, nullable=False, index=True)
+    is_used = Column(Integer, default=0, index=True)
 
 
 class AuthToken(Base):
@@ -69,42 +70,102 @@ class AuthToken(Base):
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, nullable=False, index=True)
     token = Column(String, nullable=False, unique=True, index=True)
-    created_at = Column(String, nullable=False)
-    expires_at = Column(String, nullable=False)
+    created_at = Column(EpochTimestamp, nullable=False)
+    expires_at = Column(EpochTimestamp, nullable=False, index=True)
     is_active = Column(Integer, default=1)
+    # Время отзыва (logout или отзыв всех сессий админом); по нему воркеры подгружают новые отзывы
+    revoked_at = Column(EpochTimestamp, nullable=True, index=True)
 
 
 class Favorite(Base):
     """User's favorite books."""
 
     __tablename__ = "favorites"
+    __table_args__ = (
+        # Одна книга в избранном пользователя один раз; индекс же отвечает на «есть ли книга в избранном»
+        Index("ux_favorites_user_book", "user_id", "book_id", unique=True),
+        # Фильтр since/until по избранному пользователя
+        Index("ix_favorites_user_id_created_at", "user_id", "created_at"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, nullable=False, index=True)
     book_id = Column(Integer, nullable=False, index=True)
-    created_at = Column(String, nullable=False)
+    created_at = Column(EpochTimestamp, nullable=False)
 
 
 class Review(Base):
     """User reviews for books."""
 
     __tablename__ = "reviews"
+    __table_args__ = (
+        # Отзывы книги, отсортированные по id (keyset-пагинация), без отдельной сортировки
+        Index("ix_reviews_book_id_id", "book_id", "id"),
+        # Фильтр since/until по отзывам книги
+        Index("ix_reviews_book_id_created_at", "book_id", "created_at"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, nullable=False, index=True)
-    book_id = Column(Integer, nullable=False, index=True)
+    book_id = Column(Integer, nullable=False)
     rating = Column(Integer, nullable=False)
     comment = Column(Text, nullable=True)
-    created_at = Column(String, nullable=False)
+    created_at = Column(EpochTimestamp, nullable=False)
 
 
 class MeetingRegistration(Base):
     """User registration for book meetings."""
 
     __tablename__ = "meeting_registrations"
+    __table_args__ = (
+        # Проверка «записан ли пользователь на встречу» и список встреч пользователя
+        Index("ix_meeting_registrations_user_book_status", "user_id", "book_id", "status"),
+        # Участники встречи по статусу в порядке записи
+        Index("ix_meeting_registrations_book_status_registered_at", "book_id", "status", "registered_at"),
+        # Фильтр since/until по встречам пользователя
+        Index("ix_meeting_registrations_user_registered_at", "user_id", "registered_at"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
+    # Одиночный индекс по user_id оставлен: он отдаёт встречи пользователя уже в порядке id
     user_id = Column(Integer, nullable=False, index=True)
-    book_id = Column(Integer, nullable=False, index=True)
-    registered_at = Column(String, nullable=False)
+    book_id = Column(Integer, nullable=False)
+    registered_at = Column(EpochTimestamp, nullable=False)
     status = Column(String, default="registered")  # "registered" or "cancelled"
+
+
+class BookStats(Base):
+    """Per-book counters maintained incrementally by app.stats."""
+
+    __tablename__ = "book_stats"
+
+    book_id = Column(Integer, primary_key=True)
+    rating_sum = Column(Integer, nullable=False, default=0)
+    rating_count = Column(Integer, nullable=False, default=0)
+    # Гистограмма оценок 1..5
+    rating_1 = Column(Integer, nullable=False, default=0)
+    rating_2 = Column(Integer, nullable=False, default=0)
+    rating_3 = Column(Integer, nullable=False, default=0)
+    rating_4 = Column(Integer, nullable=False, default=0)
+    rating_5 = Column(Integer, nullable=False, default=0)
+    registered_count = Column(Integer, nullable=False, default=0)
+
+    @property
+    def avg_rating(self):
+        return self.rating_sum / self.rating_count if self.rating_count else None
+
+    @property
+    def rating_histogram(self):
+        return {str(r): getattr(self, f"rating_{r}") for r in range(1, 6)}
+
+
+class RateLimit(Base):
+    """Token bucket state of app.ratelimit's database backend, shared by all workers."""
+
+    __tablename__ = "rate_limits"
+
+    key = Column(String, primary_key=True)
+    tokens = Column(Float, nullable=False)
+    updated_at = Column(Float, nullable=False)  # Unix time, с
+    # Когда корзина снова станет полной: после этого строку можно удалить
+    expires_at = Column(Float, nullable=False, index=True)
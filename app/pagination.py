@@ -0,0 +1,147 @@
+"""Pagination helpers: classic page/limit OFFSET paging alongside opaque keyset cursors."""
+
+import base64
+import binascii
+import json
+import threading
+from dataclasses import dataclass
+from typing import Any, Hashable, Optional
+
+from fastapi import HTTPException
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import Query
+from sqlalchemy.sql.elements import ColumnElement
+
+from .cache import TTLCache
+from .config import TOTALS_CACHE_SIZE, TOTALS_CACHE_TTL_SECONDS
+
+
+@dataclass(frozen=True)
+class SortKey:
+    """One column of a keyset ordering; the last key must be unique (normally the id)."""
+
+    name: str
+    column: ColumnElement
+    descending: bool = True
+
+
+@dataclass
+class Page:
+    items: list
+    total: Optional[int]
+    next_cursor: Optional[str]
+    has_more: bool
+
+
+# Кэш total по (пространство, поколение, фильтр). Запись в таблицу вызывает invalidate_totals(),
+# которая сдвигает поколение; другие процессы увидят новое значение не позже чем через TTL.
+totals_cache = TTLCache(max_size=TOTALS_CACHE_SIZE, ttl=TOTALS_CACHE_TTL_SECONDS)
+_generations: dict[str, int] = {}
+_generations_lock = threading.Lock()
+
+
+def invalidate_totals(namespace: str) -> None:
+    with _generations_lock:
+        _generations[namespace] = _generations.get(namespace, 0) + 1
+
+
+def _totals_key(total_key: Optional[tuple]) -> Optional[Hashable]:
+    if not total_key:
+        return None
+    namespace = total_key[0]
+    return (namespace, _generations.get(namespace, 0), *total_key[1:])
+
+
+def encode_cursor(sort_keys: list[SortKey], values: list[Any]) -> str:
+    payload = {"s": [key.name for key in sort_keys], "v": values}
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def decode_cursor(sort_keys: list[SortKey], cursor: str) -> list[Any]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = json.loads(raw)
+        values = payload["v"]
+        if payload["s"] != [key.name for key in sort_keys] or len(values) != len(sort_keys):
+            raise ValueError
+    except (binascii.Error, ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Неверный курсор пагинации")
+    return values
+
+
+def _after(sort_keys: list[SortKey], values: list[Any]):
+    """Rows strictly after values in (k1, k2, ...) order, as an OR of prefix equalities."""
+    conditions = []
+    for i, key in enumerate(sort_keys):
+        equal_prefix = [prior.column == value for prior, value in zip(sort_keys[:i], values)]
+        beyond = key.column < values[i] if key.descending else key.column > values[i]
+        conditions.append(and_(*equal_prefix, beyond))
+    return or_(*conditions)
+
+
+def paginate(
+    query: Query,
+    sort_keys: list[SortKey],
+    page: int,
+    limit: int,
+    cursor: Optional[str] = None,
+    include_total: bool = True,
+    total_key: Optional[tuple] = None,
+) -> Page:
+    """Fetch one page of a single-entity query ordered by sort_keys.
+
+    Without a cursor the page is selected with OFFSET as before; with a cursor
+    (next_cursor of the previous response) it continues from the last seen row
+    via a keyset condition, so latency does not grow with depth.
+
+    With include_total=False no count is made at all; otherwise the count is
+    served from the totals cache under total_key (namespace, *filter values).
+    """
+    # COUNT(*) OVER () в запросе страницы не годится: окно заставляет SQLite
+    # материализовать и отсортировать всю выборку, а отдельный COUNT идёт по индексу
+    total = None
+    if include_total:
+        cache_key = _totals_key(total_key)
+        total = totals_cache.get(cache_key) if cache_key else None
+        if total is None:
+            total = query.count()
+            if cache_key:
+                totals_cache.set(cache_key, total)
+
+    keyed = query.add_columns(*(key.column for key in sort_keys)).order_by(
+        *(key.column.desc() if key.descending else key.column.asc() for key in sort_keys)
+    )
+    if cursor:
+        keyed = keyed.filter(_after(sort_keys, decode_cursor(sort_keys, cursor)))
+    else:
+        keyed = keyed.offset((page - 1) * limit)
+
+    # Берём на одну строку больше, чтобы понять, есть ли следующая страница
+    rows = keyed.limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    key_count = len(sort_keys)
+    next_cursor = encode_cursor(sort_keys, list(rows[-1][1 : key_count + 1])) if has_more else None
+    return Page(items=[row[0] for row in rows], total=total, next_cursor=next_cursor, has_more=has_more)
+
+
+def page_response(result: Page, page: int, limit: int, cursor: Optional[str], items: list) -> dict:
+    """Response body shared by list endpoints; page/pages keep the old page/limit contract.
+
+    total and pages are null when the total was not requested (include_total=false).
+    """
+    if result.total is None:
+        pages = None
+    else:
+        pages = (result.total + limit - 1) // limit if result.total else 0
+    return {
+        "page": None if cursor else page,
+        "limit": limit,
+        "total": result.total,
+        "pages": pages,
+        "has_more": result.has_more,
+        "next_cursor": result.next_cursor,
+        "items": items,
+    }
@@ -0,0 +1,173 @@
+"""Opt-in SQL profiler (SQL_PROFILE=1): statements per request and plans of slow statements.
+
+Every statement executed while a request is handled is recorded with its time
+in cursor.execute(); the response gets X-DB-Query-Count and X-DB-Time-Ms headers
+and the statement list is logged when the request ends. A statement slower than
+SQL_SLOW_QUERY_MS, inside a request or not, is logged with the plan the database
+reports for it on the same connection, and full table scans are called out.
+Streaming responses send headers before their body queries run, so their
+headers only cover the queries made up to that point.
+"""
+
+import logging
+import re
+import time
+from contextvars import ContextVar
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .config import SQL_SLOW_QUERY_MS
+from .metrics import route_template
+
+logger = logging.getLogger(__name__)
+# Собственный обработчик профилировщика: уровни и обработчики логгеров приложения не меняются
+_fallback_handler = logging.StreamHandler()
+
+PROFILE_HEADERS = ["X-DB-Query-Count", "X-DB-Time-Ms"]
+
+# План показывает только то, что можно объяснить; BEGIN, COMMIT и PRAGMA пропускаются
+_EXPLAINABLE = ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH")
+_EXPLAIN_PREFIX = {"sqlite": "EXPLAIN QUERY PLAN ", "postgresql": "EXPLAIN "}
+# SQLite: "SCAN books_of_month" - полный просмотр; "SCAN t USING COVERING INDEX ..." идёт по индексу
+_SQLITE_SCAN = re.compile(r"^SCAN (\w+)$")
+_POSTGRES_SCAN = re.compile(r"Seq Scan on (\S+)")
+
+_current_profile: ContextVar[Optional["QueryProfile"]] = ContextVar("query_profile", default=None)
+
+
+class QueryProfile:
+    __slots__ = ("statements",)
+
+    def __init__(self):
+        # (мс, текст запроса) в порядке выполнения
+        self.statements: list[tuple[float, str]] = []
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+    @property
+    def total_ms(self) -> float:
+        return sum(ms for ms, _ in self.statements)
+
+
+def explain(conn, statement: str, parameters) -> list[str]:
+    """Plan lines of a statement, indented by depth; empty for databases without a known EXPLAIN."""
+    prefix = _EXPLAIN_PREFIX.get(conn.dialect.name)
+    if prefix is None:
+        return []
+    # Курсор самого DBAPI-соединения: EXPLAIN не попадает в профиль и события движка
+    cursor = conn.connection.cursor()
+    try:
+        cursor.execute(prefix + statement, parameters)
+        rows = cursor.fetchall()
+    finally:
+        cursor.close()
+    if conn.dialect.name != "sqlite":
+        return [row[0] for row in rows]
+    depth = {0: -1}
+    lines = []
+    for node_id, parent, _, detail in rows:
+        depth[node_id] = depth.get(parent, -1) + 1
+        lines.append("  " * depth[node_id] + detail)
+    return lines
+
+
+def full_scans(plan: list[str]) -> list[str]:
+    """Tables the plan reads in full."""
+    tables = []
+    for line in plan:
+        match = _SQLITE_SCAN.match(line.strip()) or _POSTGRES_SCAN.search(line)
+        if match:
+            tables.append(match.group(1))
+    return tables
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    if context is not None:
+        context._profile_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    started = getattr(context, "_profile_started", None)
+    if started is None:
+        return
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    profile = _current_profile.get()
+    if profile is not None:
+        profile.statements.append((elapsed_ms, statement))
+    if SQL_SLOW_QUERY_MS > 0 and elapsed_ms >= SQL_SLOW_QUERY_MS:
+        _log_slow_statement(conn, statement, parameters, executemany, elapsed_ms)
+
+
+def _log_slow_statement(conn, statement: str, parameters, executemany: bool, elapsed_ms: float) -> None:
+    plan: list[str] = []
+    if not executemany and statement.lstrip()[:6].upper().startswith(_EXPLAINABLE):
+        try:
+            plan = explain(conn, statement, parameters)
+        except Exception as e:
+            plan = [f"(план не получен: {e})"]
+    scans = full_scans(plan)
+    # Параметры в лог не пишутся: там бывают email, телефоны и коды входа
+    _emit(
+        logging.WARNING,
+        "Медленный запрос %.1f мс%s:\n%s%s",
+        elapsed_ms,
+        f", полный просмотр таблиц: {', '.join(scans)}" if scans else "",
+        statement,
+        "".join(f"\n    {line}" for line in plan),
+    )
+
+
+def _emit(level: int, msg: str, *args) -> None:
+    """Log through the module logger; if logging is not configured at all, write to stderr directly."""
+    if logger.isEnabledFor(level):
+        logger.log(level, msg, *args)
+    elif not logger.handlers and not logging.getLogger().handlers:
+        # Профилирование включают ради вывода: без настроенного логирования пишем в stderr
+        _fallback_handler.handle(logger.makeRecord(logger.name, level, __file__, 0, msg, args, None))
+
+
+def instrument_engine(engine: Engine) -> None:
+    """Time every statement of the engine for the profiler (for an AsyncEngine pass .sync_engine)."""
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+class QueryProfilerMiddleware:
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        profile = QueryProfile()
+
+        async def send_with_headers(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                headers["X-DB-Query-Count"] = str(profile.count)
+                headers["X-DB-Time-Ms"] = f"{profile.total_ms:.2f}"
+            await send(message)
+
+        token = _current_profile.set(profile)
+        try:
+            await self.app(scope, receive, send_with_headers)
+        finally:
+            _current_profile.reset(token)
+            if profile.statements:
+                _emit(
+                    logging.INFO,
+                    "%s %s: %d запросов к БД, %.2f мс%s",
+                    scope["method"],
+                    route_template(scope),
+                    profile.count,
+                    profile.total_ms,
+                    "".join(f"\n  {ms:8.2f} мс  {' '.join(sql.split())}" for ms, sql in profile.statements),
+                )
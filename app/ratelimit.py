@@ -0,0 +1,156 @@
+"""Token-bucket rate limiting with an in-process or a shared database backend.
+
+A limiter allows capacity events per per_seconds for each key, refilling
+continuously. A missing bucket means a full one, so state is only kept while a
+bucket is refilling: the memory backend stores it in a bounded TTLCache, the
+database backend in the rate_limits table (purged by the background sweeper).
+Use the database backend when running several uvicorn workers.
+"""
+
+import math
+import threading
+import time
+from typing import Optional
+
+from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+from .cache import TTLCache
+from .config import RATE_LIMIT_BACKEND, RATE_LIMIT_MAX_KEYS
+from .database import engine
+
+
+class MemoryRateLimitStore:
+    """Buckets of this process only; the least recently used keys are evicted beyond max_keys."""
+
+    shared = False
+
+    def __init__(self, max_keys: int = RATE_LIMIT_MAX_KEYS):
+        self._buckets = TTLCache(max_size=max_keys, ttl=0)
+        self._lock = threading.Lock()
+
+    def take(self, key: str, capacity: float, rate: float) -> float:
+        now = time.monotonic()
+        with self._lock:
+            state = self._buckets.get(key)
+            tokens = capacity if state is None else min(capacity, state[0] + (now - state[1]) * rate)
+            if tokens < 1:
+                return (1 - tokens) / rate
+            tokens -= 1
+            # Запись живёт, пока корзина не наполнится: дальше её отсутствие и есть полная корзина
+            self._buckets.set(key, (tokens, now), ttl=(capacity - tokens) / rate)
+            return 0.0
+
+    def refund(self, key: str, capacity: float, rate: float) -> None:
+        now = time.monotonic()
+        with self._lock:
+            state = self._buckets.get(key)
+            if state is None:
+                return
+            tokens = min(capacity, state[0] + (now - state[1]) * rate) + 1
+            if tokens >= capacity:
+                self._buckets.invalidate(key)
+            else:
+                self._buckets.set(key, (tokens, now), ttl=(capacity - tokens) / rate)
+
+
+class DatabaseRateLimitStore:
+    """Buckets in the rate_limits table, updated by one atomic upsert per check (SQLite, PostgreSQL)."""
+
+    shared = True
+
+    def __init__(self, bind: Engine = engine):
+        self.engine = bind
+        # Скалярный min(a, b) в SQLite и least(a, b) в PostgreSQL
+        least = "min" if bind.dialect.name == "sqlite" else "least"
+        refilled = f"{least}(:capacity, rate_limits.tokens + (:now - rate_limits.updated_at) * :rate)"
+        # Готовый SQL: upsert с ON CONFLICT ... WHERE SQLAlchemy не кэширует и компилирует на каждой проверке.
+        # Токен списывается только если он есть; иначе upsert ничего не меняет и ничего не возвращает.
+        self._take = text(
+            f"""
+            INSERT INTO rate_limits (key, tokens, updated_at, expires_at)
+            VALUES (:key, :capacity - 1, :now, :now + 1 / :rate)
+            ON CONFLICT (key) DO UPDATE SET
+                tokens = {refilled} - 1,
+                updated_at = :now,
+                expires_at = :now + (:capacity - {refilled} + 1) / :rate
+            WHERE {refilled} >= 1
+            RETURNING key
+            """
+        )
+        self._peek = text(f"SELECT {refilled} FROM rate_limits WHERE key = :key")
+        returned = f"{least}(:capacity, {refilled} + 1)"
+        self._refund = text(
+            f"""
+            UPDATE rate_limits SET
+                tokens = {returned},
+                updated_at = :now,
+                expires_at = :now + (:capacity - {returned}) / :rate
+            WHERE key = :key
+            """
+        )
+
+    @staticmethod
+    def supports(bind: Engine) -> bool:
+        return bind.dialect.name in ("sqlite", "postgresql")
+
+    def take(self, key: str, capacity: float, rate: float) -> float:
+        params = {"key": key, "now": time.time(), "capacity": capacity, "rate": rate}
+        with self.engine.begin() as conn:
+            if conn.execute(self._take, params).first() is not None:
+                return 0.0
+            tokens = conn.execute(self._peek, params).scalar()
+        return (1 - (tokens or 0)) / rate
+
+    def refund(self, key: str, capacity: float, rate: float) -> None:
+        params = {"key": key, "now": time.time(), "capacity": capacity, "rate": rate}
+        with self.engine.begin() as conn:
+            conn.execute(self._refund, params)
+
+
+def create_rate_limit_store(backend: str = RATE_LIMIT_BACKEND):
+    if backend == "database" and DatabaseRateLimitStore.supports(engine):
+        return DatabaseRateLimitStore(engine)
+    return MemoryRateLimitStore()
+
+
+rate_limit_store = create_rate_limit_store()
+
+
+class RateLimiter:
+    """Allows capacity requests per per_seconds for each key; check() raises 429 with Retry-After."""
+
+    def __init__(self, name: str, capacity: int, per_seconds: float, detail: str, store=None):
+        self.name = name
+        self.capacity = capacity
+        self.rate = capacity / per_seconds
+        self.detail = detail
+        self.store = store
+
+    def hit(self, key: str) -> float:
+        """Take a token for key; returns 0 if allowed, otherwise seconds until the next token."""
+        store = self.store or rate_limit_store
+        return store.take(f"{self.name}:{key}", self.capacity, self.rate)
+
+    async def refund(self, key: Optional[str]) -> None:
+        """Give back the token taken by check() when the request failed on our side."""
+        if not key:
+            return
+        store = self.store or rate_limit_store
+        if store.shared:
+            await run_in_threadpool(store.refund, f"{self.name}:{key}", self.capacity, self.rate)
+        else:
+            store.refund(f"{self.name}:{key}", self.capacity, self.rate)
+
+    async def check(self, key: Optional[str]) -> None:
+        if not key:
+            return
+        store = self.store or rate_limit_store
+        # Обращение к базе блокирует поток, поэтому идёт в пуле потоков
+        retry_after = await run_in_threadpool(self.hit, key) if store.shared else self.hit(key)
+        if retry_after > 0:
+            raise HTTPException(
+                status_code=429, detail=self.detail, headers={"Retry-After": str(math.ceil(retry_after))}
+            )
@@ -0,0 +1,140 @@
+"""Write-invalidated cache of rendered public responses with strong ETags and precompressed variants."""
+
+import hashlib
+import threading
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Hashable, Optional
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from pydantic import BaseModel
+
+from .cache import TTLCache
+from .compression import (
+    available_encodings,
+    compress,
+    negotiate_encoding,
+    record_compression,
+)
+from .config import (
+    COMPRESSION_CACHED_BROTLI_QUALITY,
+    COMPRESSION_CACHED_GZIP_LEVEL,
+    COMPRESSION_MIN_SIZE,
+    RESPONSE_CACHE_CONTROL,
+    RESPONSE_CACHE_SIZE,
+    RESPONSE_CACHE_TTL_SECONDS,
+)
+from .responses import DefaultJSONResponse
+
+_CACHED_LEVELS = {"gzip": COMPRESSION_CACHED_GZIP_LEVEL, "br": COMPRESSION_CACHED_BROTLI_QUALITY}
+
+
+@dataclass(frozen=True)
+class CachedResponse:
+    body: bytes
+    etag: str
+    # Сжатые варианты тела по кодировке; считаются при первом запросе с этой кодировкой
+    encoded: dict = field(default_factory=dict)
+
+    def variant(self, encoding: str) -> bytes:
+        data = self.encoded.get(encoding)
+        if data is None:
+            data = self.encoded[encoding] = compress(self.body, encoding, _CACHED_LEVELS[encoding])
+        return data
+
+
+# Готовые тела ответов по (поколение, ключ). Запись в книги, отзывы или записи на встречи
+# вызывает invalidate_responses(); другие процессы увидят изменение не позже чем через TTL.
+response_cache = TTLCache(max_size=RESPONSE_CACHE_SIZE, ttl=RESPONSE_CACHE_TTL_SECONDS)
+_generation = 0
+_counters = {"not_modified": 0, "bytes_sent": 0, "bytes_saved": 0}
+_lock = threading.Lock()
+
+
+def invalidate_responses() -> None:
+    global _generation
+    with _lock:
+        _generation += 1
+
+
+def _render(content, model: Optional[type[BaseModel]] = None) -> CachedResponse:
+    # С моделью ответа сериализует pydantic-core, как и в некэшированных ответах FastAPI
+    encoded = model.model_validate(content).model_dump(mode="json") if model else jsonable_encoder(content)
+    body = DefaultJSONResponse(content=encoded).body
+    # ETag зависит только от тела, поэтому совпадает во всех процессах и после сброса кэша
+    return CachedResponse(body=body, etag=f'"{hashlib.sha256(body).hexdigest()[:32]}"')
+
+
+def _variant_etag(etag: str, encoding: str) -> str:
+    # У сжатого представления свой ETag, как того требует HTTP для разных байтов
+    return f'{etag[:-1]}-{encoding}"'
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    # Для If-None-Match используется слабое сравнение: префикс W/ игнорируется,
+    # а ETag любого сжатого варианта соответствует тому же содержимому
+    candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    if "*" in candidates or etag in candidates:
+        return True
+    prefix = etag[:-1] + "-"
+    return any(tag.startswith(prefix) for tag in candidates)
+
+
+def _count(**deltas: int) -> None:
+    with _lock:
+        for name, delta in deltas.items():
+            _counters[name] += delta
+
+
+async def cached_response(
+    request: Request, key: Hashable, produce: Callable[[], Awaitable], model: Optional[type[BaseModel]] = None
+) -> Response:
+    """Serve key from the cache or produce() it, answering If-None-Match with 304.
+
+    produce() is awaited only on a miss; exceptions it raises (404 etc.) are not cached.
+    """
+    cache_key = (_generation, key)
+    entry = response_cache.get(cache_key)
+    if entry is None:
+        entry = _render(await produce(), model)
+        response_cache.set(cache_key, entry)
+    return _respond(request, entry, RESPONSE_CACHE_CONTROL)
+
+
+def etag_response(
+    request: Request,
+    content,
+    model: Optional[type[BaseModel]] = None,
+    cache_control: str = "private, no-cache",
+) -> Response:
+    """Render content with a strong ETag and answer a matching If-None-Match with 304, without caching.
+
+    For per-user data that is cheap to query but worth not resending unchanged.
+    """
+    return _respond(request, _render(content, model), cache_control)
+
+
+def _respond(request: Request, entry: CachedResponse, cache_control: str) -> Response:
+    body = entry.body
+    headers = {"ETag": entry.etag, "Cache-Control": cache_control}
+    if len(body) >= COMPRESSION_MIN_SIZE and available_encodings():
+        headers["Vary"] = "Accept-Encoding"
+        encoding = negotiate_encoding(request.headers.get("accept-encoding", ""))
+        if encoding:
+            body = entry.variant(encoding)
+            record_compression(len(entry.body), len(body))
+            headers.update({"ETag": _variant_etag(entry.etag, encoding), "Content-Encoding": encoding})
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and _etag_matches(if_none_match, entry.etag):
+        _count(not_modified=1, bytes_saved=len(body))
+        return Response(status_code=304, headers=headers)
+
+    _count(bytes_sent=len(body))
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+def response_cache_stats() -> dict:
+    with _lock:
+        counters = dict(_counters)
+    return {**response_cache.stats(), **counters}
@@ -0,0 +1,19 @@
+"""Default JSON response class: ORJSONResponse when orjson is installed, JSONResponse otherwise."""
+
+from fastapi.responses import JSONResponse, ORJSONResponse
+
+from .config import JSON_RESPONSE_RENDERER
+
+try:
+    import orjson
+except ImportError:  # orjson - необязательная зависимость
+    orjson = None
+
+
+def json_response_class(renderer: str = JSON_RESPONSE_RENDERER) -> type[JSONResponse]:
+    if renderer == "orjson" and orjson is not None:
+        return ORJSONResponse
+    return JSONResponse
+
+
+DefaultJSONResponse = json_response_class()
@@ -0,0 +1,127 @@
+"""Revoked access tokens: an in-memory digest set kept in sync with auth_tokens.revoked_at.
+
+verify_token() checks every bearer token against the set with one dict lookup,
+so logout does not cost a database query per request. Revocations made in this
+process are added immediately; other workers pick them up on the next periodic
+refresh, which only reads rows revoked since the last one it saw.
+"""
+
+import asyncio
+import hashlib
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Iterable, Optional
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from .config import REVOCATION_REFRESH_SECONDS
+from .database import run_in_new_session
+from .models import AuthToken
+
+logger = logging.getLogger(__name__)
+
+# Запас при инкрементальной подгрузке: транзакция отзыва могла зафиксироваться позже, чем её revoked_at
+_REFRESH_OVERLAP = timedelta(seconds=60)
+
+# sha256 токена -> время истечения (Unix); истёкшие токены и так отклоняются, их убираем из набора
+_revoked: dict[bytes, float] = {}
+_watermark: Optional[str] = None
+_lock = threading.Lock()
+
+
+def token_digest(token: str) -> bytes:
+    return hashlib.sha256(token.encode()).digest()
+
+
+def is_revoked(digest: bytes) -> bool:
+    return digest in _revoked
+
+
+def revoked_count() -> int:
+    return len(_revoked)
+
+
+def _remember(rows: Iterable[tuple[str, str, str]]) -> None:
+    global _watermark
+    with _lock:
+        for token, expires_at, revoked_at in rows:
+            _revoked[token_digest(token)] = datetime.fromisoformat(expires_at).timestamp()
+            if _watermark is None or revoked_at > _watermark:
+                _watermark = revoked_at
+
+
+def _prune() -> None:
+    now = datetime.now().timestamp()
+    with _lock:
+        for digest in [digest for digest, expires_at in _revoked.items() if expires_at <= now]:
+            del _revoked[digest]
+
+
+def _load_revoked(db: Session, since: Optional[str]) -> list:
+    query = select(AuthToken.token, AuthToken.expires_at, AuthToken.revoked_at).where(
+        AuthToken.revoked_at.isnot(None), AuthToken.expires_at > datetime.now()
+    )
+    if since is not None:
+        query = query.where(AuthToken.revoked_at >= since)
+    return db.execute(query).all()
+
+
+async def refresh_revoked() -> int:
+    """Load revocations made since the last refresh (all of them on the first call)."""
+    since = None
+    if _watermark is not None:
+        since = (datetime.fromisoformat(_watermark) - _REFRESH_OVERLAP).isoformat()
+    rows = await run_in_new_session(_load_revoked, since)
+    _remember(rows)
+    _prune()
+    return len(rows)
+
+
+async def run_revocation_refresher(interval: float = REVOCATION_REFRESH_SECONDS) -> None:
+    """Call refresh_revoked() every interval seconds until cancelled."""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await refresh_revoked()
+        except Exception:
+            logger.exception("Ошибка обновления списка отозванных токенов")
+
+
+def revoke_token(db: Session, token: str, payload: dict) -> None:
+    """Revoke a single token (logout); commits."""
+    now = datetime.now().isoformat()
+    expires_at = datetime.fromtimestamp(payload["exp"]).isoformat()
+    updated = (
+        db.query(AuthToken)
+        .filter(AuthToken.token == token)
+        .update({AuthToken.is_active: 0, AuthToken.revoked_at: now}, synchronize_session=False)
+    )
+    if not updated:
+        # Токен выдан без записи в auth_tokens - записываем, чтобы отзыв увидели другие воркеры
+        db.add(
+            AuthToken(
+                user_id=payload.get("user_id"),
+                token=token,
+                created_at=now,
+                expires_at=expires_at,
+                is_active=0,
+                revoked_at=now,
+            )
+        )
+    db.commit()
+    _remember([(token, expires_at, now)])
+
+
+def revoke_user_tokens(db: Session, user_id: int) -> int:
+    """Revoke every unexpired, not yet revoked token of a user; commits and returns how many."""
+    now = datetime.now().isoformat()
+    condition = (AuthToken.user_id == user_id, AuthToken.revoked_at.is_(None), AuthToken.expires_at > now)
+    tokens = db.execute(select(AuthToken.token, AuthToken.expires_at).where(*condition)).all()
+    db.query(AuthToken).filter(*condition).update(
+        {AuthToken.is_active: 0, AuthToken.revoked_at: now}, synchronize_session=False
+    )
+    db.commit()
+    _remember((token, expires_at, now) for token, expires_at in tokens)
+    return len(tokens)
@@ -1,4 +1,4 @@
-from . import auth, books, meetings, users, general
+from . import auth, books, meetings, users, general, home, metrics
 
-__all__ = ["auth", "books", "meetings", "users", "general"]
+__all__ = ["auth", "books", "meetings", "users", "general", "home", "metrics"]
 
@@ -1,100 +1,77 @@
 """Authorization related endpoints."""
 
 from datetime import datetime, timedelta
-from typing import Dict
 
-import requests
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 
-from ..config import JWT_EXPIRATION_HOURS, MSG_OVRX_BASE_URL, MSG_OVRX_API_KEY
-from ..dependencies import get_db
+from ..config import (
+    JWT_EXPIRATION_HOURS,
+    RATE_LIMIT_SEND_CODE_COUNT,
+    RATE_LIMIT_SEND_CODE_SECONDS,
+    RATE_LIMIT_VERIFY_CODE_COUNT,
+    RATE_LIMIT_VERIFY_CODE_SECONDS,
+)
+from ..database import DBSession, run_in_session
+from ..delivery import delivery, delivery_configured
+from ..dependencies import get_bearer_token, get_db, invalidate_cached_user
 from ..enums import UserRole
 from ..models import AuthCode, AuthToken, User
-from ..schemas import AuthRequest, AuthVerify
-from ..security import cleanup_old_codes, create_access_token, generate_verification_code
-from fastapi import HTTPException
+from ..pagination import invalidate_totals
+from ..ratelimit import RateLimiter
+from ..revocation import revoke_token
+from ..schemas import (
+    AuthRequest,
+    AuthVerify,
+    MessageResponse,
+    SendCodeResponse,
+    TokenResponse,
+)
+from ..security import create_access_token, generate_verification_code, verify_token
 
 router = APIRouter(prefix="/auth", tags=["Авторизация"])
 
-# Track last send time per identifier (1 per minute limit)
-last_sent: Dict[str, datetime] = {}
-
-
-@router.post("/send-code")
-def send_auth_code(req: AuthRequest, db: Session = Depends(get_db)):
+# Лимиты по email/телефону; при нескольких воркерах нужен RATE_LIMIT_BACKEND=database
+send_code_limiter = RateLimiter(
+    "send-code",
+    RATE_LIMIT_SEND_CODE_COUNT,
+    RATE_LIMIT_SEND_CODE_SECONDS,
+    detail="Можно отправлять код не чаще 1 раза в минуту",
+)
+verify_code_limiter = RateLimiter(
+    "verify-code",
+    RATE_LIMIT_VERIFY_CODE_COUNT,
+    RATE_LIMIT_VERIFY_CODE_SECONDS,
+    detail="Слишком много попыток ввода кода. Попробуйте позже",
+)
+
+
+@router.post("/send-code", response_model=SendCodeResponse, response_model_exclude_unset=True)
+async def send_auth_code(req: AuthRequest, db: DBSession = Depends(get_db)):
     identifier = req.email or req.phone
     if not identifier:
         raise HTTPException(status_code=400, detail="Укажите email или телефон")
 
-    cleanup_old_codes(db)
-
-    if identifier in last_sent and datetime.now() - last_sent[identifier] < timedelta(minutes=1):
-        raise HTTPException(status_code=429, detail="Можно отправлять код не чаще 1 раза в минуту")
+    await send_code_limiter.check(identifier)
 
     code = generate_verification_code()
     payload = {"email": req.email, "code": code} if req.email else {"phone": req.phone, "code": code}
 
     # Проверяем, включен ли режим разработки (когда API ключ не настроен)
-    dev_mode = not MSG_OVRX_API_KEY or MSG_OVRX_API_KEY == "ТВОЙ_API_КЛЮЧ" or MSG_OVRX_API_KEY == "your_api_key_here"
-    
-    if not dev_mode:
-        try:
-            endpoint = "email" if req.email else "sms"
-            headers = {}
-            if MSG_OVRX_API_KEY:
-                headers["Authorization"] = f"Bearer {MSG_OVRX_API_KEY}"
-                headers["X-API-Key"] = MSG_OVRX_API_KEY
-            
-            response = requests.post(
-                f"{MSG_OVRX_BASE_URL}/auth-code/{endpoint}",
-                json=payload,
-                headers=headers,
-                timeout=10
-            )
-            response.raise_for_status()
-        except requests.exceptions.Timeout:
-            # В режиме разработки сохраняем код даже при ошибке отправки
-            if dev_mode:
-                pass
-            else:
-                raise HTTPException(status_code=500, detail="Таймаут при отправке кода. Попробуйте позже.")
-        except requests.exceptions.ConnectionError:
-            # В режиме разработки сохраняем код даже при ошибке отправки
-            if dev_mode:
-                pass
-            else:
-                raise HTTPException(status_code=500, detail="Не удалось подключиться к сервису отправки. Проверьте подключение к интернету.")
-        except requests.exceptions.HTTPError as e:
-            # Если ошибка 502 или другая ошибка сервиса, в режиме разработки продолжаем
-            if dev_mode or e.response.status_code in [502, 503, 504]:
-                pass
-            else:
-                error_detail = f"Ошибка сервиса отправки: {e.response.status_code}"
-                try:
-                    error_data = e.response.json()
-                    if "detail" in error_data:
-                        error_detail = error_data["detail"]
-                except:
-                    pass
-                raise HTTPException(status_code=500, detail=error_detail)
-        except Exception as exc:
-            # В режиме разработки продолжаем даже при других ошибках
-            if not dev_mode:
-                raise HTTPException(status_code=500, detail=f"Ошибка при отправке кода: {str(exc)}")
-
-    # Сохраняем код в базе данных (всегда, даже если отправка не удалась)
-    auth_code = AuthCode(
-        identifier=identifier,
-        code=code,
-        created_at=datetime.now().isoformat(),
-        is_used=0,
-    )
-    db.add(auth_code)
-    db.commit()
+    dev_mode = not delivery_configured()
+
+    if not dev_mode and not delivery.accepting():
+        # Код не отправлен не по вине пользователя: повтор не должен упереться в лимит
+        await send_code_limiter.refund(identifier)
+        raise HTTPException(status_code=503, detail="Сервис отправки кодов временно недоступен. Попробуйте позже.")
+
+    await run_in_session(db, _save_auth_code, identifier, code)
+
+    # Отправка идёт в фоне: ответ не ждёт сервис сообщений, повторы и таймауты обрабатывают отправители
+    if not dev_mode and not delivery.submit("email" if req.email else "sms", payload):
+        await send_code_limiter.refund(identifier)
+        raise HTTPException(status_code=503, detail="Сервис отправки кодов временно недоступен. Попробуйте позже.")
 
-    last_sent[identifier] = datetime.now()
-    
     # В режиме разработки возвращаем код в ответе
     if dev_mode:
         return {
@@ -106,8 +83,25 @@ def send_auth_code(req: AuthRequest, db: Session = Depends(get_db)):
     return {"message": "Код отправлен успешно"}
 
 
-@router.post("/verify-code")
-def verify_auth_code(req: AuthVerify, db: Session = Depends(get_db)):
+def _save_auth_code(db: Session, identifier: str, code: str) -> None:
+    auth_code = AuthCode(
+        identifier=identifier,
+        code=code,
+        created_at=datetime.now().isoformat(),
+        is_used=0,
+    )
+    db.add(auth_code)
+    db.commit()
+
+
+@router.post("/verify-code", response_model=TokenResponse)
+async def verify_auth_code(req: AuthVerify, db: DBSession = Depends(get_db)):
+    # Код из 6 цифр: без лимита попыток его можно подобрать перебором
+    await verify_code_limiter.check(req.email or req.phone)
+    return await run_in_session(db, _verify_auth_code, req)
+
+
+def _verify_auth_code(db: Session, req: AuthVerify):
     identifier = req.email or req.phone
     if not identifier:
         raise HTTPException(status_code=400, detail="Укажите email или телефон")
@@ -157,6 +151,8 @@ def verify_auth_code(req: AuthVerify, db: Session = Depends(get_db)):
         db.add(user)
         db.commit()
         db.refresh(user)
+        invalidate_cached_user(user.id)
+        invalidate_totals("users")
     
     # КРИТИЧЕСКАЯ ПРОВЕРКА: убеждаемся, что это правильный пользователь
     # и что роль корректна
@@ -191,6 +187,10 @@ def verify_auth_code(req: AuthVerify, db: Session = Depends(get_db)):
         db.commit()
         db.refresh(user)
     
+    # Роль могла быть исправлена выше - сбрасываем закэшированную строку пользователя и total с фильтром по роли
+    invalidate_cached_user(user.id)
+    invalidate_totals("users")
+
     access_token = create_access_token(user.id, user_role)
 
     now = datetime.now()
@@ -214,3 +214,10 @@ def verify_auth_code(req: AuthVerify, db: Session = Depends(get_db)):
         "expires_in": JWT_EXPIRATION_HOURS * 3600,
     }
 
+
+@router.post("/logout", response_model=MessageResponse)
+async def logout(token: str = Depends(get_bearer_token), db: DBSession = Depends(get_db)):
+    """Отозвать текущий токен. Другие воркеры узнают об отзыве не позже чем через REVOCATION_REFRESH_SECONDS."""
+    payload = verify_token(token)
+    await run_in_session(db, revoke_token, token, payload)
+    return {"message": "Вы вышли из системы"}
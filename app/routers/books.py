@@ -1,25 +1,57 @@
 """Book-related endpoints."""
 
 from datetime import datetime
-from typing import Optional
+from functools import partial
+from typing import Literal, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, Query, status
-from sqlalchemy import func, or_
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from pydantic import ValidationError
+from sqlalchemy import insert, select
 from sqlalchemy.orm import Session
 
+from ..bulk_import import BulkImportStopped, bulk_format, iter_csv_rows, iter_jsonl_rows
+from ..config import (
+    BULK_IMPORT_BATCH_SIZE,
+    BULK_IMPORT_MAX_ERRORS,
+    RESPONSE_CACHE_BOOK_PAGES,
+)
+from ..database import DBSession, run_in_session
 from ..dependencies import get_current_user, get_db, require_admin_role
-from ..models import BookOfMonth, MeetingRegistration, Review, User
-from ..schemas import BookCreate, ReviewCreate
+from ..events import event_stream_response, notify_book_changed
+from ..export import export_response
+from ..models import BookOfMonth, Review, User
+from ..pagination import SortKey, invalidate_totals, page_response, paginate
+from ..response_cache import cached_response, invalidate_responses
+from ..schemas import (
+    BookCreate,
+    BookDetailResponse,
+    BookResponse,
+    BookWriteResponse,
+    BulkImportResponse,
+    PageResponse,
+    ReviewCreate,
+    ReviewResponse,
+    SetCurrentBookResponse,
+)
+from ..search import books_fts, search_books
+from ..stats import delete_book_stats, get_book_stats, record_review
+from ..timestamps import time_range
 
 router = APIRouter(prefix="/books", tags=["Книги"])
 
 
-@router.post("", status_code=status.HTTP_201_CREATED)
-def add_book(book: BookCreate, db: Session = Depends(get_db), admin_user: User = Depends(require_admin_role)):
+@router.post("", response_model=BookWriteResponse, status_code=status.HTTP_201_CREATED)
+async def add_book(book: BookCreate, db: DBSession = Depends(get_db), admin_user: User = Depends(require_admin_role)):
+    return await run_in_session(db, _add_book, book)
+
+
+def _add_book(db: Session, book: BookCreate):
     book_entry = BookOfMonth(**book.dict())
     db.add(book_entry)
     db.commit()
     db.refresh(book_entry)
+    invalidate_totals("books")
+    invalidate_responses()
     return {
         "message": "Книга месяца успешно добавлена",
         "id": book_entry.id,
@@ -31,8 +63,85 @@ def add_book(book: BookCreate, db: Session = Depends(get_db), admin_user: User =
     }
 
 
-@router.get("/current")
-def get_current_book_of_month(db: Session = Depends(get_db)):
+@router.post("/bulk", response_model=BulkImportResponse)
+async def bulk_import_books(
+    request: Request,
+    format: Optional[Literal["jsonl", "csv"]] = Query(
+        None, description="Формат тела; по умолчанию по Content-Type (application/x-ndjson или text/csv)"
+    ),
+    db: DBSession = Depends(get_db),
+    admin_user: User = Depends(require_admin_role),
+):
+    """Массовый импорт книг (только админ) из JSONL или CSV с заголовком.
+
+    Тело читается потоком; строки проверяются по BookCreate и вставляются пачками
+    по BULK_IMPORT_BATCH_SIZE, каждая пачка - отдельная транзакция. Ошибочные и слишком
+    длинные строки пропускаются и возвращаются в errors с номером строки. Если файл
+    дальше не прочитать (не UTF-8), импорт останавливается, но ответ тот же: уже
+    вставленные пачки остаются в базе, и inserted показывает, сколько их.
+    """
+    fmt = format or bulk_format(request.headers.get("content-type", ""))
+    if fmt is None:
+        raise HTTPException(
+            status_code=415, detail="Поддерживаются JSONL (application/x-ndjson) и CSV (text/csv)"
+        )
+
+    rows = iter_jsonl_rows(request.stream()) if fmt == "jsonl" else iter_csv_rows(request.stream())
+    batch: list[dict] = []
+    inserted = failed = 0
+    errors = []
+    stopped = None
+    try:
+        async for line, row, error in rows:
+            if error is None:
+                try:
+                    batch.append(BookCreate(**row).dict())
+                except ValidationError as exc:
+                    error = "; ".join(f"{'.'.join(map(str, e['loc']))}: {e['msg']}" for e in exc.errors())
+            if error is not None:
+                failed += 1
+                if len(errors) < BULK_IMPORT_MAX_ERRORS:
+                    errors.append({"line": line, "error": error})
+                continue
+            if len(batch) >= BULK_IMPORT_BATCH_SIZE:
+                inserted += await run_in_session(db, _insert_books, batch)
+                batch = []
+    except BulkImportStopped as exc:
+        stopped = exc
+        failed += 1
+        # Причина остановки нужна клиенту всегда, даже сверх BULK_IMPORT_MAX_ERRORS
+        errors.append({"line": exc.line, "error": exc.error})
+    if batch:
+        inserted += await run_in_session(db, _insert_books, batch)
+
+    message = f"Импортировано книг: {inserted}, с ошибками: {failed}"
+    if stopped is not None:
+        message = f"Импорт остановлен на строке {stopped.line}: {stopped.error}. {message}"
+    return {
+        "message": message,
+        "inserted": inserted,
+        "failed": failed,
+        "errors": errors,
+    }
+
+
+def _insert_books(db: Session, rows: list[dict]) -> int:
+    # Один executemany на пачку вместо add/commit/refresh на каждую книгу
+    db.execute(insert(BookOfMonth), rows)
+    db.commit()
+    invalidate_totals("books")
+    invalidate_responses()
+    return len(rows)
+
+
+@router.get("/current", response_model=BookResponse)
+async def get_current_book_of_month(request: Request, db: DBSession = Depends(get_db)):
+    return await cached_response(
+        request, ("current",), partial(run_in_session, db, _get_current_book_of_month), BookResponse
+    )
+
+
+def _get_current_book_of_month(db: Session):
     try:
         # Сначала ищем книгу с флагом is_current
         book = db.query(BookOfMonth).filter(BookOfMonth.is_current == 1).first()
@@ -44,22 +153,10 @@ def get_current_book_of_month(db: Session = Depends(get_db)):
         if not book:
             raise HTTPException(status_code=404, detail="Книга месяца не найдена")
 
-        avg_rating = (
-            db.query(func.avg(Review.rating))
-            .filter(Review.book_id == book.id)
-            .scalar()
-        )
-        
-        # Подсчитываем количество записавшихся
-        from ..models import MeetingRegistration
-        registered_count = (
-            db.query(func.count(MeetingRegistration.id))
-            .filter(
-                MeetingRegistration.book_id == book.id,
-                MeetingRegistration.status == "registered"
-            )
-            .scalar()
-        ) or 0
+        # Рейтинг и количество записавшихся берём из поддерживаемых счётчиков book_stats
+        stats = get_book_stats(db, [book.id]).get(book.id)
+        avg_rating = stats.avg_rating if stats else None
+        registered_count = stats.registered_count if stats else 0
 
         return {
             "id": book.id,
@@ -78,59 +175,52 @@ def get_current_book_of_month(db: Session = Depends(get_db)):
         raise HTTPException(status_code=500, detail=f"Ошибка при получении книги месяца: {str(e)}")
 
 
-@router.get("")
-def list_books(
+@router.get("", response_model=PageResponse[BookResponse])
+async def list_books(
+    request: Request,
     page: int = Query(1, ge=1),
     limit: int = Query(10, ge=1, le=100),
-    search: Optional[str] = Query(None, description="Поиск по названию или автору"),
-    db: Session = Depends(get_db),
+    search: Optional[str] = Query(None, description="Поиск по названию, автору или описанию (по началу слов)"),
+    sort: Literal["id", "relevance"] = Query("id", description="relevance - по релевантности поиска (bm25)"),
+    cursor: Optional[str] = Query(None, description="Курсор следующей страницы (next_cursor из предыдущего ответа)"),
+    include_total: bool = Query(True, description="false - не считать total, только has_more"),
+    db: DBSession = Depends(get_db),
+):
+    produce = partial(run_in_session, db, _list_books, page, limit, search, sort, cursor, include_total)
+    # Лендинг запрашивает первые страницы без поиска - их отдаём из кэша ответов
+    if search or cursor or page > RESPONSE_CACHE_BOOK_PAGES:
+        return await produce()
+    return await cached_response(request, ("list", page, limit, include_total), produce, PageResponse[BookResponse])
+
+
+def _list_books(
+    db: Session,
+    page: int,
+    limit: int,
+    search: Optional[str],
+    sort: str = "id",
+    cursor: Optional[str] = None,
+    include_total: bool = True,
 ):
     base_query = db.query(BookOfMonth)
+    sort_keys = [SortKey("id", BookOfMonth.id)]
     if search:
-        like = f"%{search}%"
-        base_query = base_query.filter(or_(BookOfMonth.title.ilike(like), BookOfMonth.author.ilike(like)))
-
-    total = base_query.count()
-    offset_value = (page - 1) * limit
-    books = base_query.order_by(BookOfMonth.id.desc()).offset(offset_value).limit(limit).all()
-
-    total_pages = (total + limit - 1) // limit if total else 0
-
-    # Получаем средние рейтинги для всех выбранных книг одним запросом
-    book_ids = [b.id for b in books]
-    ratings_map: dict[int, float] = {}
-    registered_counts: dict[int, int] = {}
-    
-    if book_ids:
-        ratings = (
-            db.query(Review.book_id, func.avg(Review.rating).label("avg_rating"))
-            .filter(Review.book_id.in_(book_ids))
-            .group_by(Review.book_id)
-            .all()
-        )
-        ratings_map = {r.book_id: float(r.avg_rating) for r in ratings}
-        
-        # Подсчитываем количество записавшихся на каждую встречу
-        registrations = (
-            db.query(
-                MeetingRegistration.book_id,
-                func.count(MeetingRegistration.id).label("count")
-            )
-            .filter(
-                MeetingRegistration.book_id.in_(book_ids),
-                MeetingRegistration.status == "registered"
-            )
-            .group_by(MeetingRegistration.book_id)
-            .all()
-        )
-        registered_counts = {r.book_id: r.count for r in registrations}
-
-    return {
-        "page": page,
-        "limit": limit,
-        "total": total,
-        "pages": total_pages,
-        "items": [
+        base_query, ranked = search_books(db, base_query, search)
+        if ranked and sort == "relevance":
+            sort_keys.insert(0, SortKey("rank", books_fts.c.rank, descending=False))
+
+    result = paginate(base_query, sort_keys, page, limit, cursor, include_total, total_key=("books", search))
+    books = result.items
+
+    # Рейтинги и количество записавшихся для всех выбранных книг одним запросом к book_stats
+    stats_map = get_book_stats(db, [b.id for b in books])
+
+    return page_response(
+        result,
+        page,
+        limit,
+        cursor,
+        [
             {
                 "id": b.id,
                 "title": b.title,
@@ -138,36 +228,28 @@ def list_books(
                 "date": b.date,
                 "location": b.location,
                 "description": b.description,
-                "avg_rating": ratings_map.get(b.id),
+                "avg_rating": stats.avg_rating if (stats := stats_map.get(b.id)) else None,
                 "is_current": bool(b.is_current) if hasattr(b, 'is_current') else False,
-                "registered_count": registered_counts.get(b.id, 0),
+                "registered_count": stats.registered_count if stats else 0,
             }
             for b in books
         ],
-    }
+    )
 
 
-@router.get("/{book_id}")
-def get_book_by_id(book_id: int, db: Session = Depends(get_db)):
+@router.get("/{book_id}", response_model=BookDetailResponse)
+async def get_book_by_id(book_id: int, request: Request, db: DBSession = Depends(get_db)):
+    return await cached_response(
+        request, ("book", book_id), partial(run_in_session, db, _get_book_by_id, book_id), BookDetailResponse
+    )
+
+
+def _get_book_by_id(db: Session, book_id: int):
     book = db.query(BookOfMonth).filter(BookOfMonth.id == book_id).first()
     if not book:
         raise HTTPException(status_code=404, detail="Книга не найдена")
 
-    avg_rating = (
-        db.query(func.avg(Review.rating))
-        .filter(Review.book_id == book_id)
-        .scalar()
-    )
-    
-    # Подсчитываем количество записавшихся
-    registered_count = (
-        db.query(func.count(MeetingRegistration.id))
-        .filter(
-            MeetingRegistration.book_id == book_id,
-            MeetingRegistration.status == "registered"
-        )
-        .scalar()
-    ) or 0
+    stats = get_book_stats(db, [book_id]).get(book_id)
 
     return {
         "id": book.id,
@@ -176,14 +258,32 @@ def get_book_by_id(book_id: int, db: Session = Depends(get_db)):
         "date": book.date,
         "location": book.location,
         "description": book.description,
-        "avg_rating": float(avg_rating) if avg_rating is not None else None,
+        "avg_rating": stats.avg_rating if stats else None,
         "is_current": bool(book.is_current) if hasattr(book, 'is_current') else False,
-        "registered_count": registered_count,
+        "registered_count": stats.registered_count if stats else 0,
+        "reviews_count": stats.rating_count if stats else 0,
+        "rating_histogram": stats.rating_histogram if stats else {str(r): 0 for r in range(1, 6)},
     }
 
 
-@router.put("/{book_id}")
-def update_book(book_id: int, book: BookCreate, db: Session = Depends(get_db), admin_user: User = Depends(require_admin_role)):
+@router.get("/{book_id}/events")
+async def stream_book_events(book_id: int):
+    """Поток Server-Sent Events (event: stats) с количеством записавшихся и рейтингом книги.
+
+    Первое событие - текущие значения, дальше - каждое изменение после записи на встречу,
+    её отмены или нового отзыва. Пока изменений нет, раз в SSE_HEARTBEAT_SECONDS приходит
+    комментарий-heartbeat.
+    """
+    # Без get_db: сессия на всё время потока не нужна, снимок читается в своей
+    return await event_stream_response(book_id)
+
+
+@router.put("/{book_id}", response_model=BookWriteResponse)
+async def update_book(book_id: int, book: BookCreate, db: DBSession = Depends(get_db), admin_user: User = Depends(require_admin_role)):
+    return await run_in_session(db, _update_book, book_id, book)
+
+
+def _update_book(db: Session, book_id: int, book: BookCreate):
     book_entry = db.query(BookOfMonth).filter(BookOfMonth.id == book_id).first()
     if not book_entry:
         raise HTTPException(status_code=404, detail="Книга не найдена")
@@ -196,6 +296,9 @@ def update_book(book_id: int, book: BookCreate, db: Session = Depends(get_db), a
 
     db.commit()
     db.refresh(book_entry)
+    # Новое название или автор меняют результаты поиска
+    invalidate_totals("books")
+    invalidate_responses()
 
     return {
         "message": "Книга успешно обновлена",
@@ -208,13 +311,17 @@ def update_book(book_id: int, book: BookCreate, db: Session = Depends(get_db), a
     }
 
 
-@router.put("/{book_id}/set-current")
-def set_current_book(
+@router.put("/{book_id}/set-current", response_model=SetCurrentBookResponse)
+async def set_current_book(
     book_id: int,
-    db: Session = Depends(get_db),
+    db: DBSession = Depends(get_db),
     admin_user: User = Depends(require_admin_role),
 ):
     """Установить книгу как текущую книгу месяца (только админ)."""
+    return await run_in_session(db, _set_current_book, book_id)
+
+
+def _set_current_book(db: Session, book_id: int):
     book = db.query(BookOfMonth).filter(BookOfMonth.id == book_id).first()
     if not book:
         raise HTTPException(status_code=404, detail="Книга не найдена")
@@ -226,6 +333,7 @@ def set_current_book(
     book.is_current = 1
     db.commit()
     db.refresh(book)
+    invalidate_responses()
 
     return {
         "message": f"Книга '{book.title}' установлена как текущая книга месяца",
@@ -236,23 +344,39 @@ def set_current_book(
 
 
 @router.delete("/{book_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_book(book_id: int, db: Session = Depends(get_db), admin_user: User = Depends(require_admin_role)):
+async def delete_book(book_id: int, db: DBSession = Depends(get_db), admin_user: User = Depends(require_admin_role)):
+    await run_in_session(db, _delete_book, book_id)
+    return None
+
+
+def _delete_book(db: Session, book_id: int) -> None:
     book_entry = db.query(BookOfMonth).filter(BookOfMonth.id == book_id).first()
     if not book_entry:
         raise HTTPException(status_code=404, detail="Книга не найдена")
 
     db.delete(book_entry)
+    delete_book_stats(db, book_id)
     db.commit()
-    return None
+    invalidate_totals("books")
+    invalidate_responses()
 
 
-@router.post("/{book_id}/reviews", status_code=status.HTTP_201_CREATED)
-def add_review(
+@router.post(
+    "/{book_id}/reviews",
+    response_model=ReviewResponse,
+    response_model_exclude_unset=True,
+    status_code=status.HTTP_201_CREATED,
+)
+async def add_review(
     book_id: int,
     review: ReviewCreate,
-    db: Session = Depends(get_db),
+    db: DBSession = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
+    return await run_in_session(db, _add_review, book_id, review, current_user)
+
+
+def _add_review(db: Session, book_id: int, review: ReviewCreate, current_user: User):
     book = db.query(BookOfMonth).filter(BookOfMonth.id == book_id).first()
     if not book:
         raise HTTPException(status_code=404, detail="Книга не найдена")
@@ -265,8 +389,13 @@ def add_review(
         created_at=datetime.now().isoformat(),
     )
     db.add(review_entry)
+    record_review(db, book_id, review.rating)
     db.commit()
     db.refresh(review_entry)
+    invalidate_totals("reviews")
+    # Средний рейтинг книги попадает в кэшированные ответы
+    invalidate_responses()
+    notify_book_changed(db, book_id)
 
     return {
         "message": "Отзыв успешно добавлен",
@@ -279,29 +408,79 @@ def add_review(
     }
 
 
-@router.get("/{book_id}/reviews")
-def list_reviews(
+@router.get("/{book_id}/reviews/export")
+async def export_reviews(
+    book_id: int,
+    format: Literal["csv", "xlsx"] = Query("csv", description="xlsx - при установленном пакете xlsxwriter"),
+    since: Optional[datetime] = Query(None, description="Не раньше этого времени (ISO 8601)"),
+    until: Optional[datetime] = Query(None, description="Раньше этого времени (ISO 8601)"),
+    db: DBSession = Depends(get_db),
+    admin_user: User = Depends(require_admin_role),
+):
+    """Выгрузить отзывы о книге в CSV или XLSX (только админ)."""
+    await run_in_session(db, _get_book_or_404, book_id)
+    stmt = (
+        select(Review.id, Review.user_id, Review.rating, Review.comment, Review.created_at)
+        .where(Review.book_id == book_id, *time_range(Review.created_at, since, until))
+        .order_by(Review.id)
+    )
+    return await export_response(
+        format, f"reviews-{book_id}", ["id", "user_id", "rating", "comment", "created_at"], stmt
+    )
+
+
+def _get_book_or_404(db: Session, book_id: int) -> BookOfMonth:
+    book = db.query(BookOfMonth).filter(BookOfMonth.id == book_id).first()
+    if not book:
+        raise HTTPException(status_code=404, detail="Книга не найдена")
+    return book
+
+
+@router.get("/{book_id}/reviews", response_model=PageResponse[ReviewResponse], response_model_exclude_unset=True)
+async def list_reviews(
     book_id: int,
     page: int = Query(1, ge=1),
     limit: int = Query(10, ge=1, le=100),
-    db: Session = Depends(get_db),
+    cursor: Optional[str] = Query(None, description="Курсор следующей страницы (next_cursor из предыдущего ответа)"),
+    include_total: bool = Query(True, description="false - не считать total, только has_more"),
+    since: Optional[datetime] = Query(None, description="Не раньше этого времени (ISO 8601)"),
+    until: Optional[datetime] = Query(None, description="Раньше этого времени (ISO 8601)"),
+    db: DBSession = Depends(get_db),
+):
+    return await run_in_session(db, _list_reviews, book_id, page, limit, cursor, include_total, since, until)
+
+
+def _list_reviews(
+    db: Session,
+    book_id: int,
+    page: int,
+    limit: int,
+    cursor: Optional[str] = None,
+    include_total: bool = True,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
 ):
     book = db.query(BookOfMonth).filter(BookOfMonth.id == book_id).first()
     if not book:
         raise HTTPException(status_code=404, detail="Книга не найдена")
 
-    base_query = db.query(Review).filter(Review.book_id == book_id)
-    total = base_query.count()
-    offset_value = (page - 1) * limit
-    reviews = base_query.order_by(Review.id.desc()).offset(offset_value).limit(limit).all()
-    total_pages = (total + limit - 1) // limit if total else 0
+    base_query = db.query(Review).filter(Review.book_id == book_id, *time_range(Review.created_at, since, until))
+    result = paginate(
+        base_query,
+        [SortKey("id", Review.id)],
+        page,
+        limit,
+        cursor,
+        include_total,
+        total_key=("reviews", book_id, since, until),
+    )
 
-    return {
-        "page": page,
-        "limit": limit,
-        "total": total,
-        "pages": total_pages,
-        "items": [
+    return page_response(
+        result,
+        page,
+        limit,
+        cursor,
+        [
             {
                 "id": r.id,
                 "user_id": r.user_id,
@@ -310,7 +489,7 @@ def list_reviews(
                 "comment": r.comment,
                 "created_at": r.created_at,
             }
-            for r in reviews
+            for r in result.items
         ],
-    }
+    )
 
@@ -1,65 +1,206 @@
 """Favorites-related endpoints."""
 
 from datetime import datetime
+from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from sqlalchemy import insert
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.orm import Session
 
+from ..database import DBSession, run_in_session
 from ..dependencies import get_current_user, get_db
 from ..models import BookOfMonth, Favorite, User
-from ..schemas import FavoriteCreate
+from ..pagination import SortKey, invalidate_totals, page_response, paginate
+from ..response_cache import etag_response
+from ..schemas import (
+    FavoriteBatch,
+    FavoriteBatchAddResponse,
+    FavoriteBatchRemoveResponse,
+    FavoriteCreate,
+    FavoriteItem,
+    FavoriteResponse,
+    PageResponse,
+)
+from ..timestamps import time_range
 
 router = APIRouter(prefix="/favorites", tags=["Избранное"])
 
 
-@router.post("", status_code=status.HTTP_201_CREATED)
-def add_favorite(
+@router.post("", response_model=FavoriteResponse, status_code=status.HTTP_201_CREATED)
+async def add_favorite(
     payload: FavoriteCreate,
-    db: Session = Depends(get_db),
+    db: DBSession = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
+    return await run_in_session(db, _add_favorite, payload, current_user)
+
+
+def _add_favorite(db: Session, payload: FavoriteCreate, current_user: User):
     book = db.query(BookOfMonth).filter(BookOfMonth.id == payload.book_id).first()
     if not book:
         raise HTTPException(status_code=404, detail="Книга не найдена")
 
-    existing = (
-        db.query(Favorite)
-        .filter(Favorite.user_id == current_user.id, Favorite.book_id == payload.book_id)
-        .first()
-    )
-    if existing:
+    created_at = datetime.now().isoformat()
+    inserted = _insert_favorites(db, [{"user_id": current_user.id, "book_id": payload.book_id, "created_at": created_at}])
+    if not inserted:
+        # Книга уже была в избранном или её только что добавил параллельный запрос
         raise HTTPException(status_code=400, detail="Книга уже есть в избранном")
-
-    favorite = Favorite(
-        user_id=current_user.id,
-        book_id=payload.book_id,
-        created_at=datetime.now().isoformat(),
-    )
-    db.add(favorite)
     db.commit()
-    db.refresh(favorite)
+    invalidate_totals("favorites")
 
     return {
         "message": "Книга добавлена в избранное",
-        "id": favorite.id,
-        "user_id": favorite.user_id,
-        "book_id": favorite.book_id,
-        "created_at": favorite.created_at,
+        "id": inserted[payload.book_id],
+        "user_id": current_user.id,
+        "book_id": payload.book_id,
+        "created_at": created_at,
+    }
+
+
+def _insert_favorites(db: Session, rows: List[dict]) -> dict:
+    """Insert favorites that are not there yet; returns {book_id: id} of the rows actually inserted."""
+    dialect = db.get_bind().dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        # Уникальный индекс (user_id, book_id): одновременные добавления не падают с IntegrityError
+        dialect_insert = sqlite.insert if dialect == "sqlite" else postgresql.insert
+        stmt = (
+            dialect_insert(Favorite)
+            .on_conflict_do_nothing(index_elements=["user_id", "book_id"])
+            .returning(Favorite.book_id, Favorite.id)
+        )
+        return dict(db.execute(stmt, rows).all())
+    # Другие СУБД: без ON CONFLICT одновременное добавление той же книги может упасть на индексе
+    user_id = rows[0]["user_id"]
+    existing = {
+        book_id
+        for (book_id,) in db.query(Favorite.book_id).filter(
+            Favorite.user_id == user_id, Favorite.book_id.in_([row["book_id"] for row in rows])
+        )
+    }
+    rows = [row for row in rows if row["book_id"] not in existing]
+    if not rows:
+        return {}
+    db.execute(insert(Favorite), rows)
+    return dict(
+        db.query(Favorite.book_id, Favorite.id).filter(
+            Favorite.user_id == user_id, Favorite.book_id.in_([row["book_id"] for row in rows])
+        )
+    )
+
+
+@router.post("/batch", response_model=FavoriteBatchAddResponse)
+async def add_favorites(
+    payload: FavoriteBatch,
+    db: DBSession = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """Добавить несколько книг в избранное одной транзакцией; уже добавленные пропускаются."""
+    return await run_in_session(db, _add_favorites, payload.book_ids, current_user)
+
+
+def _add_favorites(db: Session, book_ids: List[int], current_user: User):
+    # Существование книг и дубликаты проверяются одним запросом на весь список
+    found = {book_id for (book_id,) in db.query(BookOfMonth.id).filter(BookOfMonth.id.in_(book_ids))}
+    missing = [book_id for book_id in book_ids if book_id not in found]
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Книги не найдены: {', '.join(map(str, missing))}")
+
+    created_at = datetime.now()
+    inserted = _insert_favorites(
+        db, [{"user_id": current_user.id, "book_id": book_id, "created_at": created_at} for book_id in book_ids]
+    )
+    if inserted:
+        db.commit()
+        invalidate_totals("favorites")
+
+    return {
+        "added": [book_id for book_id in book_ids if book_id in inserted],
+        "already_added": [book_id for book_id in book_ids if book_id not in inserted],
+    }
+
+
+@router.delete("/batch", response_model=FavoriteBatchRemoveResponse)
+async def remove_favorites(
+    payload: FavoriteBatch,
+    db: DBSession = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """Убрать несколько книг из избранного одной транзакцией; отсутствующие в избранном пропускаются."""
+    return await run_in_session(db, _remove_favorites, payload.book_ids, current_user)
+
+
+def _remove_favorites(db: Session, book_ids: List[int], current_user: User):
+    query = db.query(Favorite).filter(Favorite.user_id == current_user.id, Favorite.book_id.in_(book_ids))
+    existing = {book_id for (book_id,) in query.with_entities(Favorite.book_id)}
+    if existing:
+        query.delete(synchronize_session=False)
+        db.commit()
+        invalidate_totals("favorites")
+
+    return {
+        "removed": [book_id for book_id in book_ids if book_id in existing],
+        "not_found": [book_id for book_id in book_ids if book_id not in existing],
     }
 
 
-@router.get("")
-def list_favorites(
+@router.get("/ids", response_model=List[int])
+async def list_favorite_ids(
+    request: Request,
+    db: DBSession = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """id всех книг в избранном одним массивом, для отметок в каталоге.
+
+    ETag зависит только от набора id, поэтому неизменившийся список отдаётся как 304.
+    """
+    book_ids = await run_in_session(db, _list_favorite_ids, current_user)
+    return etag_response(request, book_ids)
+
+
+def _list_favorite_ids(db: Session, current_user: User) -> List[int]:
+    # Читается только уникальный индекс (user_id, book_id), без обращения к таблице
+    rows = db.query(Favorite.book_id).filter(Favorite.user_id == current_user.id).order_by(Favorite.book_id)
+    return [book_id for (book_id,) in rows]
+
+
+@router.get("", response_model=PageResponse[FavoriteItem])
+async def list_favorites(
     page: int = Query(1, ge=1),
     limit: int = Query(10, ge=1, le=100),
-    db: Session = Depends(get_db),
+    cursor: Optional[str] = Query(None, description="Курсор следующей страницы (next_cursor из предыдущего ответа)"),
+    include_total: bool = Query(True, description="false - не считать total, только has_more"),
+    since: Optional[datetime] = Query(None, description="Не раньше этого времени (ISO 8601)"),
+    until: Optional[datetime] = Query(None, description="Раньше этого времени (ISO 8601)"),
+    db: DBSession = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    base_query = db.query(Favorite).filter(Favorite.user_id == current_user.id)
-    total = base_query.count()
-    offset_value = (page - 1) * limit
-    favorites = base_query.order_by(Favorite.id.desc()).offset(offset_value).limit(limit).all()
-    total_pages = (total + limit - 1) // limit if total else 0
+    return await run_in_session(db, _list_favorites, page, limit, current_user, cursor, include_total, since, until)
+
+
+def _list_favorites(
+    db: Session,
+    page: int,
+    limit: int,
+    current_user: User,
+    cursor: Optional[str] = None,
+    include_total: bool = True,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+):
+    base_query = db.query(Favorite).filter(
+        Favorite.user_id == current_user.id, *time_range(Favorite.created_at, since, until)
+    )
+    result = paginate(
+        base_query,
+        [SortKey("id", Favorite.id)],
+        page,
+        limit,
+        cursor,
+        include_total,
+        total_key=("favorites", current_user.id, since, until),
+    )
+    favorites = result.items
 
     book_ids = [f.book_id for f in favorites]
     books_map = {}
@@ -67,12 +208,12 @@ def list_favorites(
         books = db.query(BookOfMonth).filter(BookOfMonth.id.in_(book_ids)).all()
         books_map = {b.id: b for b in books}
 
-    return {
-        "page": page,
-        "limit": limit,
-        "total": total,
-        "pages": total_pages,
-        "items": [
+    return page_response(
+        result,
+        page,
+        limit,
+        cursor,
+        [
             {
                 "id": f.id,
                 "book": {
@@ -89,15 +230,20 @@ def list_favorites(
             }
             for f in favorites
         ],
-    }
+    )
 
 
 @router.delete("/{book_id}", status_code=status.HTTP_204_NO_CONTENT)
-def remove_favorite(
+async def remove_favorite(
     book_id: int,
-    db: Session = Depends(get_db),
+    db: DBSession = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
+    await run_in_session(db, _remove_favorite, book_id, current_user)
+    return None
+
+
+def _remove_favorite(db: Session, book_id: int, current_user: User) -> None:
     favorite = (
         db.query(Favorite)
         .filter(Favorite.user_id == current_user.id, Favorite.book_id == book_id)
@@ -108,7 +254,5 @@ def remove_favorite(
 
     db.delete(favorite)
     db.commit()
-    return None
-
-
+    invalidate_totals("favorites")
 
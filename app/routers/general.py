@@ -2,10 +2,12 @@
 
 from fastapi import APIRouter
 
+from ..schemas import MessageResponse
+
 router = APIRouter(tags=["Общие"])
 
 
-@router.get("/")
-def home():
+@router.get("/", response_model=MessageResponse)
+async def home():
     return {"message": "Добро пожаловать в NartBooks!"}
 
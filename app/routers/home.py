@@ -0,0 +1,79 @@
+"""Composite endpoints that load a page's initial data in one request."""
+
+from functools import partial
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from sqlalchemy.orm import Session
+
+from ..database import DBSession, run_in_session
+from ..dependencies import get_current_user, get_db, get_optional_user
+from ..models import User
+from ..response_cache import cached_response
+from ..schemas import DashboardResponse, HomeResponse
+from .books import _get_current_book_of_month, _list_books
+from .favorites import _list_favorite_ids
+from .meetings import _get_my_meetings
+from .users import _get_current_user_info
+
+router = APIRouter(tags=["Главная"])
+
+
+@router.get("/home", response_model=HomeResponse, response_model_exclude_unset=True)
+async def get_home(
+    request: Request,
+    limit: int = Query(10, ge=1, le=100),
+    current_user: Optional[User] = Depends(get_optional_user),
+    db: DBSession = Depends(get_db),
+):
+    """Данные главной страницы одним запросом вместо /books/current, /books, /me, /favorites и /meetings/my.
+
+    Без токена ответ одинаков для всех и отдаётся из кэша ответов; с токеном добавляются
+    профиль, id избранных книг и записи на встречи.
+    """
+    if current_user is None:
+        return await cached_response(
+            request, ("home", limit), partial(run_in_session, db, _get_home, limit, None), HomeResponse
+        )
+    return await run_in_session(db, _get_home, limit, current_user)
+
+
+def _get_home(db: Session, limit: int, current_user: Optional[User]):
+    home = {
+        "current_book": _get_current_book_or_none(db),
+        "books": _list_books(db, 1, limit, None),
+        "user": None,
+        "favorite_ids": [],
+        "meetings": [],
+    }
+    if current_user is not None:
+        home.update(_get_user_data(db, current_user))
+    return home
+
+
+@router.get("/me/dashboard", response_model=DashboardResponse, response_model_exclude_unset=True)
+async def get_dashboard(current_user: User = Depends(get_current_user), db: DBSession = Depends(get_db)):
+    """Данные личного кабинета одним запросом: профиль, книга месяца, id избранного и записи на встречи."""
+    return await run_in_session(db, _get_dashboard, current_user)
+
+
+def _get_dashboard(db: Session, current_user: User):
+    return {"current_book": _get_current_book_or_none(db), **_get_user_data(db, current_user)}
+
+
+def _get_current_book_or_none(db: Session):
+    # Пока в клубе нет ни одной книги, страница всё равно должна открыться
+    try:
+        return _get_current_book_of_month(db)
+    except HTTPException as exc:
+        if exc.status_code == 404:
+            return None
+        raise
+
+
+def _get_user_data(db: Session, current_user: User) -> dict:
+    return {
+        "user": _get_current_user_info(db, current_user),
+        "favorite_ids": _list_favorite_ids(db, current_user),
+        "meetings": _get_my_meetings(db, current_user)["items"],
+    }
@@ -1,24 +1,45 @@
 """Meeting registration endpoints."""
 
 from datetime import datetime
+from typing import Literal, Optional
 
 from fastapi import APIRouter, Depends, HTTPException, Query, status
-from sqlalchemy import func
+from sqlalchemy import func, select
 from sqlalchemy.orm import Session
 
+from ..database import DBSession, run_in_session
 from ..dependencies import get_current_user, get_db, require_admin_role
+from ..events import notify_book_changed
+from ..export import export_response
 from ..models import BookOfMonth, MeetingRegistration, User
+from ..response_cache import invalidate_responses
+from ..schemas import (
+    MeetingRegistrationResponse,
+    MyMeetingsResponse,
+    ParticipantsResponse,
+)
+from ..stats import adjust_registrations
+from ..timestamps import time_range
 
 router = APIRouter(prefix="/meetings", tags=["Встречи"])
 
 
-@router.post("/register/{book_id}", status_code=status.HTTP_201_CREATED)
-def register_for_meeting(
+@router.post(
+    "/register/{book_id}",
+    response_model=MeetingRegistrationResponse,
+    response_model_exclude_unset=True,
+    status_code=status.HTTP_201_CREATED,
+)
+async def register_for_meeting(
     book_id: int,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: DBSession = Depends(get_db),
 ):
     """Записаться на встречу (книгу месяца)."""
+    return await run_in_session(db, _register_for_meeting, book_id, current_user)
+
+
+def _register_for_meeting(db: Session, book_id: int, current_user: User):
     # Проверяем, существует ли книга
     book = db.query(BookOfMonth).filter(BookOfMonth.id == book_id).first()
     if not book:
@@ -45,8 +66,12 @@ def register_for_meeting(
         status="registered",
     )
     db.add(registration)
+    adjust_registrations(db, book_id, 1)
     db.commit()
     db.refresh(registration)
+    # registered_count книги попадает в кэшированные ответы
+    invalidate_responses()
+    notify_book_changed(db, book_id)
 
     return {
         "message": "Вы успешно записались на встречу",
@@ -62,12 +87,17 @@ def register_for_meeting(
 
 
 @router.delete("/register/{book_id}", status_code=status.HTTP_204_NO_CONTENT)
-def cancel_meeting_registration(
+async def cancel_meeting_registration(
     book_id: int,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: DBSession = Depends(get_db),
 ):
     """Отменить запись на встречу."""
+    await run_in_session(db, _cancel_meeting_registration, book_id, current_user)
+    return None
+
+
+def _cancel_meeting_registration(db: Session, book_id: int, current_user: User) -> None:
     registration = (
         db.query(MeetingRegistration)
         .filter(
@@ -81,22 +111,33 @@ def cancel_meeting_registration(
         raise HTTPException(status_code=404, detail="Запись на встречу не найдена")
 
     registration.status = "cancelled"
+    adjust_registrations(db, book_id, -1)
     db.commit()
-    return None
+    invalidate_responses()
+    notify_book_changed(db, book_id)
 
 
-@router.get("/my")
-def get_my_meetings(
+@router.get("/my", response_model=MyMeetingsResponse)
+async def get_my_meetings(
+    since: Optional[datetime] = Query(None, description="Не раньше этого времени (ISO 8601)"),
+    until: Optional[datetime] = Query(None, description="Раньше этого времени (ISO 8601)"),
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: DBSession = Depends(get_db),
 ):
     """Получить список встреч, на которые записан текущий пользователь."""
+    return await run_in_session(db, _get_my_meetings, current_user, since, until)
+
+
+def _get_my_meetings(
+    db: Session, current_user: User, since: Optional[datetime] = None, until: Optional[datetime] = None
+):
     registrations_raw = (
         db.query(MeetingRegistration, BookOfMonth)
         .join(BookOfMonth, MeetingRegistration.book_id == BookOfMonth.id)
         .filter(
             MeetingRegistration.user_id == current_user.id,
             MeetingRegistration.status == "registered",
+            *time_range(MeetingRegistration.registered_at, since, until),
         )
         .order_by(MeetingRegistration.id.desc())
         .all()
@@ -121,13 +162,60 @@ def get_my_meetings(
     }
 
 
-@router.get("/{book_id}/participants")
-def get_meeting_participants(
+@router.get("/{book_id}/participants/export")
+async def export_meeting_participants(
     book_id: int,
+    format: Literal["csv", "xlsx"] = Query("csv", description="xlsx - при установленном пакете xlsxwriter"),
+    since: Optional[datetime] = Query(None, description="Не раньше этого времени (ISO 8601)"),
+    until: Optional[datetime] = Query(None, description="Раньше этого времени (ISO 8601)"),
     admin_user: User = Depends(require_admin_role),
-    db: Session = Depends(get_db),
+    db: DBSession = Depends(get_db),
+):
+    """Выгрузить участников встречи в CSV или XLSX (только для админов)."""
+    await run_in_session(db, _get_book_or_404, book_id)
+    stmt = (
+        select(
+            MeetingRegistration.id,
+            User.id,
+            func.trim(User.first_name + " " + User.last_name),
+            User.email,
+            User.phone,
+            MeetingRegistration.registered_at,
+        )
+        .join(User, MeetingRegistration.user_id == User.id)
+        .where(
+            MeetingRegistration.book_id == book_id,
+            MeetingRegistration.status == "registered",
+            *time_range(MeetingRegistration.registered_at, since, until),
+        )
+        .order_by(MeetingRegistration.registered_at.asc())
+    )
+    header = ["registration_id", "user_id", "user_name", "user_email", "user_phone", "registered_at"]
+    return await export_response(format, f"participants-{book_id}", header, stmt)
+
+
+def _get_book_or_404(db: Session, book_id: int) -> BookOfMonth:
+    book = db.query(BookOfMonth).filter(BookOfMonth.id == book_id).first()
+    if not book:
+        raise HTTPException(status_code=404, detail="Книга не найдена")
+    return book
+
+
+@router.get("/{book_id}/participants", response_model=ParticipantsResponse)
+async def get_meeting_participants(
+    book_id: int,
+    since: Optional[datetime] = Query(None, description="Не раньше этого времени (ISO 8601)"),
+    until: Optional[datetime] = Query(None, description="Раньше этого времени (ISO 8601)"),
+    admin_user: User = Depends(require_admin_role),
+    db: DBSession = Depends(get_db),
 ):
     """Получить список участников встречи (только для админов)."""
+    return await run_in_session(db, _get_meeting_participants, book_id, since, until)
+
+
+def _get_meeting_participants(
+    db: Session, book_id: int, since: Optional[datetime] = None, until: Optional[datetime] = None
+):
     # Проверяем, существует ли книга
     book = db.query(BookOfMonth).filter(BookOfMonth.id == book_id).first()
     if not book:
@@ -139,6 +227,7 @@ def get_meeting_participants(
         .filter(
             MeetingRegistration.book_id == book_id,
             MeetingRegistration.status == "registered",
+            *time_range(MeetingRegistration.registered_at, since, until),
         )
         .order_by(MeetingRegistration.registered_at.asc())
         .all()
@@ -0,0 +1,106 @@
+"""Prometheus /metrics endpoint."""
+
+from datetime import datetime
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Response
+from sqlalchemy.pool import QueuePool
+
+from ..compression import compression_stats
+from ..config import METRICS_TOKEN
+from ..database import async_engine, engine
+from ..delivery import delivery, delivery_configured
+from ..dependencies import user_cache
+from ..events import broker
+from ..maintenance import last_sweep
+from ..metrics import Counter, Gauge, render_metrics
+from ..pagination import totals_cache
+from ..response_cache import response_cache, response_cache_stats
+from ..security import token_cache
+
+router = APIRouter(tags=["Общие"])
+
+# Значения ниже хранятся в своих модулях и копируются сюда при каждом сборе метрик
+cache_hits = Counter("cache_hits_total", "In-process cache hits.", ("cache",))
+cache_misses = Counter("cache_misses_total", "In-process cache misses.", ("cache",))
+cache_entries = Gauge("cache_entries", "Entries held by an in-process cache.", ("cache",))
+response_cache_not_modified = Counter("response_cache_not_modified_total", "304 answers to If-None-Match.")
+response_cache_bytes = Counter("response_cache_bytes_total", "Response bytes sent and saved by 304 answers.", ("kind",))
+compression_responses = Counter("compression_responses_total", "Responses compressed with gzip or brotli.")
+compression_bytes = Counter("compression_bytes_total", "Bytes before and after compression.", ("direction",))
+db_pool_connections = Gauge("db_pool_connections", "Pooled connections by state.", ("engine", "state"))
+db_pool_size = Gauge("db_pool_size", "Configured pool size, overflow not included.", ("engine",))
+delivery_jobs = Counter("code_delivery_jobs_total", "Verification code delivery jobs by outcome.", ("outcome",))
+delivery_queue = Gauge("code_delivery_queue_size", "Codes waiting for a sender.")
+delivery_breaker = Gauge("code_delivery_breaker_state", "Circuit breaker of the message provider, 1 for the current state.", ("state",))
+sweep_removed = Gauge("auth_sweep_last_removed_rows", "Rows removed by the last background sweep.", ("table",))
+sweep_duration = Gauge("auth_sweep_last_duration_seconds", "Duration of the last background sweep.")
+sweep_finished = Gauge("auth_sweep_last_finished_timestamp_seconds", "Unix time the last background sweep finished.")
+sse_subscribers = Gauge("sse_subscribers", "Open Server-Sent Events streams.")
+sse_books = Gauge("sse_books", "Books with at least one SSE subscriber.")
+sse_events = Counter("sse_events_total", "SSE broker activity by kind.", ("kind",))
+
+_CACHES = {"user": user_cache, "token": token_cache, "totals": totals_cache, "response": response_cache}
+_ENGINES = {"sync": engine, "async": async_engine}
+_BREAKER_STATES = ("closed", "open", "half-open")
+
+
+async def require_metrics_token(authorization: Optional[str] = Header(default=None)):
+    # Без METRICS_TOKEN эндпоинт открыт: тогда его нужно закрывать на уровне прокси
+    if METRICS_TOKEN and authorization != f"Bearer {METRICS_TOKEN}":
+        raise HTTPException(status_code=401, detail="Недостаточно прав")
+
+
+@router.get("/metrics", include_in_schema=False, dependencies=[Depends(require_metrics_token)])
+async def metrics():
+    """Метрики процесса в текстовом формате Prometheus."""
+    collect_runtime_metrics()
+    return Response(render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+def collect_runtime_metrics() -> None:
+    """Copy counters and sizes kept by caches, the pool and background workers into the registry."""
+    for name, cache in _CACHES.items():
+        cache_hits.set(cache.hits, name)
+        cache_misses.set(cache.misses, name)
+        cache_entries.set(len(cache), name)
+    responses = response_cache_stats()
+    response_cache_not_modified.set(responses["not_modified"])
+    response_cache_bytes.set(responses["bytes_sent"], "sent")
+    response_cache_bytes.set(responses["bytes_saved"], "saved")
+
+    compression = compression_stats()
+    compression_responses.set(compression["responses"])
+    compression_bytes.set(compression["bytes_in"], "in")
+    compression_bytes.set(compression["bytes_out"], "out")
+
+    for name, db_engine in _ENGINES.items():
+        pool = db_engine.pool if db_engine is not None else None
+        # StaticPool (SQLite в памяти) не ведёт учёт соединений
+        if isinstance(pool, QueuePool):
+            db_pool_connections.set(pool.checkedout(), name, "checked_out")
+            db_pool_connections.set(pool.checkedin(), name, "idle")
+            db_pool_size.set(pool.size(), name)
+
+    if delivery_configured():
+        with delivery._stats_lock:
+            stats = dict(delivery.stats)
+        for outcome, count in stats.items():
+            delivery_jobs.set(count, outcome)
+        delivery_queue.set(delivery.queue_size())
+        state = delivery.breaker.state
+        for name in _BREAKER_STATES:
+            delivery_breaker.set(1 if name == state else 0, name)
+
+    sweep = dict(last_sweep)
+    if sweep:
+        for table in ("auth_codes", "auth_tokens", "rate_limits"):
+            sweep_removed.set(sweep[table], table)
+        sweep_duration.set(sweep["seconds"])
+        sweep_finished.set(datetime.fromisoformat(sweep["finished_at"]).timestamp())
+
+    events = broker.stats()
+    sse_subscribers.set(events.pop("subscribers"))
+    sse_books.set(events.pop("books"))
+    for kind, count in events.items():
+        sse_events.set(count, kind)
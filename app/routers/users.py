@@ -1,24 +1,46 @@
 """User-related endpoints."""
 
-from typing import Optional
+from typing import Literal, Optional
 
 from fastapi import APIRouter, Depends, HTTPException, Query, status
-from sqlalchemy.orm import Session
-
-from sqlalchemy import func, or_
-
-from ..dependencies import get_current_user, get_db, require_admin_role
-from ..models import BookOfMonth, Favorite, MeetingRegistration, Review, User
-from ..schemas import RoleUpdate, UserCreate, UserUpdate
+from sqlalchemy import func, or_, select
 
 # Импорт для получения сессии БД
 from sqlalchemy.orm import Session
 
+from ..database import DBSession, run_in_session
+from ..dependencies import (
+    get_current_user,
+    get_db,
+    invalidate_cached_user,
+    require_admin_role,
+)
+from ..export import export_response
+from ..models import BookOfMonth, Favorite, MeetingRegistration, Review, User
+from ..pagination import SortKey, invalidate_totals, page_response, paginate
+from ..revocation import revoke_user_tokens
+from ..schemas import (
+    PageResponse,
+    RegisterResponse,
+    RevokeSessionsResponse,
+    RoleUpdate,
+    RoleUpdateResponse,
+    UserCreate,
+    UserDetailResponse,
+    UserListItem,
+    UserProfileResponse,
+    UserUpdate,
+)
+
 router = APIRouter(tags=["Пользователи"])
 
 
-@router.post("/register", include_in_schema=False, status_code=status.HTTP_201_CREATED)
-def register_user(data: UserCreate, db: Session = Depends(get_db)):
+@router.post("/register", response_model=RegisterResponse, include_in_schema=False, status_code=status.HTTP_201_CREATED)
+async def register_user(data: UserCreate, db: DBSession = Depends(get_db)):
+    return await run_in_session(db, _register_user, data)
+
+
+def _register_user(db: Session, data: UserCreate):
     if db.query(User).filter(User.email == data.email).first():
         raise HTTPException(status_code=400, detail="Пользователь с таким email уже существует")
 
@@ -36,12 +58,17 @@ def register_user(data: UserCreate, db: Session = Depends(get_db)):
     db.add(user)
     db.commit()
     db.refresh(user)
+    invalidate_totals("users")
 
     return {"message": "Регистрация прошла успешно!", "user_id": user.id}
 
 
-@router.get("/me")
-def get_current_user_info(current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+@router.get("/me", response_model=UserProfileResponse, response_model_exclude_unset=True)
+async def get_current_user_info(current_user: User = Depends(get_current_user), db: DBSession = Depends(get_db)):
+    return await run_in_session(db, _get_current_user_info, current_user)
+
+
+def _get_current_user_info(db: Session, current_user: User):
     # Обновляем роль из БД (на случай если она была изменена)
     # Убеждаемся, что роль корректна - всегда берём из БД, а не из токена
     user_role = current_user.role if current_user.role and current_user.role.strip() else "user"
@@ -51,6 +78,7 @@ def get_current_user_info(current_user: User = Depends(get_current_user), db: Se
         current_user.role = user_role
         db.commit()
         db.refresh(current_user)
+        invalidate_cached_user(current_user.id)
     
     return {
         "id": current_user.id,
@@ -67,12 +95,16 @@ def get_current_user_info(current_user: User = Depends(get_current_user), db: Se
     }
 
 
-@router.patch("/me")
-def update_current_user_profile(
+@router.patch("/me", response_model=UserProfileResponse)
+async def update_current_user_profile(
     user_update: UserUpdate,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: DBSession = Depends(get_db),
 ):
+    return await run_in_session(db, _update_current_user_profile, user_update, current_user)
+
+
+def _update_current_user_profile(db: Session, user_update: UserUpdate, current_user: User):
     if user_update.first_name is not None:
         current_user.first_name = user_update.first_name
     if user_update.last_name is not None:
@@ -92,6 +124,8 @@ def update_current_user_profile(
 
     db.commit()
     db.refresh(current_user)
+    invalidate_cached_user(current_user.id)
+    invalidate_totals("users")
 
     return {
         "message": "Профиль успешно обновлен",
@@ -109,13 +143,17 @@ def update_current_user_profile(
     }
 
 
-@router.put("/users/{id}/role")
-def update_user_role(
+@router.put("/users/{id}/role", response_model=RoleUpdateResponse)
+async def update_user_role(
     id: int,
     role_update: RoleUpdate,
-    db: Session = Depends(get_db),
+    db: DBSession = Depends(get_db),
     admin_user: User = Depends(require_admin_role),
 ):
+    return await run_in_session(db, _update_user_role, id, role_update)
+
+
+def _update_user_role(db: Session, id: int, role_update: RoleUpdate):
     user = db.query(User).filter(User.id == id).first()
     if not user:
         raise HTTPException(status_code=404, detail="Пользователь не найден")
@@ -123,6 +161,8 @@ def update_user_role(
     user.role = role_update.role
     db.commit()
     db.refresh(user)
+    invalidate_cached_user(user.id)
+    invalidate_totals("users")
 
     return {
         "message": f"Роль пользователя {user.email} обновлена на {role_update.role}",
@@ -132,36 +172,53 @@ def update_user_role(
     }
 
 
-@router.get("/users")
-def list_users(
+@router.post("/users/{id}/revoke-sessions", response_model=RevokeSessionsResponse)
+async def revoke_user_sessions(
+    id: int,
+    db: DBSession = Depends(get_db),
+    admin_user: User = Depends(require_admin_role),
+):
+    """Отозвать все действующие токены пользователя (только админ)."""
+    return await run_in_session(db, _revoke_user_sessions, id)
+
+
+def _revoke_user_sessions(db: Session, id: int):
+    if not db.query(User.id).filter(User.id == id).first():
+        raise HTTPException(status_code=404, detail="Пользователь не найден")
+
+    revoked = revoke_user_tokens(db, id)
+    return {"message": f"Отозвано сессий: {revoked}", "id": id, "revoked": revoked}
+
+
+@router.get("/users", response_model=PageResponse[UserListItem])
+async def list_users(
     page: int = Query(1, ge=1),
     limit: int = Query(10, ge=1, le=100),
     search: Optional[str] = Query(None, description="Поиск по имени или email"),
     role: Optional[str] = Query(None, description="Фильтр по роли"),
-    db: Session = Depends(get_db),
+    cursor: Optional[str] = Query(None, description="Курсор следующей страницы (next_cursor из предыдущего ответа)"),
+    include_total: bool = Query(True, description="false - не считать total, только has_more"),
+    db: DBSession = Depends(get_db),
     admin_user: User = Depends(require_admin_role),
 ):
-    base_query = db.query(User)
-    
-    # Фильтр по роли
-    if role:
-        base_query = base_query.filter(User.role == role)
-    
-    # Поиск по имени или email
-    if search:
-        search_pattern = f"%{search}%"
-        base_query = base_query.filter(
-            or_(
-                User.first_name.ilike(search_pattern),
-                User.last_name.ilike(search_pattern),
-                User.email.ilike(search_pattern)
-            )
-        )
-    
-    total = base_query.count()
-    offset_value = (page - 1) * limit
-    users = base_query.order_by(User.id.desc()).offset(offset_value).limit(limit).all()
-    total_pages = (total + limit - 1) // limit if total else 0
+    return await run_in_session(db, _list_users, page, limit, search, role, cursor, include_total)
+
+
+def _list_users(
+    db: Session,
+    page: int,
+    limit: int,
+    search: Optional[str],
+    role: Optional[str],
+    cursor: Optional[str] = None,
+    include_total: bool = True,
+):
+    base_query = db.query(User).filter(*_user_filters(search, role))
+
+    result = paginate(
+        base_query, [SortKey("id", User.id)], page, limit, cursor, include_total, total_key=("users", search, role)
+    )
+    users = result.items
 
     # Подсчитываем статистику для каждого пользователя
     user_ids = [u.id for u in users]
@@ -221,12 +278,12 @@ def list_users(
         for stat in review_stats:
             stats_map[stat.user_id]["reviews_count"] = stat.reviews_count
 
-    return {
-        "page": page,
-        "limit": limit,
-        "total": total,
-        "pages": total_pages,
-        "items": [
+    return page_response(
+        result,
+        page,
+        limit,
+        cursor,
+        [
             {
                 "id": u.id,
                 "first_name": u.first_name,
@@ -242,15 +299,90 @@ def list_users(
             }
             for u in users
         ],
-    }
+    )
 
 
-@router.get("/users/{id}")
-def get_user_by_id(
+def _user_filters(search: Optional[str], role: Optional[str]) -> list:
+    conditions = []
+    # Фильтр по роли
+    if role:
+        conditions.append(User.role == role)
+    # Поиск по имени или email
+    if search:
+        search_pattern = f"%{search}%"
+        conditions.append(
+            or_(
+                User.first_name.ilike(search_pattern),
+                User.last_name.ilike(search_pattern),
+                User.email.ilike(search_pattern),
+            )
+        )
+    return conditions
+
+
+@router.get("/users/export")
+async def export_users(
+    format: Literal["csv", "xlsx"] = Query("csv", description="xlsx - при установленном пакете xlsxwriter"),
+    search: Optional[str] = Query(None, description="Поиск по имени или email"),
+    role: Optional[str] = Query(None, description="Фильтр по роли"),
+    admin_user: User = Depends(require_admin_role),
+):
+    """Выгрузить пользователей со статистикой в CSV или XLSX (только админ)."""
+    # Счётчики агрегируются подзапросами один раз на всю выгрузку, а не по пачкам пользователей
+    meetings = (
+        select(MeetingRegistration.user_id, func.count().label("count"))
+        .where(MeetingRegistration.status == "registered")
+        .group_by(MeetingRegistration.user_id)
+        .subquery()
+    )
+    favorites = select(Favorite.user_id, func.count().label("count")).group_by(Favorite.user_id).subquery()
+    reviews = select(Review.user_id, func.count().label("count")).group_by(Review.user_id).subquery()
+    stmt = (
+        select(
+            User.id,
+            User.first_name,
+            User.last_name,
+            User.email,
+            User.phone,
+            User.birthdate,
+            User.role,
+            User.created_at,
+            func.coalesce(meetings.c.count, 0),
+            func.coalesce(favorites.c.count, 0),
+            func.coalesce(reviews.c.count, 0),
+        )
+        .outerjoin(meetings, meetings.c.user_id == User.id)
+        .outerjoin(favorites, favorites.c.user_id == User.id)
+        .outerjoin(reviews, reviews.c.user_id == User.id)
+        .where(*_user_filters(search, role))
+        .order_by(User.id)
+    )
+    header = [
+        "id",
+        "first_name",
+        "last_name",
+        "email",
+        "phone",
+        "birth_date",
+        "role",
+        "created_at",
+        "meetings_count",
+        "favorites_count",
+        "reviews_count",
+    ]
+    return await export_response(format, "users", header, stmt)
+
+
+@router.get("/users/{id}", response_model=UserDetailResponse)
+async def get_user_by_id(
     id: int,
-    db: Session = Depends(get_db),
+    db: DBSession = Depends(get_db),
     admin_user: User = Depends(require_admin_role),
 ):
+    return await run_in_session(db, _get_user_by_id, id)
+
+
+def _get_user_by_id(db: Session, id: int):
     user = db.query(User).filter(User.id == id).first()
     if not user:
         raise HTTPException(status_code=404, detail="Пользователь не найден")
@@ -2,10 +2,11 @@
 
 import re
 from datetime import datetime
-from typing import List, Optional
+from typing import Dict, Generic, List, Optional, TypeVar
 
 from pydantic import BaseModel, EmailStr, validator
 
+from .config import FAVORITES_BATCH_MAX_IDS
 from .enums import UserRole
 
 
@@ -119,6 +120,22 @@ class FavoriteCreate(BaseModel):
     book_id: int
 
 
+class FavoriteBatch(BaseModel):
+    """Request body for adding or removing several favorites at once."""
+
+    book_ids: List[int]
+
+    @validator("book_ids")
+    def validate_book_ids(cls, value: List[int]) -> List[int]:
+        # Повторы убираем, порядок первого вхождения сохраняем
+        value = list(dict.fromkeys(value))
+        if not value:
+            raise ValueError("Список книг пуст")
+        if len(value) > FAVORITES_BATCH_MAX_IDS:
+            raise ValueError(f"Не больше {FAVORITES_BATCH_MAX_IDS} книг за один запрос")
+        return value
+
+
 class ReviewCreate(BaseModel):
     """Request body for creating a review."""
 
@@ -135,6 +152,7 @@ class ReviewCreate(BaseModel):
 class MeetingRegistrationResponse(BaseModel):
     """Response model for meeting registration."""
 
+    message: Optional[str] = None
     id: int
     user_id: int
     book_id: int
@@ -145,3 +163,259 @@ class MeetingRegistrationResponse(BaseModel):
     book_location: Optional[str] = None
     user_name: Optional[str] = None
     user_email: Optional[str] = None
+
+
+# Модели ответов. Порядок полей совпадает с прежними словарями, чтобы JSON не изменился.
+
+T = TypeVar("T")
+
+
+class MessageResponse(BaseModel):
+    message: str
+
+
+class PageResponse(BaseModel, Generic[T]):
+    """Response body of list endpoints (see pagination.page_response)."""
+
+    page: Optional[int] = None
+    limit: int
+    total: Optional[int] = None
+    pages: Optional[int] = None
+    has_more: bool
+    next_cursor: Optional[str] = None
+    items: List[T]
+
+
+class SendCodeResponse(BaseModel):
+    message: str
+    # Только в режиме разработки, когда сервис отправки не настроен
+    code: Optional[str] = None
+    dev_mode: Optional[bool] = None
+
+
+class TokenResponse(BaseModel):
+    message: str
+    user_id: int
+    access_token: str
+    token_type: str
+    expires_in: int
+
+
+class BookResponse(BaseModel):
+    id: int
+    title: str
+    author: str
+    date: str
+    location: str
+    description: Optional[str] = None
+    avg_rating: Optional[float] = None
+    is_current: bool
+    registered_count: int
+
+
+class BookDetailResponse(BookResponse):
+    reviews_count: int
+    rating_histogram: Dict[str, int]
+
+
+class BookWriteResponse(BaseModel):
+    message: str
+    id: int
+    title: str
+    author: str
+    date: str
+    location: str
+    description: Optional[str] = None
+
+
+class SetCurrentBookResponse(BaseModel):
+    message: str
+    id: int
+    title: str
+    is_current: bool
+
+
+class BulkImportError(BaseModel):
+    line: int
+    error: str
+
+
+class BulkImportResponse(BaseModel):
+    message: str
+    inserted: int
+    failed: int
+    # Не больше BULK_IMPORT_MAX_ERRORS первых ошибок (и причина остановки, если импорт прерван);
+    # остальные учтены только в failed
+    errors: List[BulkImportError]
+
+
+class ReviewResponse(BaseModel):
+    message: Optional[str] = None
+    id: int
+    user_id: int
+    book_id: int
+    rating: int
+    comment: Optional[str] = None
+    created_at: str
+
+
+class FavoriteResponse(BaseModel):
+    message: str
+    id: int
+    user_id: int
+    book_id: int
+    created_at: str
+
+
+class FavoriteBatchAddResponse(BaseModel):
+    added: List[int]
+    already_added: List[int]
+
+
+class FavoriteBatchRemoveResponse(BaseModel):
+    removed: List[int]
+    not_found: List[int]
+
+
+class FavoriteBook(BaseModel):
+    id: int
+    title: str
+    author: str
+    date: str
+    location: str
+    description: Optional[str] = None
+
+
+class FavoriteItem(BaseModel):
+    id: int
+    book: Optional[FavoriteBook] = None
+    created_at: str
+
+
+class MyMeetingItem(BaseModel):
+    id: int
+    book_id: int
+    registered_at: str
+    book_title: str
+    book_author: str
+    book_date: str
+    book_location: str
+    book_description: Optional[str] = None
+
+
+class MyMeetingsResponse(BaseModel):
+    items: List[MyMeetingItem]
+
+
+class Participant(BaseModel):
+    registration_id: int
+    user_id: int
+    user_name: str
+    user_email: str
+    user_phone: Optional[str] = None
+    registered_at: str
+
+
+class ParticipantsResponse(BaseModel):
+    book_id: int
+    book_title: str
+    book_date: str
+    book_location: str
+    total_participants: int
+    participants: List[Participant]
+
+
+class RegisterResponse(BaseModel):
+    message: str
+    user_id: int
+
+
+class UserProfileResponse(BaseModel):
+    message: Optional[str] = None
+    id: int
+    first_name: str
+    last_name: str
+    email: str
+    phone: Optional[str] = None
+    birth_date: Optional[str] = None
+    role: str
+    fav_authors: List[str]
+    fav_genres: List[str]
+    fav_books: List[str]
+    discuss_books: List[str]
+
+
+class RoleUpdateResponse(BaseModel):
+    message: str
+    id: int
+    email: str
+    role: str
+
+
+class RevokeSessionsResponse(BaseModel):
+    message: str
+    id: int
+    revoked: int
+
+
+class UserListItem(BaseModel):
+    id: int
+    first_name: str
+    last_name: str
+    email: str
+    phone: Optional[str] = None
+    birth_date: Optional[str] = None
+    role: str
+    created_at: Optional[str] = None
+    meetings_count: int
+    favorites_count: int
+    reviews_count: int
+
+
+class UserStatistics(BaseModel):
+    meetings_count: int
+    favorites_count: int
+    reviews_count: int
+
+
+class RegisteredMeeting(BaseModel):
+    book_id: int
+    book_title: str
+    book_author: str
+    book_date: str
+    book_location: str
+    registered_at: str
+
+
+class UserDetailResponse(BaseModel):
+    id: int
+    first_name: str
+    last_name: str
+    email: str
+    phone: Optional[str] = None
+    birth_date: Optional[str] = None
+    role: str
+    created_at: Optional[str] = None
+    fav_authors: List[str]
+    fav_genres: List[str]
+    fav_books: List[str]
+    discuss_books: List[str]
+    statistics: UserStatistics
+    registered_meetings: List[RegisteredMeeting]
+
+
+class HomeResponse(BaseModel):
+    """Everything the landing page loads: current book, first catalogue page and, with a token, the user's data."""
+
+    current_book: Optional[BookResponse] = None
+    books: PageResponse[BookResponse]
+    user: Optional[UserProfileResponse] = None
+    favorite_ids: List[int]
+    meetings: List[MyMeetingItem]
+
+
+class DashboardResponse(BaseModel):
+    user: UserProfileResponse
+    current_book: Optional[BookResponse] = None
+    favorite_ids: List[int]
+    meetings: List[MyMeetingItem]
@@ -0,0 +1,106 @@
+"""Full-text search over books using an SQLite FTS5 index.
+
+books_fts is an external-content FTS5 table over books_of_month (title, author,
+description) kept in sync by triggers. On other databases, or when SQLite is
+built without FTS5, fts_enabled stays False and callers fall back to ILIKE.
+"""
+
+import re
+from typing import Optional
+
+from sqlalchemy import column, table, text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Query, Session
+
+from .models import BookOfMonth
+
+books_fts = table("books_fts", column("rowid"), column("rank"), column("books_fts"))
+
+# Включается в detect_books_fts() при старте, если миграция books_fts создала индекс
+fts_enabled = False
+
+_FTS_DDL = [
+    # unicode61 приводит к нижнему регистру и кириллицу, в отличие от LIKE в SQLite
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS books_fts USING fts5(
+        title, author, description,
+        content='books_of_month', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS books_fts_ai AFTER INSERT ON books_of_month BEGIN
+        INSERT INTO books_fts(rowid, title, author, description)
+        VALUES (new.id, new.title, new.author, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS books_fts_ad AFTER DELETE ON books_of_month BEGIN
+        INSERT INTO books_fts(books_fts, rowid, title, author, description)
+        VALUES ('delete', old.id, old.title, old.author, old.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS books_fts_au AFTER UPDATE OF title, author, description ON books_of_month BEGIN
+        INSERT INTO books_fts(books_fts, rowid, title, author, description)
+        VALUES ('delete', old.id, old.title, old.author, old.description);
+        INSERT INTO books_fts(rowid, title, author, description)
+        VALUES (new.id, new.title, new.author, new.description);
+    END
+    """,
+]
+
+
+def create_books_fts(conn: Connection) -> bool:
+    """Create books_fts and its triggers and index existing books (migration step). Returns availability."""
+    if conn.dialect.name != "sqlite":
+        return False
+    try:
+        # Savepoint: без FTS5 откатывается только эта часть, а не вся миграция
+        with conn.begin_nested():
+            for statement in _FTS_DDL:
+                conn.execute(text(statement))
+            conn.execute(text("INSERT INTO books_fts(books_fts) VALUES ('rebuild')"))
+            # Совпадение в названии весит больше, чем в авторе, и тем более в описании
+            conn.execute(text("INSERT INTO books_fts(books_fts, rank) VALUES ('rank', 'bm25(10.0, 5.0, 1.0)')"))
+    except OperationalError:
+        # SQLite собран без FTS5
+        return False
+    return True
+
+
+def detect_books_fts(engine: Engine) -> bool:
+    """Enable FTS search if the books_fts migration created the index. Returns availability."""
+    global fts_enabled
+    fts_enabled = False
+    if engine.dialect.name == "sqlite":
+        with engine.connect() as conn:
+            fts_enabled = (
+                conn.execute(text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'books_fts'")).first()
+                is not None
+            )
+    return fts_enabled
+
+
+def fts_match_expression(search: str) -> Optional[str]:
+    """Turn user input into an FTS5 query: every word must match as a prefix."""
+    words = re.findall(r"\w+", search.lower())
+    if not words:
+        return None
+    return " ".join(f'"{word}"*' for word in words)
+
+
+def search_books(db: Session, query: Query, search: str) -> tuple[Query, bool]:
+    """Restrict a BookOfMonth query to books matching search.
+
+    Returns the query and whether it went through books_fts, in which case it can
+    be ordered by books_fts.c.rank (bm25, lower is better).
+    """
+    match = fts_match_expression(search) if fts_enabled and db.get_bind().dialect.name == "sqlite" else None
+    if match is None:
+        like = f"%{search}%"
+        return query.filter(BookOfMonth.title.ilike(like) | BookOfMonth.author.ilike(like)), False
+
+    query = query.join(books_fts, books_fts.c.rowid == BookOfMonth.id).filter(books_fts.c.books_fts.op("MATCH")(match))
+    return query, True
@@ -1,15 +1,17 @@
 """Security helpers for tokens and verification codes."""
 
 import random
+import secrets
 import string
+import time
 from datetime import datetime, timedelta
 
 import jwt
 from fastapi import HTTPException
-from sqlalchemy.orm import Session
 
-from .config import JWT_ALGORITHM, JWT_EXPIRATION_HOURS, JWT_SECRET_KEY
-from .models import AuthCode
+from .cache import TTLCache
+from .config import JWT_ALGORITHM, JWT_CACHE_SIZE, JWT_EXPIRATION_HOURS, JWT_SECRET_KEY
+from .revocation import is_revoked, token_digest
 
 
 def generate_verification_code() -> str:
@@ -24,14 +26,31 @@ def create_access_token(user_id: int, user_role: str) -> str:
         "role": user_role,
         "iat": int(now.timestamp()),  # PyJWT 2.x требует timestamp (int)
         "exp": int(expire.timestamp()),  # PyJWT 2.x требует timestamp (int)
+        # Без случайного jti повторный вход в ту же секунду дал бы тот же токен, уже отозванный
+        "jti": secrets.token_urlsafe(16),
     }
     token = jwt.encode(payload, JWT_SECRET_KEY, algorithm=JWT_ALGORITHM)
     return token
 
 
+# Проверенные payload по SHA-256 токена; запись живёт не дольше exp самого токена
+token_cache = TTLCache(max_size=JWT_CACHE_SIZE, ttl=JWT_EXPIRATION_HOURS * 3600)
+
+
 def verify_token(token: str) -> dict:
+    key = token_digest(token)
+    # Отзыв проверяется по набору в памяти, без запроса к auth_tokens
+    if is_revoked(key):
+        raise HTTPException(status_code=401, detail="Токен отозван")
+
+    payload = token_cache.get(key)
+    if payload is not None and payload.get("exp", 0) > time.time():
+        return payload
+
     try:
         payload = jwt.decode(token, JWT_SECRET_KEY, algorithms=[JWT_ALGORITHM])
+        if "exp" in payload:
+            token_cache.set(key, payload, ttl=payload["exp"] - time.time())
         return payload
     except jwt.ExpiredSignatureError:
         raise HTTPException(status_code=401, detail="Токен истек")
@@ -40,14 +59,3 @@ def verify_token(token: str) -> dict:
     except Exception as e:
         # Обработка других ошибок JWT
         raise HTTPException(status_code=401, detail=f"Ошибка проверки токена: {str(e)}")
-
-
-def cleanup_old_codes(db: Session) -> None:
-    cutoff_time = datetime.now() - timedelta(hours=1)
-    cutoff_str = cutoff_time.isoformat()
-
-    old_codes = db.query(AuthCode).filter(AuthCode.created_at < cutoff_str).all()
-    for code in old_codes:
-        db.delete(code)
-    db.commit()
-
@@ -0,0 +1,113 @@
+"""Incrementally maintained per-book statistics (ratings and registrations).
+
+Every helper here runs inside the caller's transaction, so the counters are
+committed together with the review or registration that changed them.
+"""
+
+from sqlalchemy import case, delete, func, insert, literal, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from .models import BookOfMonth, BookStats, MeetingRegistration, Review
+
+_COUNTER_COLUMNS = [
+    "rating_sum",
+    "rating_count",
+    "rating_1",
+    "rating_2",
+    "rating_3",
+    "rating_4",
+    "rating_5",
+    "registered_count",
+]
+
+
+def _ensure_row(db: Session, book_id: int) -> None:
+    dialect = db.get_bind().dialect.name
+    if dialect == "sqlite":
+        db.execute(sqlite.insert(BookStats).values(book_id=book_id).on_conflict_do_nothing())
+    elif dialect == "postgresql":
+        db.execute(postgresql.insert(BookStats).values(book_id=book_id).on_conflict_do_nothing())
+    elif db.get(BookStats, book_id) is None:
+        db.add(BookStats(book_id=book_id, **{name: 0 for name in _COUNTER_COLUMNS}))
+        db.flush()
+
+
+def _increment(db: Session, book_id: int, **deltas: int) -> None:
+    _ensure_row(db, book_id)
+    values = {name: getattr(BookStats, name) + delta for name, delta in deltas.items()}
+    db.execute(update(BookStats).where(BookStats.book_id == book_id).values(**values))
+
+
+def record_review(db: Session, book_id: int, rating: int) -> None:
+    _increment(db, book_id, rating_sum=rating, rating_count=1, **{f"rating_{rating}": 1})
+
+
+def adjust_registrations(db: Session, book_id: int, delta: int) -> None:
+    _increment(db, book_id, registered_count=delta)
+
+
+def delete_book_stats(db: Session, book_id: int) -> None:
+    db.execute(delete(BookStats).where(BookStats.book_id == book_id))
+
+
+def get_book_stats(db: Session, book_ids: list[int]) -> dict[int, BookStats]:
+    """Stats rows by book id; books without a row have no reviews or registrations yet."""
+    if not book_ids:
+        return {}
+    rows = db.query(BookStats).filter(BookStats.book_id.in_(book_ids)).all()
+    return {row.book_id: row for row in rows}
+
+
+def _computed_stats():
+    """SELECT producing the counters of every existing book from the base tables."""
+    reviews = (
+        select(
+            Review.book_id,
+            func.sum(Review.rating).label("rating_sum"),
+            func.count(Review.id).label("rating_count"),
+            *(func.sum(case((Review.rating == r, 1), else_=0)).label(f"rating_{r}") for r in range(1, 6)),
+        )
+        .group_by(Review.book_id)
+        .subquery()
+    )
+    registrations = (
+        select(MeetingRegistration.book_id, func.count(MeetingRegistration.id).label("registered_count"))
+        .where(MeetingRegistration.status == "registered")
+        .group_by(MeetingRegistration.book_id)
+        .subquery()
+    )
+    counters = [
+        func.coalesce(
+            registrations.c.registered_count if name == "registered_count" else reviews.c[name],
+            literal(0),
+        ).label(name)
+        for name in _COUNTER_COLUMNS
+    ]
+    return (
+        select(BookOfMonth.id.label("book_id"), *counters)
+        .outerjoin(reviews, reviews.c.book_id == BookOfMonth.id)
+        .outerjoin(registrations, registrations.c.book_id == BookOfMonth.id)
+    )
+
+
+def rebuild_book_stats(db: Session) -> int:
+    """Recompute book_stats from reviews and meeting_registrations. Returns the row count."""
+    db.execute(delete(BookStats))
+    db.execute(insert(BookStats).from_select(["book_id", *_COUNTER_COLUMNS], _computed_stats()))
+    return db.query(func.count(BookStats.book_id)).scalar() or 0
+
+
+def verify_book_stats(db: Session) -> list[dict]:
+    """Compare stored counters with the base tables and return the mismatching books."""
+    stored = {row.book_id: row for row in db.query(BookStats).all()}
+    mismatches = []
+    for expected in db.execute(_computed_stats()).mappings():
+        row = stored.pop(expected["book_id"], None)
+        actual = {name: getattr(row, name) if row else 0 for name in _COUNTER_COLUMNS}
+        diff = {name: (actual[name], expected[name]) for name in _COUNTER_COLUMNS if actual[name] != expected[name]}
+        if diff:
+            mismatches.append({"book_id": expected["book_id"], "diff": diff})
+    # Оставшиеся строки относятся к уже удалённым книгам
+    mismatches.extend({"book_id": book_id, "diff": "orphaned"} for book_id in stored)
+    return mismatches
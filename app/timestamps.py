@@ -0,0 +1,52 @@
+"""Timestamps stored as integer microseconds since the epoch and exposed as ISO strings.
+
+The application keeps working with datetime.now().isoformat() strings, while the
+database gets an integer column that compares numerically and range-indexes.
+Naive datetimes are stored as is (local wall time, like the former strings);
+aware ones are converted to local time first.
+"""
+
+from datetime import datetime, timedelta
+from typing import Optional, Union
+
+from sqlalchemy import BigInteger
+from sqlalchemy.types import TypeDecorator
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def to_epoch_us(value: Union[datetime, str, int]) -> int:
+    if isinstance(value, int):
+        return value
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if value.tzinfo is not None:
+        value = value.astimezone().replace(tzinfo=None)
+    return (value - _EPOCH) // timedelta(microseconds=1)
+
+
+def from_epoch_us(value: int) -> str:
+    return (_EPOCH + timedelta(microseconds=value)).isoformat()
+
+
+class EpochTimestamp(TypeDecorator):
+    """BIGINT column of epoch microseconds; accepts datetime or ISO string, returns ISO string."""
+
+    impl = BigInteger
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        return None if value is None else to_epoch_us(value)
+
+    def process_result_value(self, value, dialect):
+        return None if value is None else from_epoch_us(value)
+
+
+def time_range(column, since: Optional[datetime] = None, until: Optional[datetime] = None) -> list:
+    """Filter conditions for since <= column < until; an omitted bound is open."""
+    conditions = []
+    if since is not None:
+        conditions.append(column >= since)
+    if until is not None:
+        conditions.append(column < until)
+    return conditions
@@ -0,0 +1,154 @@
+"""Нагрузочное сравнение синхронного (DB_ASYNC=0) и асинхронного (DB_ASYNC=1) режимов API.
+
+Для каждого режима скрипт запускает себя в отдельном процессе (режим выбирается при
+импорте app), поднимает приложение на временной SQLite-базе и гоняет его через
+внутрипроцессный ASGI-клиент httpx: большинство клиентов читают GET /books и
+GET /books/current, часть — записывается/отписывается от встречи.
+
+Требуется httpx (pip install httpx).
+
+Пример:
+    python scripts/bench_async_mode.py --concurrency 200 --duration 10
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def percentile(values: list, pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def seed(books: int, users: int) -> list:
+    from app.database import SessionLocal, init_db
+    from app.models import BookOfMonth, User
+    from app.security import create_access_token
+
+    init_db()
+    db = SessionLocal()
+    try:
+        db.add_all(
+            BookOfMonth(title=f"Книга {i}", author=f"Автор {i % 40}", date="2025-01-01", location="Клуб", description="Описание " * 20)
+            for i in range(books)
+        )
+        db.add_all(User(first_name="U", last_name=str(i), email=f"user{i}@example.com", role="user") for i in range(users))
+        db.commit()
+        return [create_access_token(user.id, user.role) for user in db.query(User).all()]
+    finally:
+        db.close()
+
+
+async def drive(concurrency: int, duration: float, writers: int, tokens: list) -> dict:
+    import httpx
+
+    from app.main import app
+
+    latencies = {"read": [], "write": []}
+    errors = 0
+    deadline = time.perf_counter() + duration
+    transport = httpx.ASGITransport(app=app)
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+
+        async def reader(worker: int):
+            nonlocal errors
+            paths = ("/books?page=1&limit=20", "/books/current")
+            i = 0
+            while time.perf_counter() < deadline:
+                started = time.perf_counter()
+                response = await client.get(paths[i % 2])
+                latencies["read"].append(time.perf_counter() - started)
+                errors += response.status_code >= 400
+                i += 1
+
+        async def writer(worker: int):
+            nonlocal errors
+            headers = {"Authorization": f"Bearer {tokens[worker % len(tokens)]}"}
+            i = 0
+            while time.perf_counter() < deadline:
+                book_id = (worker + i) % 50 + 1
+                started = time.perf_counter()
+                response = await client.post(f"/meetings/register/{book_id}", headers=headers)
+                if response.status_code == 201:
+                    await client.delete(f"/meetings/register/{book_id}", headers=headers)
+                latencies["write"].append(time.perf_counter() - started)
+                errors += response.status_code >= 500
+                i += 1
+
+        tasks = [reader(w) for w in range(concurrency - writers)] + [writer(w) for w in range(writers)]
+        await asyncio.gather(*tasks)
+
+    from app.database import async_engine
+
+    if async_engine is not None:
+        # Потоки aiosqlite не дают процессу завершиться, пока пул не закрыт
+        await async_engine.dispose()
+
+    return {
+        "reads_per_sec": len(latencies["read"]) / duration,
+        "writes_per_sec": len(latencies["write"]) / duration,
+        "read_p50_ms": percentile(latencies["read"], 50) * 1000,
+        "read_p95_ms": percentile(latencies["read"], 95) * 1000,
+        "write_p95_ms": percentile(latencies["write"], 95) * 1000,
+        "errors": errors,
+    }
+
+
+def worker_main(args) -> None:
+    sys.path.insert(0, ROOT)
+    tokens = seed(args.books, max(args.writers, 1))
+    result = asyncio.run(drive(args.concurrency, args.duration, args.writers, tokens))
+    print(json.dumps(result))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--writers", type=int, default=20)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--books", type=int, default=500)
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        worker_main(args)
+        return
+
+    results = {}
+    for mode in ("0", "1"):
+        tmp_dir = tempfile.mkdtemp(prefix="nartbooks-bench-")
+        env = dict(os.environ, DB_ASYNC=mode, DATABASE_URL=f"sqlite:///{os.path.join(tmp_dir, 'bench.db')}")
+        name = "async" if mode == "1" else "sync"
+        print(f"⏱️  Режим {name}: {args.concurrency} клиентов ({args.writers} пишущих), {args.duration} с...")
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--worker", *sys.argv[1:]],
+            env=env,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout
+        results[name] = json.loads(output.strip().splitlines()[-1])
+
+    print()
+    print(f"{'режим':<6} {'чтений/с':>9} {'записей/с':>10} {'p50 чт., мс':>12} {'p95 чт., мс':>12} {'p95 зап., мс':>13} {'ошибок':>7}")
+    for name, r in results.items():
+        print(
+            f"{name:<6} {r['reads_per_sec']:>9.1f} {r['writes_per_sec']:>10.1f} {r['read_p50_ms']:>12.1f} "
+            f"{r['read_p95_ms']:>12.1f} {r['write_p95_ms']:>13.1f} {r['errors']:>7}"
+        )
+
+
+if __name__ == "__main__":
+    main()
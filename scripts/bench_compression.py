@@ -0,0 +1,130 @@
+"""Бенчмарк сжатия ответов: байты на проводе и CPU на запрос.
+
+Заполняет временную базу книгами с описаниями и пользователями, затем для
+каждого эндпоинта и каждого Accept-Encoding делает серию запросов и выводит
+размер тела на проводе и процессорное время на запрос. Первая страница /books
+отдаётся из кэша ответов уже сжатой; страница за пределами кэша и /users
+сжимаются middleware на каждом запросе. Клиент работает в том же процессе,
+поэтому CPU включает и распаковку ответа (она в разы дешевле сжатия).
+
+Пример:
+    python scripts/bench_compression.py --books 2000 --users 2000 --requests 200
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+# Добавляем корневую директорию в путь
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_TMP_DIR = tempfile.mkdtemp(prefix="nartbooks-bench-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(_TMP_DIR, 'compression.db')}")
+
+from fastapi.testclient import TestClient  # noqa: E402
+from sqlalchemy import insert  # noqa: E402
+
+from app.compression import available_encodings  # noqa: E402
+from app.config import RESPONSE_CACHE_BOOK_PAGES  # noqa: E402
+from app.database import SessionLocal  # noqa: E402
+from app.enums import UserRole  # noqa: E402
+from app.main import app  # noqa: E402
+from app.models import BookOfMonth, User  # noqa: E402
+from app.security import create_access_token  # noqa: E402
+
+_WORDS = (
+    "роман повесть герой город любовь война память семья дорога море лето зима письмо тайна судьба "
+    "друг время история детство музыка свет ночь река дом сад поезд война мир вопрос ответ выбор"
+).split()
+
+
+def description(rng: random.Random) -> str:
+    # Случайный текст сжимается примерно как настоящие описания, а не как повтор одной фразы
+    return " ".join(rng.choice(_WORDS) for _ in range(rng.randint(40, 90))).capitalize() + "."
+
+
+def seed(books: int, users: int) -> int:
+    """Заполняет книги и пользователей; возвращает id администратора."""
+    rng = random.Random(42)
+    db = SessionLocal()
+    try:
+        admin = User(first_name="Админ", last_name="Бенч", email="bench-admin@example.com", role=UserRole.ADMIN.value)
+        db.add(admin)
+        db.execute(
+            insert(BookOfMonth),
+            [
+                {
+                    "title": f"Книга {i}",
+                    "author": f"Автор {i % 50}",
+                    "date": "2025-01-01",
+                    "location": "Клуб",
+                    "description": description(rng),
+                }
+                for i in range(books)
+            ],
+        )
+        db.execute(
+            insert(User),
+            [
+                {
+                    "first_name": "Участник",
+                    "last_name": f"Клуба {i}",
+                    "email": f"member{i}@example.com",
+                    "phone": f"+7999{rng.randrange(10**7):07d}",
+                    "role": UserRole.USER.value,
+                    "fav_authors": "Булгаков, Толстой",
+                    "fav_genres": "роман",
+                    "fav_books": "",
+                    "wanted_books": "",
+                }
+                for i in range(users)
+            ],
+        )
+        db.commit()
+        return admin.id
+    finally:
+        db.close()
+
+
+def measure(client: TestClient, path: str, headers: dict, requests: int) -> tuple[int, float]:
+    """Байты тела на проводе и CPU процесса (мс) на один запрос."""
+    with client.stream("GET", path, headers=headers) as response:
+        wire = sum(len(chunk) for chunk in response.iter_raw())
+    started = time.process_time()
+    for _ in range(requests):
+        client.get(path, headers=headers)
+    return wire, (time.process_time() - started) / requests * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--books", type=int, default=2000)
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+
+    with TestClient(app) as client:
+        print(f"📚 Заполнение базы: {args.books} книг, {args.users} пользователей...")
+        admin_id = seed(args.books, args.users)
+        admin = {"Authorization": f"Bearer {create_access_token(admin_id, UserRole.ADMIN.value)}"}
+
+        endpoints = [
+            ("/books?limit=100 (кэш ответов)", "/books?page=1&limit=100"),
+            ("/books?limit=100 (без кэша)", f"/books?page={RESPONSE_CACHE_BOOK_PAGES + 1}&limit=100"),
+            ("/users?limit=100", "/users?limit=100"),
+        ]
+        encodings = ["identity", *available_encodings()]
+        print(f"\n{'эндпоинт':<32} {'кодировка':<9} {'байт':>8} {'доля':>6} {'CPU, мс':>8}")
+        for label, path in endpoints:
+            identity_bytes = None
+            for encoding in encodings:
+                wire, cpu = measure(client, path, {**admin, "Accept-Encoding": encoding}, args.requests)
+                identity_bytes = identity_bytes or wire
+                print(f"{label:<32} {encoding:<9} {wire:>8} {wire / identity_bytes:>6.1%} {cpu:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""Бенчмарк конкурентного доступа к SQLite: читатели списка книг против писателей регистраций.
+
+Сравнивает движок «как раньше» (create_engine с настройками SQLite по умолчанию)
+с движком из app.database.create_db_engine (WAL, synchronous=NORMAL, busy_timeout,
+cache_size, mmap_size, temp_store и пул соединений).
+
+Пример:
+    python scripts/bench_db_concurrency.py --readers 8 --writers 4 --duration 5
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+# Добавляем корневую директорию в путь
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_TMP_DIR = tempfile.mkdtemp(prefix="nartbooks-bench-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(_TMP_DIR, 'app.db')}")
+
+from sqlalchemy import create_engine, func, text  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+from app.database import Base, create_db_engine  # noqa: E402
+from app.models import BookOfMonth, MeetingRegistration  # noqa: E402
+
+
+def legacy_engine(url: str):
+    return create_engine(url, connect_args={"check_same_thread": False})
+
+
+def seed(engine, books: int) -> None:
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+    with Session() as db:
+        db.add_all(
+            BookOfMonth(
+                title=f"Книга {i}",
+                author=f"Автор {i % 50}",
+                date="2025-01-01",
+                location="Библиотека",
+                description="Описание " * 20,
+            )
+            for i in range(books)
+        )
+        db.commit()
+
+
+def run(engine, readers: int, writers: int, duration: float, books: int) -> dict:
+    Session = sessionmaker(bind=engine, autoflush=False)
+    stop = threading.Event()
+    counters = {"reads": 0, "writes": 0, "read_errors": 0, "write_errors": 0}
+    lock = threading.Lock()
+
+    def reader():
+        done = errors = 0
+        while not stop.is_set():
+            try:
+                with Session() as db:
+                    db.query(BookOfMonth).order_by(BookOfMonth.id.desc()).limit(10).all()
+                    (
+                        db.query(MeetingRegistration.book_id, func.count(MeetingRegistration.id))
+                        .filter(MeetingRegistration.status == "registered")
+                        .group_by(MeetingRegistration.book_id)
+                        .all()
+                    )
+                done += 1
+            except Exception:
+                errors += 1
+        with lock:
+            counters["reads"] += done
+            counters["read_errors"] += errors
+
+    def writer(worker_id: int):
+        done = errors = 0
+        i = 0
+        while not stop.is_set():
+            i += 1
+            try:
+                with Session() as db:
+                    db.add(
+                        MeetingRegistration(
+                            user_id=worker_id * 1_000_000 + i,
+                            book_id=i % books + 1,
+                            registered_at=datetime.now().isoformat(),
+                            status="registered",
+                        )
+                    )
+                    db.commit()
+                done += 1
+            except Exception:
+                errors += 1
+        with lock:
+            counters["writes"] += done
+            counters["write_errors"] += errors
+
+    threads = [threading.Thread(target=reader) for _ in range(readers)]
+    threads += [threading.Thread(target=writer, args=(w,)) for w in range(writers)]
+    for t in threads:
+        t.start()
+    time.sleep(duration)
+    stop.set()
+    for t in threads:
+        t.join()
+
+    with engine.connect() as conn:
+        journal_mode = conn.execute(text("PRAGMA journal_mode")).scalar()
+
+    return {
+        "journal_mode": journal_mode,
+        "reads_per_sec": counters["reads"] / duration,
+        "writes_per_sec": counters["writes"] / duration,
+        "read_errors": counters["read_errors"],
+        "write_errors": counters["write_errors"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--duration", type=float, default=5.0)
+    parser.add_argument("--books", type=int, default=1000)
+    args = parser.parse_args()
+
+    results = {}
+    for name, factory in (("legacy", legacy_engine), ("tuned", create_db_engine)):
+        url = f"sqlite:///{os.path.join(_TMP_DIR, f'{name}.db')}"
+        engine = factory(url)
+        seed(engine, args.books)
+        print(f"⏱️  {name}: {args.readers} читателей, {args.writers} писателей, {args.duration} с...")
+        results[name] = run(engine, args.readers, args.writers, args.duration, args.books)
+        engine.dispose()
+
+    print()
+    print(f"{'движок':<8} {'journal':<8} {'чтений/с':>10} {'записей/с':>10} {'ошибок чт.':>11} {'ошибок зап.':>12}")
+    for name, r in results.items():
+        print(
+            f"{name:<8} {r['journal_mode']:<8} {r['reads_per_sec']:>10.1f} {r['writes_per_sec']:>10.1f} "
+            f"{r['read_errors']:>11} {r['write_errors']:>12}"
+        )
+
+
+if __name__ == "__main__":
+    main()
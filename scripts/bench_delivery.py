@@ -0,0 +1,97 @@
+"""Нагрузочная проверка POST /auth/send-code с фоновой отправкой кодов.
+
+Поднимает заглушку сервиса сообщений (stub_msg_provider.py) с заданной
+задержкой и долей ошибок и отправляет поток запросов send-code. Показывает,
+что время ответа не зависит от задержки провайдера, сколько кодов доставлено
+с повторами, как circuit breaker останавливает отправку, пока провайдер лежит,
+и что очередь досылается после восстановления.
+
+Пример:
+    python scripts/bench_delivery.py --requests 200 --latency 0.5 --fail-rate 0.3
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+# Добавляем корневую директорию в путь
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from stub_msg_provider import StubProvider  # noqa: E402
+
+_TMP_DIR = tempfile.mkdtemp(prefix="nartbooks-bench-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(_TMP_DIR, 'delivery.db')}")
+_STUB = StubProvider(0)
+os.environ["MSG_OVRX_BASE_URL"] = _STUB.url
+os.environ["MSG_OVRX_API_KEY"] = "stub"
+os.environ.setdefault("DELIVERY_BACKOFF_BASE_SECONDS", "0.05")
+os.environ.setdefault("DELIVERY_BREAKER_RESET_SECONDS", "2")
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from app.delivery import delivery  # noqa: E402
+from app.main import app  # noqa: E402
+
+
+def send_codes(client: TestClient, count: int, prefix: str) -> tuple[list, dict]:
+    latencies, statuses = [], {}
+    for i in range(count):
+        started = time.perf_counter()
+        response = client.post("/auth/send-code", json={"email": f"{prefix}{i}@example.com"})
+        latencies.append((time.perf_counter() - started) * 1000)
+        statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+    return latencies, statuses
+
+
+def wait_for_queue(timeout: float) -> None:
+    deadline = time.monotonic() + timeout
+    while delivery.queue_size() and time.monotonic() < deadline:
+        time.sleep(0.05)
+    # Даём отправителям закончить задания, взятые из очереди
+    time.sleep(1)
+
+
+def report(title: str, latencies: list, statuses: dict) -> None:
+    latencies = sorted(latencies)
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    print(f"{title}")
+    print(f"   ответ send-code: p50 {statistics.median(latencies):.1f} мс, p95 {p95:.1f} мс, статусы {statuses}")
+    print(f"   отправка: {delivery.stats}, breaker: {delivery.breaker.state}, заглушка: {_STUB.counts}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.5, help="задержка провайдера, с")
+    parser.add_argument("--fail-rate", type=float, default=0.3, help="доля ответов 503 от провайдера")
+    args = parser.parse_args()
+
+    _STUB.latency, _STUB.fail_rate = args.latency, args.fail_rate
+    _STUB.start_in_thread()
+    with TestClient(app) as client:
+        latencies, statuses = send_codes(client, args.requests, "user")
+        wait_for_queue(timeout=120)
+        report(f"📨 Провайдер отвечает за {args.latency} с, ошибок {args.fail_rate:.0%}:", latencies, statuses)
+
+        _STUB.fail_rate = 1.0
+        latencies, statuses = send_codes(client, args.requests, "down")
+        # Пока breaker открыт, новые запросы получают 503, а очередь ждёт провайдера
+        time.sleep(1)
+        more_latencies, more_statuses = send_codes(client, args.requests, "later")
+        for status, count in more_statuses.items():
+            statuses[status] = statuses.get(status, 0) + count
+        report("🔌 Провайдер недоступен (все ответы 503):", latencies + more_latencies, statuses)
+
+        _STUB.fail_rate = 0.0
+        started = time.perf_counter()
+        wait_for_queue(timeout=120)
+        print(f"✅ Провайдер восстановился, очередь дослана за {time.perf_counter() - started:.1f} с:")
+        print(f"   отправка: {delivery.stats}, breaker: {delivery.breaker.state}, заглушка: {_STUB.counts}")
+    _STUB.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+"""Бенчмарк выгрузки участников встречи: потоковый CSV против JSON-списка.
+
+Заполняет временную базу одной книгой с заданным числом зарегистрированных
+участников и сравнивает /meetings/{id}/participants/export (CSV пачками из
+серверного курсора) с /meetings/{id}/participants (весь список в одном JSON).
+Для каждого эндпоинта выводит время ответа и пик памяти процесса по tracemalloc;
+память меряется отдельным прогоном, потому что tracemalloc замедляет код.
+Приложение вызывается напрямую по ASGI, а тело ответа только подсчитывается и
+не хранится (TestClient копит его целиком), так что пик памяти - серверный.
+
+Пример:
+    python scripts/bench_export.py --rows 100000
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+# Добавляем корневую директорию в путь
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_TMP_DIR = tempfile.mkdtemp(prefix="nartbooks-bench-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(_TMP_DIR, 'export.db')}")
+# Фоновая очистка не нужна на пустой базе и не должна попасть в замер
+os.environ.setdefault("SWEEP_INTERVAL_SECONDS", "0")
+
+from sqlalchemy import insert, select  # noqa: E402
+
+from app.database import SessionLocal  # noqa: E402
+from app.enums import UserRole  # noqa: E402
+from app.main import app  # noqa: E402
+from app.models import BookOfMonth, MeetingRegistration, User  # noqa: E402
+from app.security import create_access_token  # noqa: E402
+
+
+def seed(rows: int) -> tuple[int, int]:
+    """Книга с rows участниками; возвращает id администратора и книги."""
+    db = SessionLocal()
+    try:
+        admin = User(first_name="Админ", last_name="Бенч", email="bench-admin@example.com", role=UserRole.ADMIN.value)
+        book = BookOfMonth(title="Мастер и Маргарита", author="Михаил Булгаков", date="2025-01-01", location="Клуб")
+        db.add_all([admin, book])
+        db.flush()
+        db.execute(
+            insert(User),
+            [
+                {
+                    "first_name": "Участник",
+                    "last_name": f"Клуба {i}",
+                    "email": f"member{i}@example.com",
+                    "phone": f"+7999{i:07d}",
+                    "role": UserRole.USER.value,
+                }
+                for i in range(rows)
+            ],
+        )
+        user_ids = db.scalars(select(User.id).where(User.id != admin.id).order_by(User.id)).all()
+        started = datetime(2025, 1, 1)
+        db.execute(
+            insert(MeetingRegistration),
+            [
+                {
+                    "user_id": user_id,
+                    "book_id": book.id,
+                    "status": "registered",
+                    "registered_at": started + timedelta(seconds=i),
+                }
+                for i, user_id in enumerate(user_ids)
+            ],
+        )
+        db.commit()
+        return admin.id, book.id
+    finally:
+        db.close()
+
+
+async def fetch(path: str, headers: dict) -> int:
+    """Выполняет GET через ASGI и возвращает число байт тела, не сохраняя его."""
+    size = 0
+    status = None
+    requested = False
+    done = asyncio.Event()
+
+    async def receive():
+        nonlocal requested
+        if not requested:
+            requested = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        # StreamingResponse ждёт отключения клиента; отдаём его только после ответа
+        await done.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        nonlocal size, status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+        elif message["type"] == "http.response.body":
+            size += len(message.get("body", b""))
+
+    path, _, query = path.partition("?")
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": query.encode(),
+        "root_path": "",
+        "headers": [(name.lower().encode(), value.encode()) for name, value in headers.items()],
+        "client": ("127.0.0.1", 0),
+        "server": ("testserver", 80),
+    }
+    try:
+        await app(scope, receive, send)
+    finally:
+        done.set()
+    if status != 200:
+        raise RuntimeError(f"{path}: HTTP {status}")
+    return size
+
+
+async def measure(path: str, headers: dict) -> tuple[int, float, float]:
+    """Байты ответа, время (с) и пик памяти (МБ)."""
+    started = time.perf_counter()
+    size = await fetch(path, headers)
+    elapsed = time.perf_counter() - started
+
+    tracemalloc.start()
+    try:
+        await fetch(path, headers)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return size, elapsed, peak / 1024 / 1024
+
+
+async def run(rows: int):
+    async with app.router.lifespan_context(app):
+        print(f"👥 Заполнение базы: {rows} участников встречи...")
+        admin_id, book_id = seed(rows)
+        # identity: сравниваем выгрузку, а не сжатие
+        headers = {
+            "Authorization": f"Bearer {create_access_token(admin_id, UserRole.ADMIN.value)}",
+            "Accept-Encoding": "identity",
+        }
+
+        print(f"\n{'эндпоинт':<40} {'байт':>11} {'время, с':>9} {'пик памяти, МБ':>15}")
+        for label, path in (
+            ("participants/export (CSV, поток)", f"/meetings/{book_id}/participants/export"),
+            ("participants (JSON, целиком)", f"/meetings/{book_id}/participants"),
+        ):
+            size, elapsed, peak = await measure(path, headers)
+            print(f"{label:<40} {size:>11} {elapsed:>9.2f} {peak:>15.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100_000)
+    args = parser.parse_args()
+    asyncio.run(run(args.rows))
+
+
+if __name__ == "__main__":
+    main()
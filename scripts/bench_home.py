@@ -0,0 +1,130 @@
+"""Бенчмарк загрузки главной страницы: отдельные запросы против составного /home.
+
+Заполняет временную базу книгами и пользователем с избранным и записями на
+встречи, затем меряет загрузку страницы так, как её делал фронтенд (/me,
+/books/current, /books, /favorites, /meetings/my - по очереди и параллельно),
+и одним запросом /home. Для гостя сравниваются /books/current и /books с /home.
+Запросы идут в приложение в том же процессе через ASGI, без сети, поэтому
+выигрыш на настоящих запросах больше: каждый лишний запрос - ещё одно сетевое
+ожидание в браузере.
+
+Пример:
+    python scripts/bench_home.py --books 500 --repeat 200
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+# Добавляем корневую директорию в путь
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_TMP_DIR = tempfile.mkdtemp(prefix="nartbooks-bench-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(_TMP_DIR, 'home.db')}")
+# Фоновая очистка не нужна на пустой базе и не должна попасть в замер
+os.environ.setdefault("SWEEP_INTERVAL_SECONDS", "0")
+
+import httpx  # noqa: E402
+from sqlalchemy import insert  # noqa: E402
+
+from app.database import SessionLocal  # noqa: E402
+from app.enums import UserRole  # noqa: E402
+from app.main import app  # noqa: E402
+from app.models import BookOfMonth, Favorite, MeetingRegistration, User  # noqa: E402
+from app.security import create_access_token  # noqa: E402
+
+FAN_OUT = ["/me", "/books/current", "/books?page=1&limit=10", "/favorites?page=1&limit=100", "/meetings/my"]
+GUEST_FAN_OUT = ["/books/current", "/books?page=1&limit=10"]
+
+
+def seed(books: int, favorites: int, meetings: int) -> int:
+    """Книги и пользователь с избранным и записями; возвращает id пользователя."""
+    db = SessionLocal()
+    try:
+        user = User(first_name="Анна", last_name="Бенч", email="bench-user@example.com", role=UserRole.USER.value)
+        db.add(user)
+        db.flush()
+        now = datetime.now()
+        db.execute(
+            insert(BookOfMonth),
+            [
+                {"title": f"Книга {i}", "author": f"Автор {i % 50}", "date": "2025-01-01", "location": "Клуб"}
+                for i in range(books)
+            ],
+        )
+        db.execute(
+            insert(Favorite),
+            [{"user_id": user.id, "book_id": book_id, "created_at": now} for book_id in range(1, favorites + 1)],
+        )
+        db.execute(
+            insert(MeetingRegistration),
+            [
+                {"user_id": user.id, "book_id": book_id, "status": "registered", "registered_at": now}
+                for book_id in range(books - meetings + 1, books + 1)
+            ],
+        )
+        db.commit()
+        return user.id
+    finally:
+        db.close()
+
+
+async def sequential(client: httpx.AsyncClient, paths: list[str], headers: dict) -> None:
+    for path in paths:
+        (await client.get(path, headers=headers)).raise_for_status()
+
+
+async def parallel(client: httpx.AsyncClient, paths: list[str], headers: dict) -> None:
+    for response in await asyncio.gather(*(client.get(path, headers=headers) for path in paths)):
+        response.raise_for_status()
+
+
+async def measure(load, repeat: int) -> tuple[float, float]:
+    """Медиана и 95-й перцентиль времени загрузки страницы, мс."""
+    await load()
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        await load()
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    return statistics.median(timings), timings[int(len(timings) * 0.95) - 1]
+
+
+async def run(args):
+    async with app.router.lifespan_context(app):
+        print(f"📚 Заполнение базы: {args.books} книг, {args.favorites} в избранном, {args.meetings} записей...")
+        user_id = seed(args.books, args.favorites, args.meetings)
+        user = {"Authorization": f"Bearer {create_access_token(user_id, UserRole.USER.value)}"}
+
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as client:
+            scenarios = [
+                ("пользователь: 5 запросов по очереди", lambda: sequential(client, FAN_OUT, user), len(FAN_OUT)),
+                ("пользователь: 5 запросов параллельно", lambda: parallel(client, FAN_OUT, user), len(FAN_OUT)),
+                ("пользователь: /home", lambda: sequential(client, ["/home?limit=10"], user), 1),
+                ("гость: 2 запроса параллельно", lambda: parallel(client, GUEST_FAN_OUT, {}), len(GUEST_FAN_OUT)),
+                ("гость: /home (кэш ответов)", lambda: sequential(client, ["/home?limit=10"], {}), 1),
+            ]
+            print(f"\n{'сценарий':<40} {'запросов':>8} {'медиана, мс':>12} {'p95, мс':>8}")
+            for label, load, requests in scenarios:
+                median, p95 = await measure(load, args.repeat)
+                print(f"{label:<40} {requests:>8} {median:>12.2f} {p95:>8.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--books", type=int, default=500)
+    parser.add_argument("--favorites", type=int, default=30)
+    parser.add_argument("--meetings", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=200)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
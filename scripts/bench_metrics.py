@@ -0,0 +1,172 @@
+"""Бенчмарк накладных расходов сбора метрик (METRICS_ENABLED) на горячем пути.
+
+Сначала меряет по отдельности стоимость записи: MetricsMiddleware вокруг пустого
+ASGI-приложения и обработчик событий движка на запросе SELECT 1 к SQLite в памяти.
+Затем меряет медиану задержки GET /, GET /books (ответ из кэша) и GET /books/{id}
+(запросы к базе) через внутрипроцессный ASGI-клиент httpx, включая и выключая запись
+метрик в одном процессе: между отдельными процессами разброс обычно больше самих
+накладных расходов. Замер времени выдачи соединения из пула остаётся включённым в
+обоих режимах (одна пара perf_counter на выдачу).
+
+Пример:
+    python scripts/bench_metrics.py --repeat 3000
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+# Добавляем корневую директорию в путь
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_TMP_DIR = tempfile.mkdtemp(prefix="nartbooks-bench-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(_TMP_DIR, 'metrics.db')}")
+# Фоновая очистка не нужна на пустой базе и не должна попасть в замер
+os.environ.setdefault("SWEEP_INTERVAL_SECONDS", "0")
+os.environ["METRICS_ENABLED"] = "1"
+
+PATHS = ["/", "/books?page=1&limit=20", "/books/1"]
+
+
+# Машина с другими процессами шумит сильнее, чем стоит запись метрик: варианты
+# чередуются короткими сериями, и от каждого берётся лучшая серия
+CHUNKS = 20
+
+
+async def bench_middleware(repeat: int) -> tuple[float, float]:
+    """Время вызова пустого ASGI-приложения без middleware и с ним, мкс."""
+    from app.metrics import MetricsMiddleware
+
+    async def empty_app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    async def send(message):
+        pass
+
+    scope = {"type": "http", "method": "GET", "path": "/"}
+    applications = (empty_app, MetricsMiddleware(empty_app))
+    best = [float("inf")] * len(applications)
+    for _ in range(CHUNKS):
+        for i, application in enumerate(applications):
+            started = time.perf_counter()
+            for _ in range(repeat // CHUNKS):
+                await application(dict(scope), None, send)
+            best[i] = min(best[i], (time.perf_counter() - started) / (repeat // CHUNKS) * 1e6)
+    return best[0], best[1]
+
+
+def bench_engine_events(repeat: int) -> tuple[float, float]:
+    """Время SELECT 1 внутри HTTP-запроса без обработчика событий движка и с ним, мкс."""
+    from sqlalchemy import create_engine
+
+    from app.metrics import _request_queries, instrument_engine
+
+    # Счётчик текущего HTTP-запроса, как его выставляет MetricsMiddleware
+    _request_queries.set([0])
+    engines = (create_engine("sqlite://"), create_engine("sqlite://"))
+    instrument_engine(engines[1])
+    connections = [db_engine.connect() for db_engine in engines]
+    best = [float("inf")] * len(engines)
+    for _ in range(CHUNKS):
+        for i, conn in enumerate(connections):
+            started = time.perf_counter()
+            for _ in range(repeat // CHUNKS):
+                conn.exec_driver_sql("SELECT 1").scalar()
+            best[i] = min(best[i], (time.perf_counter() - started) / (repeat // CHUNKS) * 1e6)
+    for conn, db_engine in zip(connections, engines):
+        conn.close()
+        db_engine.dispose()
+    return best[0], best[1]
+
+
+def seed() -> None:
+    from app.database import SessionLocal
+    from app.models import BookOfMonth
+
+    db = SessionLocal()
+    try:
+        db.add_all(
+            BookOfMonth(title=f"Книга {i}", author=f"Автор {i % 40}", date="2025-01-01", location="Клуб")
+            for i in range(200)
+        )
+        db.commit()
+    finally:
+        db.close()
+
+
+def set_recording(app, enabled: bool) -> None:
+    """Включает и выключает MetricsMiddleware и подсчёт запросов к БД в уже собранном приложении."""
+    from sqlalchemy import event
+
+    from app.database import async_engine, engine
+    from app.metrics import MetricsMiddleware, _count_query
+
+    # Снаружи стоит ServerErrorMiddleware, сразу под ним - MetricsMiddleware (добавлен последним)
+    outer = app.middleware_stack
+    if not hasattr(set_recording, "middleware"):
+        assert isinstance(outer.app, MetricsMiddleware)
+        set_recording.middleware = outer.app
+    outer.app = set_recording.middleware if enabled else set_recording.middleware.app
+    for db_engine in (engine, async_engine.sync_engine if async_engine is not None else None):
+        if db_engine is None:
+            continue
+        listening = event.contains(db_engine, "before_cursor_execute", _count_query)
+        if enabled and not listening:
+            event.listen(db_engine, "before_cursor_execute", _count_query)
+        elif not enabled and listening:
+            event.remove(db_engine, "before_cursor_execute", _count_query)
+
+
+async def bench_endpoints(repeat: int) -> dict:
+    """Медиана задержки каждого эндпоинта без записи метрик и с ней, мкс."""
+    import httpx
+
+    from app.main import app
+
+    result = {}
+    async with app.router.lifespan_context(app):
+        seed()
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            for path in PATHS:
+                for _ in range(100):
+                    (await client.get(path)).raise_for_status()
+                best = {False: float("inf"), True: float("inf")}
+                for _ in range(CHUNKS):
+                    for enabled in best:
+                        set_recording(app, enabled)
+                        timings = []
+                        for _ in range(repeat // CHUNKS):
+                            started = time.perf_counter()
+                            await client.get(path)
+                            timings.append((time.perf_counter() - started) * 1e6)
+                        best[enabled] = min(best[enabled], statistics.median(timings))
+                result[path] = (best[False], best[True])
+        set_recording(app, True)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=3000)
+    args = parser.parse_args()
+
+    plain, recorded = asyncio.run(bench_middleware(args.repeat * 20))
+    print(f"🧩 MetricsMiddleware: {plain:.2f} -> {recorded:.2f} мкс на запрос (+{recorded - plain:.2f} мкс)")
+    plain, recorded = bench_engine_events(args.repeat * 20)
+    print(f"🗄️  Подсчёт запросов к БД: {plain:.2f} -> {recorded:.2f} мкс на SELECT 1 (+{recorded - plain:.2f} мкс)")
+
+    print(f"\n⏱️  Эндпоинты по {args.repeat} запросов в каждом режиме...")
+    results = asyncio.run(bench_endpoints(args.repeat))
+    print(f"\n{'эндпоинт':<26} {'без метрик, мкс':>16} {'с метриками, мкс':>17} {'разница':>9}")
+    for path, (off, on) in results.items():
+        print(f"{path:<26} {off:>16.1f} {on:>17.1f} {(on - off) / off * 100:>+8.1f}%")
+
+
+if __name__ == "__main__":
+    main()
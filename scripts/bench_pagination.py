@@ -0,0 +1,87 @@
+"""Бенчмарк глубины пагинации GET /books: OFFSET (page/limit) против курсора (cursor).
+
+Заполняет временную SQLite-базу и замеряет время получения страницы на разной
+глубине в обоих режимах, а затем цену total: без кэша, из кэша и include_total=false.
+
+Пример:
+    python scripts/bench_pagination.py --books 100000 --repeat 20
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+# Добавляем корневую директорию в путь
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_TMP_DIR = tempfile.mkdtemp(prefix="nartbooks-bench-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(_TMP_DIR, 'pagination.db')}")
+
+from sqlalchemy import insert  # noqa: E402
+
+from app.database import SessionLocal, init_db  # noqa: E402
+from app.models import BookOfMonth  # noqa: E402
+from app.pagination import SortKey, encode_cursor, totals_cache  # noqa: E402
+from app.routers.books import _list_books  # noqa: E402
+
+
+def seed(count: int) -> None:
+    db = SessionLocal()
+    try:
+        rows = [
+            {"title": f"Книга {i}", "author": f"Автор {i % 300}", "date": "2025-01-01", "location": "Клуб", "description": "Описание " * 30}
+            for i in range(count)
+        ]
+        for start in range(0, count, 5000):
+            db.execute(insert(BookOfMonth), rows[start : start + 5000])
+        db.commit()
+    finally:
+        db.close()
+
+
+def timed(fn, repeat: int) -> float:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - started) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--books", type=int, default=100_000)
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    init_db()
+    print(f"📚 Заполнение базы: {args.books} книг...")
+    seed(args.books)
+
+    last_page = args.books // args.limit
+    depths = sorted({1, 10, 100, 1000, last_page // 2, last_page})
+    db = SessionLocal()
+    try:
+        print()
+        print(f"{'страница':>9} {'OFFSET, мс':>11} {'cursor, мс':>11}")
+        for page in depths:
+            # Курсор, указывающий на последнюю строку предыдущей страницы (id идут по убыванию)
+            cursor = encode_cursor([SortKey("id", BookOfMonth.id)], [args.books - (page - 1) * args.limit + 1])
+            offset_ms = timed(lambda page=page: _list_books(db, page, args.limit, None), args.repeat)
+            cursor_ms = timed(lambda cursor=cursor: _list_books(db, 1, args.limit, None, "id", cursor), args.repeat)
+            print(f"{page:>9} {offset_ms:>11.2f} {cursor_ms:>11.2f}")
+
+        print()
+        print(f"{'поиск':<12} {'total, мс':>10} {'из кэша, мс':>12} {'без total, мс':>14}")
+        for search in (None, "Книга", "Автор 7"):
+            uncached_ms = timed(lambda search=search: (totals_cache.clear(), _list_books(db, 1, args.limit, search)), args.repeat)
+            cached_ms = timed(lambda search=search: _list_books(db, 1, args.limit, search), args.repeat)
+            no_total_ms = timed(lambda search=search: _list_books(db, 1, args.limit, search, "id", None, False), args.repeat)
+            print(f"{search or '-':<12} {uncached_ms:>10.2f} {cached_ms:>12.2f} {no_total_ms:>14.2f}")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""Микробенчмарк накладных расходов app.ratelimit на одну проверку.
+
+Сравнивает хранилище в памяти процесса и общее хранилище в таблице rate_limits
+(SQLite во временном файле) на потоке проверок по заданному числу ключей.
+
+Пример:
+    python scripts/bench_rate_limit.py --keys 1000 --checks 20000
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+# Добавляем корневую директорию в путь
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_TMP_DIR = tempfile.mkdtemp(prefix="nartbooks-bench-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(_TMP_DIR, 'rate_limit.db')}")
+os.environ.setdefault("DB_ASYNC", "0")
+
+from app.database import engine, init_db  # noqa: E402
+from app.ratelimit import DatabaseRateLimitStore, MemoryRateLimitStore, RateLimiter  # noqa: E402
+
+
+def measure(store, keys: int, checks: int) -> tuple[float, int]:
+    # 5 запросов в минуту на ключ: часть проверок разрешается, часть отклоняется
+    limiter = RateLimiter("bench", 5, 60, "", store=store)
+    limited = 0
+    started = time.perf_counter()
+    for i in range(checks):
+        if limiter.hit(f"user{i % keys}@example.com"):
+            limited += 1
+    return (time.perf_counter() - started) / checks * 1_000_000, limited
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--keys", type=int, default=1000)
+    parser.add_argument("--checks", type=int, default=20_000)
+    args = parser.parse_args()
+
+    init_db()
+    print(f"{'хранилище':<10} {'мкс/проверка':>13} {'отклонено':>10}")
+    for name, store in (("memory", MemoryRateLimitStore()), ("database", DatabaseRateLimitStore(engine))):
+        per_check, limited = measure(store, args.keys, args.checks)
+        print(f"{name:<10} {per_check:>13.1f} {limited:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""Бенчмарк кэша ответов публичных эндпоинтов книг (ETag / If-None-Match).
+
+Имитирует посещения лендинга: каждый визит запрашивает GET /books/current,
+GET /books?page=1&limit=10 и GET /books/{id} текущей книги. Часть посетителей
+возвращается с ETag из прошлого визита; время от времени администратор
+записывает изменение, сбрасывая кэш. Выводит долю попаданий, число 304 и
+сэкономленные байты, а также время визита с кэшем и без него.
+
+Пример:
+    python scripts/bench_response_cache.py --books 2000 --visits 3000
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+# Добавляем корневую директорию в путь
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_TMP_DIR = tempfile.mkdtemp(prefix="nartbooks-bench-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(_TMP_DIR, 'response_cache.db')}")
+
+from fastapi.testclient import TestClient  # noqa: E402
+from sqlalchemy import insert  # noqa: E402
+
+from app import response_cache  # noqa: E402
+from app.cache import TTLCache  # noqa: E402
+from app.database import SessionLocal  # noqa: E402
+from app.enums import UserRole  # noqa: E402
+from app.main import app  # noqa: E402
+from app.models import BookOfMonth, User  # noqa: E402
+from app.security import create_access_token  # noqa: E402
+
+LANDING = ["/books/current", "/books?page=1&limit=10"]
+
+
+def seed(count: int) -> int:
+    """Заполняет книги и создаёт администратора; возвращает его id."""
+    db = SessionLocal()
+    try:
+        admin = User(first_name="Админ", last_name="Бенч", email="bench-admin@example.com", role=UserRole.ADMIN.value)
+        db.add(admin)
+        rows = [
+            {"title": f"Книга {i}", "author": f"Автор {i % 50}", "date": "2025-01-01", "location": "Клуб", "description": "Описание " * 30}
+            for i in range(count)
+        ]
+        db.execute(insert(BookOfMonth), rows)
+        db.commit()
+        return admin.id
+    finally:
+        db.close()
+
+
+def run_visits(client: TestClient, admin_id: int, visits: int, returning: float, write_every: int) -> float:
+    rng = random.Random(42)
+    admin = {"Authorization": f"Bearer {create_access_token(admin_id, UserRole.ADMIN.value)}"}
+    etags: dict[str, str] = {}
+    current_id = client.get("/books/current").json()["id"]
+    started = time.perf_counter()
+    for visit in range(1, visits + 1):
+        is_returning = rng.random() < returning
+        for path in LANDING + [f"/books/{current_id}"]:
+            headers = {"If-None-Match": etags[path]} if is_returning and path in etags else {}
+            response = client.get(path, headers=headers)
+            if "etag" in response.headers:
+                etags[path] = response.headers["etag"]
+        if write_every and visit % write_every == 0:
+            client.put(f"/books/{current_id}/set-current", headers=admin)
+    return (time.perf_counter() - started) / visits * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--books", type=int, default=2000)
+    parser.add_argument("--visits", type=int, default=3000)
+    parser.add_argument("--returning", type=float, default=0.6, help="доля повторных посетителей с ETag")
+    parser.add_argument("--write-every", type=int, default=200, help="запись администратора раз в N визитов")
+    args = parser.parse_args()
+
+    with TestClient(app) as client:
+        print(f"📚 Заполнение базы: {args.books} книг...")
+        admin_id = seed(args.books)
+
+        enabled = response_cache.response_cache
+        response_cache.response_cache = TTLCache(max_size=0, ttl=0)
+        uncached_ms = run_visits(client, admin_id, args.visits, 0.0, args.write_every)
+
+        response_cache.response_cache = enabled
+        before = response_cache.response_cache_stats()
+        cached_ms = run_visits(client, admin_id, args.visits, args.returning, args.write_every)
+        after = response_cache.response_cache_stats()
+
+    # Считаем только прогон с кэшем
+    stats = {name: after[name] - before[name] for name in ("hits", "misses", "not_modified", "bytes_sent", "bytes_saved")}
+    stats["hit_ratio"] = stats["hits"] / (stats["hits"] + stats["misses"])
+
+    total_bytes = stats["bytes_sent"] + stats["bytes_saved"]
+    print()
+    print(f"визит без кэша:         {uncached_ms:.2f} мс")
+    print(f"визит с кэшем:          {cached_ms:.2f} мс ({uncached_ms / cached_ms:.1f}x)")
+    print(f"попаданий в кэш:        {stats['hit_ratio']:.1%} ({stats['hits']} из {stats['hits'] + stats['misses']})")
+    print(f"ответов 304:            {stats['not_modified']}")
+    print(f"отправлено / сэкономлено: {stats['bytes_sent'] / 1024:.0f} КБ / {stats['bytes_saved'] / 1024:.0f} КБ "
+          f"({stats['bytes_saved'] / total_bytes:.1%})")
+
+
+if __name__ == "__main__":
+    main()
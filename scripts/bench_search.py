@@ -0,0 +1,109 @@
+"""Бенчмарк поиска книг: ILIKE по таблице против FTS5-индекса books_fts.
+
+Заполняет временную SQLite-базу заданным числом книг (по умолчанию 100 000)
+и замеряет полный путь GET /books?search=... (подсчёт total + страница).
+
+Пример:
+    python scripts/bench_search.py --books 100000 --repeat 20
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+# Добавляем корневую директорию в путь
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_TMP_DIR = tempfile.mkdtemp(prefix="nartbooks-bench-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(_TMP_DIR, 'search.db')}")
+
+from sqlalchemy import insert  # noqa: E402
+
+from app import search  # noqa: E402
+from app.database import SessionLocal, init_db  # noqa: E402
+from app.models import BookOfMonth  # noqa: E402
+from app.routers.books import _list_books  # noqa: E402
+
+WORDS = (
+    "мастер маргарита война мир идиот бесы преступление наказание отцы дети обломов тихий дон "
+    "шинель нос ревизор мёртвые души герой нашего времени тень ветер память сад вишнёвый "
+    "master garden shadow wind memory night river stone winter summer letters house"
+).split()
+DESCRIPTION_WORDS = (
+    "роман история герой жизнь судьба город семья любовь время путь встреча клуб обсуждение "
+    "novel story life city family love time road meeting discussion"
+).split()
+AUTHORS = ["Булгаков", "Толстой", "Достоевский", "Тургенев", "Гончаров", "Шолохов", "Гоголь", "Лермонтов", "Чехов", "Orwell"]
+QUERIES = ["мастер", "Булгаков", "тихий дон", "вишн", "winter", "Достоевский бесы"]
+
+
+def seed(count: int) -> None:
+    rng = random.Random(42)
+    db = SessionLocal()
+    try:
+        batch = []
+        for i in range(count):
+            batch.append(
+                {
+                    "title": " ".join(rng.choices(WORDS, k=3)).capitalize() + f" {i}",
+                    "author": rng.choice(AUTHORS),
+                    "date": "2025-01-01",
+                    "location": "Клуб",
+                    "description": " ".join(rng.choices(DESCRIPTION_WORDS, k=25)),
+                }
+            )
+            if len(batch) == 5000:
+                db.execute(insert(BookOfMonth), batch)
+                batch.clear()
+        if batch:
+            db.execute(insert(BookOfMonth), batch)
+        db.commit()
+    finally:
+        db.close()
+
+
+def measure(repeat: int, sort: str) -> dict:
+    db = SessionLocal()
+    try:
+        results = {}
+        for query in QUERIES:
+            started = time.perf_counter()
+            for _ in range(repeat):
+                page = _list_books(db, 1, 20, query, sort)
+            results[query] = ((time.perf_counter() - started) / repeat * 1000, page["total"])
+        return results
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--books", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    init_db()
+    print(f"📚 Заполнение базы: {args.books} книг...")
+    started = time.perf_counter()
+    seed(args.books)
+    print(f"   готово за {time.perf_counter() - started:.1f} с, FTS5 доступен: {search.fts_enabled}")
+
+    fts = measure(args.repeat, "id")
+    ranked = measure(args.repeat, "relevance")
+    search.fts_enabled = False
+    ilike = measure(args.repeat, "id")
+
+    print()
+    print(f"{'запрос':<20} {'ILIKE, мс':>10} {'найдено':>8} {'FTS5, мс':>9} {'найдено':>8} {'bm25, мс':>9}")
+    for query in QUERIES:
+        print(
+            f"{query:<20} {ilike[query][0]:>10.1f} {ilike[query][1]:>8} "
+            f"{fts[query][0]:>9.1f} {fts[query][1]:>8} {ranked[query][0]:>9.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""Микробенчмарк сериализации страницы списка (100 элементов list_books и list_users).
+
+Сравнивает путь без модели ответа (jsonable_encoder + JSONResponse, как было)
+с путём через объявленную модель ответа (проверка и сериализация в pydantic-core,
+как делает FastAPI при response_model) и рендером JSONResponse или ORJSONResponse.
+
+Пример:
+    python scripts/bench_serialization.py --items 100 --repeat 2000
+"""
+
+import argparse
+import os
+import sys
+import time
+
+# Добавляем корневую директорию в путь
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from fastapi.responses import JSONResponse  # noqa: E402
+from pydantic import TypeAdapter  # noqa: E402
+
+from app.responses import json_response_class  # noqa: E402
+from app.schemas import BookResponse, PageResponse, UserListItem  # noqa: E402
+
+
+def book_page(items: int) -> dict:
+    return {
+        "page": 1,
+        "limit": items,
+        "total": 5000,
+        "pages": 5000 // items,
+        "has_more": True,
+        "next_cursor": "eyJzIjpbImlkIl0sInYiOls0OTAwXX0",
+        "items": [
+            {
+                "id": i,
+                "title": f"Мастер и Маргарита, том {i}",
+                "author": "Михаил Булгаков",
+                "date": "2025-03-15",
+                "location": "Библиотека им. Пушкина, зал 2",
+                "description": "Роман о визите дьявола в Москву 1930-х годов. " * 4,
+                "avg_rating": 4.25 if i % 3 else None,
+                "is_current": i == 0,
+                "registered_count": i % 40,
+            }
+            for i in range(items)
+        ],
+    }
+
+
+def user_page(items: int) -> dict:
+    return {
+        "page": 1,
+        "limit": items,
+        "total": 20000,
+        "pages": 20000 // items,
+        "has_more": True,
+        "next_cursor": None,
+        "items": [
+            {
+                "id": i,
+                "first_name": "Анна",
+                "last_name": f"Иванова-{i}",
+                "email": f"user{i}@example.com",
+                "phone": "+79990000000" if i % 2 else None,
+                "birth_date": "1990-05-01",
+                "role": "user",
+                "created_at": "2025-01-01T12:00:00.123456",
+                "meetings_count": i % 7,
+                "favorites_count": i % 11,
+                "reviews_count": i % 5,
+            }
+            for i in range(items)
+        ],
+    }
+
+
+def per_page_us(fn, content, repeat: int) -> tuple[float, int]:
+    size = len(fn(content))
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn(content)
+    return (time.perf_counter() - started) / repeat * 1_000_000, size
+
+
+def variants(model) -> dict:
+    adapter = TypeAdapter(model)
+    orjson_response = json_response_class("orjson")
+
+    def with_model(response_class):
+        return lambda content: response_class(
+            content=adapter.dump_python(adapter.validate_python(content), mode="json")
+        ).body
+
+    return {
+        "jsonable_encoder + json (было)": lambda content: JSONResponse(content=jsonable_encoder(content)).body,
+        "модель + json": with_model(JSONResponse),
+        f"модель + {'orjson' if orjson_response is not JSONResponse else 'json (orjson нет)'}": with_model(
+            orjson_response
+        ),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=2000)
+    args = parser.parse_args()
+
+    for name, content, model in (
+        ("list_books", book_page(args.items), PageResponse[BookResponse]),
+        ("list_users", user_page(args.items), PageResponse[UserListItem]),
+    ):
+        print(f"\n{name}: {args.items} элементов")
+        print(f"{'способ':<34} {'мкс/страница':>13} {'байт':>8}")
+        baseline = None
+        for label, fn in variants(model).items():
+            cost, size = per_page_us(fn, content, args.repeat)
+            baseline = baseline or cost
+            print(f"{label:<34} {cost:>13.0f} {size:>8}  x{baseline / cost:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+"""Нагрузочный тест SSE /books/{id}/events: память на подключение и время рассылки.
+
+Открывает N подключений к потоку событий книги прямо через ASGI (без сети) и
+меряет прирост памяти по tracemalloc на одно подключение, затем делает записи на
+встречу и отмены через API и меряет, за сколько событие доходит до всех
+подписчиков. Часть подписчиков "зависает" на отправке: для них проверяется, что
+пропущенные изменения не копятся, а после освобождения приходит последнее
+значение. В конце ждёт один тик heartbeat и отключает всех.
+
+Память считается только по объектам Python в процессе приложения; буферы сокетов
+и протокол uvicorn на настоящем сервере добавят к этому своё.
+
+Пример:
+    python scripts/bench_sse.py --subscribers 5000 --updates 20
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+# Добавляем корневую директорию в путь
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_TMP_DIR = tempfile.mkdtemp(prefix="nartbooks-bench-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(_TMP_DIR, 'sse.db')}")
+# Фоновая очистка не нужна на пустой базе и не должна попасть в замер
+os.environ.setdefault("SWEEP_INTERVAL_SECONDS", "0")
+os.environ.setdefault("SSE_HEARTBEAT_SECONDS", "2")
+os.environ.setdefault("SSE_MAX_SUBSCRIBERS", "100000")
+
+from app.config import SSE_HEARTBEAT_SECONDS  # noqa: E402
+from app.database import SessionLocal  # noqa: E402
+from app.enums import UserRole  # noqa: E402
+from app.events import broker  # noqa: E402
+from app.main import app  # noqa: E402
+from app.models import BookOfMonth, User  # noqa: E402
+from app.security import create_access_token  # noqa: E402
+
+
+def seed() -> tuple[int, int]:
+    """Книга и пользователь, который будет записываться; возвращает их id."""
+    db = SessionLocal()
+    try:
+        user = User(first_name="Анна", last_name="Бенч", email="bench-user@example.com", role=UserRole.USER.value)
+        book = BookOfMonth(title="Мастер и Маргарита", author="Михаил Булгаков", date="2025-01-01", location="Клуб")
+        db.add_all([user, book])
+        db.commit()
+        return user.id, book.id
+    finally:
+        db.close()
+
+
+def scope(method: str, path: str, headers: dict) -> dict:
+    return {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": method,
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": b"",
+        "root_path": "",
+        "headers": [(name.lower().encode(), value.encode()) for name, value in headers.items()],
+        "client": ("127.0.0.1", 0),
+        "server": ("testserver", 80),
+    }
+
+
+class Connection:
+    """Одно SSE-подключение: считает события и помнит последнее значение registered_count."""
+
+    def __init__(self, path: str, arrived: "Arrivals", slow: bool = False):
+        self.path = path
+        self.arrived = arrived
+        self.events = 0
+        self.pings = 0
+        self.last = None
+        self.requested = False
+        self.closed = asyncio.Event()
+        # "Зависший" клиент не читает, пока его не отпустят
+        self.unblocked = asyncio.Event()
+        if not slow:
+            self.unblocked.set()
+        self.task = asyncio.create_task(app(scope("GET", path, {}), self.receive, self.send))
+
+    async def receive(self):
+        if not self.requested:
+            self.requested = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await self.closed.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(self, message):
+        if message["type"] != "http.response.body":
+            return
+        await self.unblocked.wait()
+        body = message.get("body", b"").decode()
+        if body.startswith(": ping"):
+            self.pings += 1
+            return
+        for line in body.splitlines():
+            if line.startswith("data: "):
+                self.events += 1
+                self.last = line.split('"registered_count":', 1)[1].split(",", 1)[0]
+                self.arrived.hit(self.last)
+
+    async def close(self):
+        self.closed.set()
+        await self.task
+
+
+class Arrivals:
+    """Сколько подписчиков уже получили данное значение registered_count."""
+
+    def __init__(self):
+        self.expected = None
+        self.target = 0
+        self.count = 0
+        self.done = asyncio.Event()
+
+    def expect(self, value: str, target: int):
+        self.expected, self.target, self.count = value, target, 0
+        self.done.clear()
+
+    def hit(self, value: str):
+        if value == self.expected:
+            self.count += 1
+            if self.count >= self.target:
+                self.done.set()
+
+
+async def call(method: str, path: str, headers: dict) -> int:
+    status = None
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+
+    await app(scope(method, path, headers), receive, send)
+    return status
+
+
+async def run(args):
+    async with app.router.lifespan_context(app):
+        user_id, book_id = seed()
+        user = {"Authorization": f"Bearer {create_access_token(user_id, UserRole.USER.value)}"}
+        path = f"/books/{book_id}/events"
+        arrivals = Arrivals()
+
+        print(f"🔌 Подключение {args.subscribers} подписчиков (из них {args.slow} не читают)...")
+        arrivals.expect("0", args.subscribers - args.slow)
+        tracemalloc.start()
+        baseline, _ = tracemalloc.get_traced_memory()
+        connections = [Connection(path, arrivals, slow=i < args.slow) for i in range(args.subscribers)]
+        await asyncio.wait_for(arrivals.done.wait(), timeout=120)
+        current, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"   подписчиков у брокера: {broker.stats()['subscribers']}")
+        print(f"   память: {(current - baseline) / 1024 / 1024:.1f} МБ, {(current - baseline) / args.subscribers / 1024:.1f} КБ на подключение")
+
+        print(f"\n📣 {args.updates} изменений registered_count (запись/отмена через API)...")
+        timings = []
+        for i in range(args.updates):
+            value = "1" if i % 2 == 0 else "0"
+            arrivals.expect(value, args.subscribers - args.slow)
+            started = time.perf_counter()
+            status = await call("POST" if value == "1" else "DELETE", f"/meetings/register/{book_id}", user)
+            assert status in (201, 204), status
+            await asyncio.wait_for(arrivals.done.wait(), timeout=60)
+            timings.append((time.perf_counter() - started) * 1000)
+        timings.sort()
+        print(f"   до всех подписчиков: медиана {statistics.median(timings):.1f} мс, максимум {timings[-1]:.1f} мс")
+        print(f"   {args.subscribers / statistics.median(timings) * 1000:,.0f} доставок в секунду".replace(",", " "))
+
+        if args.slow:
+            slow = connections[: args.slow]
+            for connection in slow:
+                connection.unblocked.set()
+            await asyncio.sleep(0.1)
+            received = statistics.mean(connection.events for connection in slow)
+            latest = all(connection.last == value for connection in slow)
+            print(
+                f"\n🐢 Зависшие подписчики после освобождения: в среднем {received:.1f} событий из "
+                f"{args.updates + 1}, последнее значение у всех: {'да' if latest else 'нет'}"
+            )
+
+        print(f"\n💓 Ожидание тика heartbeat ({SSE_HEARTBEAT_SECONDS:g} с)...")
+        await asyncio.sleep(SSE_HEARTBEAT_SECONDS * 1.5)
+        print(f"   получили heartbeat: {sum(1 for c in connections if c.pings)} из {args.subscribers}")
+
+        await asyncio.gather(*(connection.close() for connection in connections))
+        print(f"\n🔒 После отключения подписчиков у брокера: {broker.stats()['subscribers']}")
+        print(f"   счётчики брокера: {broker.stats()}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--subscribers", type=int, default=5000)
+    parser.add_argument("--slow", type=int, default=100, help="сколько подписчиков не читают поток")
+    parser.add_argument("--updates", type=int, default=20)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,450 @@
+"""Набор бенчмарков эндпоинтов books, favorites, meetings, users и auth в одном процессе.
+
+Поднимает приложение на временной SQLite-базе с книгами, пользователями, отзывами,
+избранным и записями на встречи и гоняет каждый эндпоинт через внутрипроцессный
+ASGI-клиент httpx (без сети). Коды входа уходят в локальную заглушку сервиса
+сообщений (stub_msg_provider.py). Для каждого эндпоинта печатает пропускную
+способность, p50/p95/p99 и число неожиданных ответов, результаты сохраняет в JSON.
+
+Пишущие эндпоинты идут парами в таком порядке, чтобы прогон можно было повторять:
+добавление в избранное, затем удаление тех же книг; verify-code выдаёт токены,
+которыми потом вызывается logout. SSE (GET /books/{id}/events) не входит в набор:
+поток бесконечный, для него есть bench_sse.py.
+
+С --baseline результаты сравниваются с сохранёнными ранее: рост p50/p95 или падение
+пропускной способности больше чем на --threshold отмечается как регрессия, и скрипт
+завершается с кодом 1. С --results сравнивается уже сохранённый файл без прогона.
+Замеры в одном процессе шумят: базовый файл стоит снимать на той же машине.
+
+Пример:
+    python scripts/bench_suite.py --requests 300 --output bench.json
+    python scripts/bench_suite.py --output new.json --baseline bench.json
+    python scripts/bench_suite.py --results new.json --baseline bench.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, Optional
+
+# Добавляем корневую директорию в путь
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from stub_msg_provider import StubProvider  # noqa: E402
+
+_TMP_DIR = tempfile.mkdtemp(prefix="nartbooks-bench-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(_TMP_DIR, 'suite.db')}")
+# Фоновые задачи не нужны на временной базе и не должны попасть в замер
+os.environ.setdefault("SWEEP_INTERVAL_SECONDS", "0")
+os.environ.setdefault("SSE_HEARTBEAT_SECONDS", "0")
+_STUB = StubProvider(0)
+os.environ["MSG_OVRX_BASE_URL"] = _STUB.url
+os.environ["MSG_OVRX_API_KEY"] = "stub"
+
+import httpx  # noqa: E402
+from sqlalchemy import insert  # noqa: E402
+
+from app.config import DB_ASYNC  # noqa: E402
+from app.database import SessionLocal  # noqa: E402
+from app.enums import UserRole  # noqa: E402
+from app.main import app  # noqa: E402
+from app.models import (  # noqa: E402
+    AuthCode,
+    BookOfMonth,
+    Favorite,
+    MeetingRegistration,
+    Review,
+    User,
+)
+from app.security import create_access_token  # noqa: E402
+from app.stats import rebuild_book_stats  # noqa: E402
+
+VERIFY_CODE = "123456"
+BATCH_SIZE = 20
+SEED_FAVORITES = 20
+SEED_PARTICIPANTS = 50
+
+
+@dataclass
+class Case:
+    router: str
+    name: str
+    method: str
+    path: Callable[[int], str]
+    headers: Callable[[int], dict]
+    expect: tuple = (200,)
+    json: Optional[Callable[[int], object]] = None
+    content: Optional[Callable[[int], bytes]] = None
+    # Вызывается с номером запроса и ответом: так пишущие эндпоинты передают id следующим
+    collect: Optional[Callable[[int, httpx.Response], None]] = None
+
+
+class Seed:
+    """Ids и токены заполненной базы."""
+
+    def __init__(self, books: int, users: int, requests: int):
+        self.books = books
+        self.users = users
+        self.requests = requests
+        self.tokens: list[str] = []
+        self.user_ids: list[int] = []
+        self.admin_token = ""
+        self.victim_id = 0
+        self.created_books: list[int] = []
+        self.login_tokens: list[str] = []
+
+    def user(self, i: int) -> dict:
+        return {"Authorization": f"Bearer {self.tokens[i % self.users]}"}
+
+    def admin(self, i: int = 0) -> dict:
+        return {"Authorization": f"Bearer {self.admin_token}"}
+
+    def book(self, i: int) -> int:
+        return i % self.books + 1
+
+    def new_pair_book(self, i: int) -> int:
+        # Пара (пользователь i % users, книга) уникальна для первых users * books запросов;
+        # книги берутся с конца, чтобы не пересекаться с избранным из seed()
+        return self.books - (i // self.users) % (self.books - SEED_FAVORITES)
+
+
+def anonymous(i: int) -> dict:
+    return {}
+
+
+def seed(books: int, users: int, requests: int) -> Seed:
+    """Книги, пользователи с токенами, отзывы, избранное, записи на встречу и коды входа."""
+    ids = Seed(books, users, requests)
+    db = SessionLocal()
+    try:
+        now = datetime.now()
+        db.execute(
+            insert(BookOfMonth),
+            [
+                {
+                    "title": f"Книга {i}",
+                    "author": f"Автор {i % 50}",
+                    "date": "2025-01-01",
+                    "location": "Клуб",
+                    "description": "Описание " * 20,
+                    "is_current": int(i == 0),
+                }
+                for i in range(books)
+            ],
+        )
+        db.execute(
+            insert(User),
+            [
+                {"first_name": f"Имя {i}", "last_name": "Бенч", "email": f"user{i}@bench.example", "role": UserRole.USER.value}
+                for i in range(users)
+            ],
+        )
+        admin = User(first_name="Админ", last_name="Бенч", email="admin@nartbooks.com", role=UserRole.ADMIN.value)
+        victim = User(first_name="Роль", last_name="Бенч", email="victim@bench.example", role=UserRole.USER.value)
+        db.add_all([admin, victim])
+        db.flush()
+        ids.user_ids = [user_id for (user_id,) in db.query(User.id).filter(User.email.like("user%")).order_by(User.id)]
+        db.execute(
+            insert(Review),
+            [
+                {"user_id": user_id, "book_id": book_id, "rating": (user_id + book_id) % 5 + 1, "comment": "Отзыв", "created_at": now}
+                for book_id in range(1, min(books, 100) + 1)
+                for user_id in ids.user_ids[:10]
+            ],
+        )
+        db.execute(
+            insert(Favorite),
+            [
+                {"user_id": user_id, "book_id": book_id, "created_at": now}
+                for user_id in ids.user_ids
+                for book_id in range(1, SEED_FAVORITES + 1)
+            ],
+        )
+        db.execute(
+            insert(MeetingRegistration),
+            [
+                {"user_id": user_id, "book_id": 1, "status": "registered", "registered_at": now}
+                for user_id in ids.user_ids[:SEED_PARTICIPANTS]
+            ],
+        )
+        # Коды для verify-code: по одному адресу на запрос, чтобы не упереться в лимит попыток
+        db.execute(
+            insert(AuthCode),
+            [
+                {"identifier": f"login{i}@bench.example", "code": VERIFY_CODE, "created_at": now, "is_used": 0}
+                for i in range(requests)
+            ],
+        )
+        rebuild_book_stats(db)
+        db.commit()
+        ids.tokens = [create_access_token(user_id, UserRole.USER.value) for user_id in ids.user_ids]
+        ids.admin_token = create_access_token(admin.id, UserRole.ADMIN.value)
+        ids.victim_id = victim.id
+        return ids
+    finally:
+        db.close()
+
+
+def build_cases(ids: Seed) -> list[Case]:
+    """Эндпоинты в порядке прогона: чтения раньше записей, которые сбрасывают кэши."""
+    user, admin = ids.user, ids.admin
+
+    def created(i: int) -> int:
+        return ids.created_books[i % len(ids.created_books)]
+
+    def batch(i: int) -> dict:
+        start = ids.books // 2 + (i // ids.users) * BATCH_SIZE % (ids.books // 2)
+        return {"book_ids": [(start + k) % ids.books + 1 for k in range(BATCH_SIZE)]}
+
+    bulk_body = "".join(
+        json.dumps({"title": f"Импорт {k}", "author": "Автор", "date": "2025-02-01", "location": "Клуб"}) + "\n"
+        for k in range(50)
+    ).encode()
+
+    return [
+        # books: чтения
+        Case("books", "GET /books", "GET", lambda i: "/books?page=1&limit=20", anonymous),
+        Case("books", "GET /books?page=N", "GET", lambda i: f"/books?page={i % 40 + 5}&limit=20", anonymous),
+        Case("books", "GET /books?search=", "GET", lambda i: f"/books?search=Автор {i % 50}&limit=20", anonymous),
+        Case("books", "GET /books/current", "GET", lambda i: "/books/current", anonymous),
+        Case("books", "GET /books/{book_id}", "GET", lambda i: f"/books/{ids.book(i)}", anonymous),
+        Case("books", "GET /books/{book_id}/reviews", "GET", lambda i: f"/books/{i % 100 + 1}/reviews", anonymous),
+        Case("books", "GET /books/{book_id}/reviews/export", "GET", lambda i: f"/books/{i % 100 + 1}/reviews/export", admin),
+        # favorites: чтения
+        Case("favorites", "GET /favorites", "GET", lambda i: "/favorites?page=1&limit=20", user),
+        Case("favorites", "GET /favorites/ids", "GET", lambda i: "/favorites/ids", user),
+        # meetings: чтения
+        Case("meetings", "GET /meetings/my", "GET", lambda i: "/meetings/my", user),
+        Case("meetings", "GET /meetings/{book_id}/participants", "GET", lambda i: "/meetings/1/participants", admin),
+        Case("meetings", "GET /meetings/{book_id}/participants/export", "GET", lambda i: "/meetings/1/participants/export", admin),
+        # users: чтения
+        Case("users", "GET /me", "GET", lambda i: "/me", user),
+        Case("users", "GET /users", "GET", lambda i: "/users?page=1&limit=20", admin),
+        Case("users", "GET /users?search=", "GET", lambda i: f"/users?search=user{i % 100}&limit=20", admin),
+        Case("users", "GET /users/{id}", "GET", lambda i: f"/users/{ids.user_ids[i % ids.users]}", admin),
+        Case("users", "GET /users/export", "GET", lambda i: "/users/export", admin),
+        # books: записи
+        Case(
+            "books", "POST /books", "POST", lambda i: "/books", admin, (201,),
+            json=lambda i: {"title": f"Новая {i}", "author": "Автор", "date": "2025-03-01", "location": "Клуб"},
+            collect=lambda i, r: ids.created_books.append(r.json()["id"]),
+        ),
+        Case(
+            "books", "PUT /books/{book_id}", "PUT", lambda i: f"/books/{created(i)}", admin,
+            json=lambda i: {"title": f"Изменена {i}", "author": "Автор", "date": "2025-03-01", "location": "Клуб"},
+        ),
+        Case("books", "PUT /books/{book_id}/set-current", "PUT", lambda i: f"/books/{ids.book(i)}/set-current", admin),
+        Case(
+            "books", "POST /books/{book_id}/reviews", "POST", lambda i: f"/books/{ids.book(i)}/reviews", user, (201,),
+            json=lambda i: {"rating": i % 5 + 1, "comment": "Отзыв из бенчмарка"},
+        ),
+        Case(
+            "books", "POST /books/bulk", "POST", lambda i: "/books/bulk",
+            lambda i: {**admin(i), "Content-Type": "application/x-ndjson"}, content=lambda i: bulk_body,
+        ),
+        Case("books", "DELETE /books/{book_id}", "DELETE", lambda i: f"/books/{created(i)}", admin, (204,)),
+        # favorites: записи
+        Case(
+            "favorites", "POST /favorites", "POST", lambda i: "/favorites", user, (201,),
+            json=lambda i: {"book_id": ids.new_pair_book(i)},
+        ),
+        Case("favorites", "DELETE /favorites/{book_id}", "DELETE", lambda i: f"/favorites/{ids.new_pair_book(i)}", user, (204,)),
+        Case("favorites", "POST /favorites/batch", "POST", lambda i: "/favorites/batch", user, json=batch),
+        Case("favorites", "DELETE /favorites/batch", "DELETE", lambda i: "/favorites/batch", user, json=batch),
+        # meetings: записи
+        Case(
+            "meetings", "POST /meetings/register/{book_id}", "POST",
+            lambda i: f"/meetings/register/{ids.new_pair_book(i)}", user, (201,),
+        ),
+        Case(
+            "meetings", "DELETE /meetings/register/{book_id}", "DELETE",
+            lambda i: f"/meetings/register/{ids.new_pair_book(i)}", user, (204,),
+        ),
+        # users: записи
+        Case("users", "PATCH /me", "PATCH", lambda i: "/me", user, json=lambda i: {"first_name": f"Имя {i}"}),
+        Case("users", "PUT /users/{id}/role", "PUT", lambda i: f"/users/{ids.victim_id}/role", admin, json=lambda i: {"role": "user"}),
+        Case("users", "POST /users/{id}/revoke-sessions", "POST", lambda i: f"/users/{ids.victim_id}/revoke-sessions", admin),
+        Case(
+            "users", "POST /register", "POST", lambda i: "/register", anonymous, (201,),
+            json=lambda i: {
+                "first_name": "Новый", "last_name": "Бенч", "email": f"new{i}@bench.example",
+                "fav_authors": [], "fav_genres": [], "fav_books": [], "discuss_books": [],
+            },
+        ),
+        # auth: коды уходят в заглушку сервиса сообщений, verify-code выдаёт токены для logout
+        Case("auth", "POST /auth/send-code", "POST", lambda i: "/auth/send-code", anonymous, json=lambda i: {"email": f"send{i}@bench.example"}),
+        Case(
+            "auth", "POST /auth/verify-code", "POST", lambda i: "/auth/verify-code", anonymous,
+            json=lambda i: {"email": f"login{i}@bench.example", "code": VERIFY_CODE},
+            collect=lambda i, r: ids.login_tokens.append(r.json()["access_token"]),
+        ),
+        Case(
+            "auth", "POST /auth/logout", "POST", lambda i: "/auth/logout",
+            lambda i: {"Authorization": f"Bearer {ids.login_tokens[i % len(ids.login_tokens)]}"},
+        ),
+    ]
+
+
+def percentile(ordered: list, pct: float) -> float:
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def run_case(client: httpx.AsyncClient, case: Case, requests: int, concurrency: int, warmup: int) -> dict:
+    async def call(i: int) -> httpx.Response:
+        return await client.request(
+            case.method,
+            case.path(i),
+            headers=case.headers(i),
+            json=case.json(i) if case.json else None,
+            content=case.content(i) if case.content else None,
+        )
+
+    # Прогрев только у чтений: повтор записи изменил бы состояние, нужное следующим эндпоинтам
+    if case.method == "GET":
+        for i in range(warmup):
+            await call(i)
+
+    latencies = []
+    errors = 0
+    first_error = None
+    indexes = iter(range(requests))
+
+    async def worker():
+        nonlocal errors, first_error
+        for i in indexes:
+            started = time.perf_counter()
+            response = await call(i)
+            latencies.append((time.perf_counter() - started) * 1000)
+            if response.status_code not in case.expect:
+                errors += 1
+                first_error = first_error or f"{response.status_code} {response.text[:200]}"
+            elif case.collect:
+                case.collect(i, response)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "router": case.router,
+        "requests": requests,
+        "errors": errors,
+        "first_error": first_error,
+        "rps": requests / elapsed,
+        "p50_ms": percentile(latencies, 50),
+        "p95_ms": percentile(latencies, 95),
+        "p99_ms": percentile(latencies, 99),
+    }
+
+
+async def run_suite(args) -> dict:
+    _STUB.start_in_thread()
+    results = {}
+    async with app.router.lifespan_context(app):
+        print(f"📚 Заполнение базы: {args.books} книг, {args.users} пользователей...")
+        ids = seed(args.books, args.users, args.requests)
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            cases = [case for case in build_cases(ids) if not args.only or case.router in args.only]
+            print(f"⏱️  {len(cases)} эндпоинтов по {args.requests} запросов, параллельно {args.concurrency}...\n")
+            print_header()
+            for case in cases:
+                results[case.name] = await run_case(client, case, args.requests, args.concurrency, args.warmup)
+                print_row(case.name, results[case.name])
+    _STUB.shutdown()
+    return {
+        "meta": {
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "db_async": DB_ASYNC,
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "books": args.books,
+            "users": args.users,
+        },
+        "endpoints": results,
+    }
+
+
+def print_header() -> None:
+    print(f"{'эндпоинт':<48} {'зап./с':>8} {'p50, мс':>8} {'p95, мс':>8} {'p99, мс':>8} {'ошибок':>7}")
+
+
+def print_row(name: str, r: dict) -> None:
+    print(f"{name:<48} {r['rps']:>8.1f} {r['p50_ms']:>8.2f} {r['p95_ms']:>8.2f} {r['p99_ms']:>8.2f} {r['errors']:>7}")
+    if r["first_error"]:
+        print(f"    первая ошибка: {r['first_error']}")
+
+
+def compare(results: dict, baseline: dict, threshold: float, min_delta_ms: float) -> list[str]:
+    """Регрессии результатов относительно базовых: рост p50/p95 или падение пропускной способности."""
+    regressions = []
+    print(f"\n{'эндпоинт':<48} {'p50':>8} {'p95':>8} {'зап./с':>8}")
+    for name, new in results["endpoints"].items():
+        old = baseline["endpoints"].get(name)
+        if old is None:
+            print(f"{name:<48} {'нет в базовом файле':>26}")
+            continue
+        flags = []
+        for metric in ("p50_ms", "p95_ms"):
+            # Рост на доли миллисекунды - шум, а не регрессия
+            if new[metric] > old[metric] * (1 + threshold) and new[metric] - old[metric] >= min_delta_ms:
+                flags.append(f"{metric[:3]} {old[metric]:.2f} -> {new[metric]:.2f} мс")
+        if new["rps"] < old["rps"] * (1 - threshold):
+            flags.append(f"зап./с {old['rps']:.1f} -> {new['rps']:.1f}")
+        if new["errors"] > old["errors"]:
+            flags.append(f"ошибок {old['errors']} -> {new['errors']}")
+        changes = [f"{(new[m] - old[m]) / old[m] * 100:>+7.1f}%" if old[m] else f"{'-':>8}" for m in ("p50_ms", "p95_ms", "rps")]
+        print(f"{name:<48} {' '.join(changes)}{'  ⚠️' if flags else ''}")
+        regressions.extend(f"{name}: {flag}" for flag in flags)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=300, help="запросов на эндпоинт")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--warmup", type=int, default=20, help="запросов прогрева для GET")
+    parser.add_argument("--books", type=int, default=1000)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--only", nargs="*", choices=["books", "favorites", "meetings", "users", "auth"])
+    parser.add_argument("--output", help="куда сохранить результаты (JSON)")
+    parser.add_argument("--results", help="не запускать, а взять сохранённые результаты")
+    parser.add_argument("--baseline", help="базовые результаты для сравнения (JSON)")
+    parser.add_argument("--threshold", type=float, default=0.25, help="допустимое ухудшение, доля")
+    parser.add_argument("--min-delta-ms", type=float, default=0.5, help="меньший рост задержки не считается регрессией")
+    args = parser.parse_args()
+
+    if args.results:
+        with open(args.results, encoding="utf-8") as f:
+            results = json.load(f)
+    else:
+        results = asyncio.run(run_suite(args))
+        if args.output:
+            with open(args.output, "w", encoding="utf-8") as f:
+                json.dump(results, f, ensure_ascii=False, indent=2)
+            print(f"\n💾 Результаты сохранены в {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold, args.min_delta_ms)
+        if regressions:
+            print(f"\n❌ Регрессии (порог {args.threshold:.0%}):")
+            for line in regressions:
+                print(f"   {line}")
+            sys.exit(1)
+        print(f"\n✅ Регрессий нет (порог {args.threshold:.0%})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""Микробенчмарк app.security.verify_token с кэшем проверенных токенов и без него.
+
+Имитирует поток запросов, где небольшое число активных сессий многократно
+предъявляет один и тот же bearer-токен.
+
+Пример:
+    python scripts/bench_verify_token.py --tokens 200 --calls 200000
+"""
+
+import argparse
+import os
+import sys
+import time
+
+# Добавляем корневую директорию в путь
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import security  # noqa: E402
+from app.cache import TTLCache  # noqa: E402
+
+
+def measure(tokens: list, calls: int) -> float:
+    started = time.perf_counter()
+    for i in range(calls):
+        security.verify_token(tokens[i % len(tokens)])
+    return calls / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tokens", type=int, default=200, help="количество различных активных токенов")
+    parser.add_argument("--calls", type=int, default=200_000)
+    args = parser.parse_args()
+
+    tokens = [security.create_access_token(user_id, "user") for user_id in range(1, args.tokens + 1)]
+    cached_cache = security.token_cache
+
+    security.token_cache = TTLCache(max_size=0, ttl=0)
+    uncached = measure(tokens, args.calls)
+
+    security.token_cache = cached_cache
+    cached = measure(tokens, args.calls)
+
+    print(f"🔑 {args.tokens} токенов, {args.calls} вызовов verify_token")
+    print(f"   без кэша: {uncached:>12,.0f} вызовов/с ({1e6 / uncached:.2f} мкс на вызов)")
+    print(f"   с кэшем:  {cached:>12,.0f} вызовов/с ({1e6 / cached:.2f} мкс на вызов)")
+    print(f"   ускорение: x{cached / uncached:.1f}, {security.token_cache.stats()}")
+
+
+if __name__ == "__main__":
+    main()
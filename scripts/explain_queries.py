@@ -0,0 +1,107 @@
+"""EXPLAIN QUERY PLAN горячих запросов роутеров до и после миграции hot_path_indexes.
+
+Создаёт временную SQLite-базу, применяет миграции до версии 3 и возвращает набор
+индексов, с которым жили базы до hot_path_indexes (на новой базе create_all сразу
+строит индексы из моделей). Печатает план каждого запроса, затем применяет
+остальные миграции и печатает планы снова.
+SCAN по таблице без индекса означает полный просмотр, USE TEMP B-TREE - отдельную
+сортировку.
+
+Использование:
+    python scripts/explain_queries.py
+"""
+
+import os
+import sys
+import tempfile
+
+# Добавляем корневую директорию в путь
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_TMP_DIR = tempfile.mkdtemp(prefix="nartbooks-explain-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(_TMP_DIR, 'explain.db')}")
+os.environ.setdefault("DB_ASYNC", "0")
+
+from sqlalchemy import func, text  # noqa: E402
+from sqlalchemy.orm import Session  # noqa: E402
+
+from app.database import SessionLocal, engine  # noqa: E402
+from app.migrations import run_migrations  # noqa: E402
+from app.models import BookOfMonth, Favorite, MeetingRegistration, Review, User  # noqa: E402
+
+USER_ID = 42
+BOOK_ID = 7
+
+
+def router_queries(db: Session) -> dict:
+    """Запросы в том виде, в каком их строят роутеры."""
+    registered = MeetingRegistration.status == "registered"
+    return {
+        "meetings: записан ли пользователь": db.query(MeetingRegistration).filter(
+            MeetingRegistration.user_id == USER_ID, MeetingRegistration.book_id == BOOK_ID, registered
+        ).limit(1),
+        "meetings: мои встречи": db.query(MeetingRegistration, BookOfMonth)
+        .join(BookOfMonth, MeetingRegistration.book_id == BookOfMonth.id)
+        .filter(MeetingRegistration.user_id == USER_ID, registered)
+        .order_by(MeetingRegistration.id.desc()),
+        "meetings: участники встречи": db.query(MeetingRegistration, User)
+        .join(User, MeetingRegistration.user_id == User.id)
+        .filter(MeetingRegistration.book_id == BOOK_ID, registered)
+        .order_by(MeetingRegistration.registered_at.asc()),
+        "stats: записавшиеся по книгам": db.query(MeetingRegistration.book_id, func.count())
+        .filter(registered)
+        .group_by(MeetingRegistration.book_id),
+        "favorites: есть ли книга в избранном": db.query(Favorite).filter(
+            Favorite.user_id == USER_ID, Favorite.book_id == BOOK_ID
+        ).limit(1),
+        "favorites: список по id": db.query(Favorite)
+        .filter(Favorite.user_id == USER_ID, Favorite.id > 100)
+        .order_by(Favorite.id)
+        .limit(20),
+        "books: отзывы книги по id": db.query(Review)
+        .filter(Review.book_id == BOOK_ID, Review.id > 100)
+        .order_by(Review.id)
+        .limit(20),
+        "auth: пользователь по телефону": db.query(User).filter(User.phone == "+79990000000").limit(1),
+    }
+
+
+# Индексы баз, созданных до миграции hot_path_indexes
+_LEGACY_INDEXES = [
+    "DROP INDEX ux_favorites_user_book",
+    "DROP INDEX ix_reviews_book_id_id",
+    "DROP INDEX ix_meeting_registrations_user_book_status",
+    "DROP INDEX ix_meeting_registrations_book_status_registered_at",
+    "DROP INDEX ix_users_phone",
+    "CREATE INDEX ix_reviews_book_id ON reviews (book_id)",
+    "CREATE INDEX ix_meeting_registrations_book_id ON meeting_registrations (book_id)",
+]
+
+
+def restore_legacy_indexes() -> None:
+    with engine.begin() as conn:
+        for statement in _LEGACY_INDEXES:
+            conn.execute(text(statement))
+
+
+def print_plans(title: str) -> None:
+    print(f"\n=== {title} ===")
+    with SessionLocal() as db:
+        for name, query in router_queries(db).items():
+            sql = str(query.statement.compile(engine, compile_kwargs={"literal_binds": True}))
+            print(f"\n{name}")
+            for row in db.execute(text(f"EXPLAIN QUERY PLAN {sql}")):
+                print(f"    {row[-1]}")
+
+
+def main() -> int:
+    run_migrations(engine, target=3)
+    restore_legacy_indexes()
+    print_plans("до hot_path_indexes")
+    applied = run_migrations(engine)
+    print_plans(f"после миграций {applied}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
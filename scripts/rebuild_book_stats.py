@@ -0,0 +1,50 @@
+"""Пересчёт и проверка таблицы book_stats по исходным таблицам reviews и meeting_registrations.
+
+Использование:
+    python scripts/rebuild_book_stats.py            # пересчитать все счётчики
+    python scripts/rebuild_book_stats.py --verify   # только сравнить и вывести расхождения
+"""
+
+import argparse
+import os
+import sys
+
+# Добавляем корневую директорию в путь
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.database import SessionLocal, init_db  # noqa: E402
+from app.stats import rebuild_book_stats, verify_book_stats  # noqa: E402
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Пересчёт счётчиков book_stats")
+    parser.add_argument("--verify", action="store_true", help="только проверить, ничего не изменяя")
+    args = parser.parse_args()
+
+    init_db()
+    db = SessionLocal()
+    try:
+        if args.verify:
+            mismatches = verify_book_stats(db)
+            if not mismatches:
+                print("✅ Счётчики book_stats совпадают с исходными таблицами")
+                return 0
+            print(f"❌ Найдено расхождений: {len(mismatches)}")
+            for mismatch in mismatches:
+                print(f"   книга {mismatch['book_id']}: {mismatch['diff']}")
+            return 1
+
+        count = rebuild_book_stats(db)
+        db.commit()
+        print(f"✅ book_stats пересчитана: {count} книг")
+        return 0
+    except Exception as e:
+        db.rollback()
+        print(f"❌ Ошибка: {e}")
+        return 1
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
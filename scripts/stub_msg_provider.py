@@ -0,0 +1,97 @@
+"""Локальная заглушка сервиса сообщений msg.ovrx для проверки отправки кодов.
+
+Принимает POST /auth-code/email и POST /auth-code/sms, отвечает с заданной
+задержкой и долей ошибок. Во время работы можно менять поведение:
+POST /_control {"latency": 2, "fail_rate": 1.0}.
+
+Пример:
+    python scripts/stub_msg_provider.py --port 8900 --latency 0.5 --fail-rate 0.2
+    MSG_OVRX_BASE_URL=http://127.0.0.1:8900 MSG_OVRX_API_KEY=stub uvicorn app.main:app
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StubProvider(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, port: int, latency: float = 0.0, fail_rate: float = 0.0, fail_status: int = 503):
+        super().__init__(("127.0.0.1", port), _Handler)
+        self.latency = latency
+        self.fail_rate = fail_rate
+        self.fail_status = fail_status
+        self.counts = {"ok": 0, "failed": 0}
+        self._lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def count(self, name: str) -> None:
+        with self._lock:
+            self.counts[name] += 1
+
+    def start_in_thread(self) -> threading.Thread:
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return thread
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: StubProvider
+
+    def _reply(self, status: int, body: dict) -> None:
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        if self.path == "/_control":
+            for name in ("latency", "fail_rate", "fail_status"):
+                if name in payload:
+                    setattr(self.server, name, payload[name])
+            self._reply(200, {"latency": self.server.latency, "fail_rate": self.server.fail_rate})
+            return
+        if self.path not in ("/auth-code/email", "/auth-code/sms"):
+            self._reply(404, {"detail": "Not found"})
+            return
+
+        time.sleep(self.server.latency)
+        if random.random() < self.server.fail_rate:
+            self.server.count("failed")
+            self._reply(self.server.fail_status, {"detail": "Сервис недоступен (заглушка)"})
+            return
+        self.server.count("ok")
+        self._reply(200, {"status": "sent"})
+
+    def log_message(self, format, *args):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency", type=float, default=0.0, help="задержка ответа, с")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="доля ответов с ошибкой (0..1)")
+    parser.add_argument("--fail-status", type=int, default=503)
+    args = parser.parse_args()
+
+    server = StubProvider(args.port, args.latency, args.fail_rate, args.fail_status)
+    print(f"📨 Заглушка сервиса сообщений: {server.url} (задержка {args.latency} с, ошибок {args.fail_rate:.0%})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print(f"\nОбработано: {server.counts}")
+
+
+if __name__ == "__main__":
+    main()
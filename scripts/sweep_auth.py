@@ -0,0 +1,44 @@
+"""Разовая очистка просроченных auth_codes, auth_tokens и rate_limits (то же, что делает фоновая задача).
+
+Использование:
+    python scripts/sweep_auth.py
+    python scripts/sweep_auth.py --batch-size 5000
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+
+# Добавляем корневую директорию в путь
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.config import SWEEP_BATCH_SIZE  # noqa: E402
+from app.database import async_engine, init_db  # noqa: E402
+from app.maintenance import sweep_expired_auth  # noqa: E402
+
+
+async def run(batch_size: int) -> dict:
+    try:
+        return await sweep_expired_auth(batch_size)
+    finally:
+        if async_engine is not None:
+            await async_engine.dispose()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Очистка просроченных кодов и токенов")
+    parser.add_argument("--batch-size", type=int, default=SWEEP_BATCH_SIZE)
+    args = parser.parse_args()
+
+    init_db()
+    result = asyncio.run(run(args.batch_size))
+    print(
+        f"✅ Удалено кодов: {result['auth_codes']}, токенов: {result['auth_tokens']}, "
+        f"корзин лимитов: {result['rate_limits']} за {result['seconds']:.3f} с"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,62 @@
+"""Проверка выхода и повторного входа: новый токен не должен совпасть с только что отозванным.
+
+Приложение поднимается на временной базе, коды входа записываются в auth_codes напрямую.
+Запуск:
+    python scripts/test_auth_sessions.py
+"""
+
+import os
+import sys
+import tempfile
+from datetime import datetime
+
+# Добавляем корневую директорию в путь
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_TMP_DIR = tempfile.mkdtemp(prefix="nartbooks-test-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(_TMP_DIR, 'sessions.db')}")
+os.environ.setdefault("SWEEP_INTERVAL_SECONDS", "0")
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from app.database import SessionLocal  # noqa: E402
+from app.main import app  # noqa: E402
+from app.models import AuthCode, User  # noqa: E402
+
+EMAIL = "relogin@example.com"
+
+
+def issue_code(code: str) -> None:
+    db = SessionLocal()
+    try:
+        if db.query(User).filter(User.email == EMAIL).first() is None:
+            db.add(User(first_name="Повторный", last_name="Вход", email=EMAIL))
+        db.add(AuthCode(identifier=EMAIL, code=code, created_at=datetime.now(), is_used=0))
+        db.commit()
+    finally:
+        db.close()
+
+
+def login(client: TestClient, code: str) -> str:
+    issue_code(code)
+    response = client.post("/auth/verify-code", json={"email": EMAIL, "code": code})
+    assert response.status_code == 200, response.text
+    return response.json()["access_token"]
+
+
+def test_logout_then_immediate_relogin():
+    with TestClient(app) as client:
+        old_token = login(client, "111111")
+        response = client.post("/auth/logout", headers={"Authorization": f"Bearer {old_token}"})
+        assert response.status_code == 200, response.text
+
+        # Вход в ту же секунду: раньше выдавался тот же токен, и запись в auth_tokens падала на UNIQUE
+        new_token = login(client, "222222")
+        assert new_token != old_token
+        assert client.get("/me", headers={"Authorization": f"Bearer {new_token}"}).status_code == 200
+        assert client.get("/me", headers={"Authorization": f"Bearer {old_token}"}).status_code == 401
+
+
+if __name__ == "__main__":
+    test_logout_then_immediate_relogin()
+    print("✅ test_logout_then_immediate_relogin")
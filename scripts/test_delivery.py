@@ -0,0 +1,88 @@
+"""Проверка circuit breaker фоновой отправки кодов: пробная отправка не должна зависать.
+
+Отправка идёт через подменённую сессию requests, без сети и без потоков-отправителей.
+Запуск:
+    python scripts/test_delivery.py
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+# Добавляем корневую директорию в путь
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_TMP_DIR = tempfile.mkdtemp(prefix="nartbooks-test-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(_TMP_DIR, 'delivery.db')}")
+os.environ.setdefault("SWEEP_INTERVAL_SECONDS", "0")
+
+import requests  # noqa: E402
+
+from app.delivery import CircuitBreaker, CodeDeliveryService, DeliveryJob  # noqa: E402
+
+RESET_SECONDS = 0.05
+
+
+class FakeResponse:
+    status_code = 200
+    text = ""
+
+
+class FakeSession:
+    """Вместо запроса к провайдеру выбрасывает заданную ошибку или отвечает 200."""
+
+    def __init__(self, error: Exception = None):
+        self.error = error
+        self.calls = 0
+
+    def post(self, url, json=None, timeout=None):
+        self.calls += 1
+        if self.error is not None:
+            raise self.error
+        return FakeResponse()
+
+
+def half_open_service(error: Exception) -> CodeDeliveryService:
+    """Service whose breaker is half-open and whose next provider call raises error."""
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=RESET_SECONDS)
+    breaker.record_failure()
+    service = CodeDeliveryService(
+        base_url="http://provider.invalid", workers=1, max_attempts=1, backoff_base=0.01, max_age=5, breaker=breaker
+    )
+    service._session = FakeSession(error)
+    time.sleep(RESET_SECONDS)
+    assert breaker.state == "half-open"
+    return service
+
+
+def recovers_after(error: Exception) -> None:
+    service = half_open_service(error)
+    service._deliver(DeliveryJob("email", {"email": "probe@example.com"}))
+    assert service.stats["failed"] == 1
+    # Проба закончилась ошибкой: breaker снова открыт, а не полуоткрыт навсегда
+    assert service.breaker.state == "open"
+    assert not service.breaker._probing
+
+    # Провайдер восстановился: следующая проба проходит и закрывает breaker
+    service._session = FakeSession()
+    time.sleep(RESET_SECONDS)
+    service._deliver(DeliveryJob("email", {"email": "next@example.com"}))
+    assert service._session.calls == 1
+    assert service.stats["sent"] == 1
+    assert service.stats["dropped"] == 0
+    assert service.breaker.state == "closed"
+
+
+def test_probe_with_protocol_error():
+    recovers_after(requests.exceptions.ChunkedEncodingError("обрыв ответа"))
+
+
+def test_probe_with_unexpected_error():
+    recovers_after(ValueError("неожиданная ошибка"))
+
+
+if __name__ == "__main__":
+    for test in (test_probe_with_protocol_error, test_probe_with_unexpected_error):
+        test()
+        print(f"✅ {test.__name__}")